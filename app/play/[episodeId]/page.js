@@ -231,7 +231,7 @@ export default function PlayPage({ params }) {
     setIsLoading(true);
     setError(null);
 
-    const requestData = { scenario: scenarioId, language };
+    const requestData = { scenario: scenarioId, language, stream: true };
     console.log("Sending session start request:", requestData);
 
     try {
@@ -280,7 +280,7 @@ export default function PlayPage({ params }) {
     formData.append("audio", audioBlob, "recording.webm");
 
     try {
-      const response = await fetch(`http://localhost:8000/api/session/${sessionId}/process`, {
+      const response = await fetch(`http://localhost:8000/api/session/${sessionId}/process?stream=true`, {
         method: "POST",
         body: formData,
       });
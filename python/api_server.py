@@ -1,19 +1,32 @@
 import os
+import time
 import uuid
 import json
 import asyncio
+import functools
+import importlib
 import aiofiles
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from typing import Dict, Optional, Tuple
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import tempfile
-import shutil
 
-from voice_convo import VoiceLanguageLearningChatbot, load_scenarios_from_directory
-from audio_interface import AudioInterface
+from voice_convo import VoiceLanguageLearningChatbot, get_scenario_registry, ENGINES
+from speech_service import SpeechService
+from tts_cache import TTSCache
+from translation_cache import TranslationCache
+from transcoder import AudioTranscoder, detect_container
+from uploads import UploadLimitMiddleware, FrameBuffer, read_upload
+from session_store import create_session_store
+from audio_store import AudioStore
+from speech_pipeline import SpeechPipeline, SpeechCancelled
+from metrics import REGISTRY, timed, timed_handler, count_bytes
+from providers import load_genai, replaying, provider_stats
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -22,6 +35,11 @@ load_dotenv()
 # Initialize FastAPI app
 app = FastAPI(title="Voice Chatbot API", version="1.0.0")
 
+# Maximum audio upload size; larger request bodies are refused before being buffered
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+app.add_middleware(UploadLimitMiddleware, max_body_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)
+
 # Configure CORS with more permissive settings
 app.add_middleware(
     CORSMiddleware,
@@ -32,26 +50,118 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-# Create audio directory if it doesn't exist
-AUDIO_DIR = "audio"
-os.makedirs(AUDIO_DIR, exist_ok=True)
+# Session audio files, sharded by session ID, with per-session and global byte quotas
+# (oldest files are deleted first). Directories left by dead sessions are removed at startup.
+AUDIO_DIR = os.getenv("AUDIO_DIR", "audio")
+AUDIO_SESSION_QUOTA_MB = int(os.getenv("AUDIO_SESSION_QUOTA_MB", "20"))
+AUDIO_STORE_MAX_MB = int(os.getenv("AUDIO_STORE_MAX_MB", "2048"))
+AUDIO_ORPHAN_GRACE_SECONDS = float(os.getenv("AUDIO_ORPHAN_GRACE_SECONDS", "300"))
+audio_store = AudioStore(
+    AUDIO_DIR,
+    session_quota_bytes=AUDIO_SESSION_QUOTA_MB * 1024 * 1024,
+    max_bytes=AUDIO_STORE_MAX_MB * 1024 * 1024,
+    orphan_grace_seconds=AUDIO_ORPHAN_GRACE_SECONDS
+)
 
 # Mount static files for audio serving
 app.mount("/audio", StaticFiles(directory=AUDIO_DIR), name="audio")
 
 # Load scenarios
-SCENARIOS = load_scenarios_from_directory()
-
-# Session storage (in-memory for development, should use Redis in production)
-sessions: Dict[str, Dict] = {}
+scenario_registry = get_scenario_registry()
 
 # Session timeout (30 minutes)
 SESSION_TIMEOUT = timedelta(minutes=30)
 
+# How often expired sessions are swept, and how many session directories are
+# removed per blocking call on the audio pool
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+SESSION_CLEANUP_BATCH = int(os.getenv("SESSION_CLEANUP_BATCH", "32"))
+
+# Session expiry counters, reported by /api/health
+expiry_stats = {
+    "sweeps": 0,
+    "expired_sessions": 0,
+    "removed_dirs": 0,
+    "last_sweep_expired": 0,
+    "last_sweep_ms": 0.0
+}
+
+# Worker pools for blocking provider calls, so a slow turn never stalls the event loop.
+# Pool sizes bound how many STT, LLM and TTS calls run at once on this worker.
+STT_POOL_SIZE = int(os.getenv("STT_POOL_SIZE", "8"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+TTS_POOL_SIZE = int(os.getenv("TTS_POOL_SIZE", "8"))
+AUDIO_POOL_SIZE = int(os.getenv("AUDIO_POOL_SIZE", "4"))
+
+executors = {
+    "stt": ThreadPoolExecutor(max_workers=STT_POOL_SIZE, thread_name_prefix="stt"),
+    "llm": ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm"),
+    "tts": ThreadPoolExecutor(max_workers=TTS_POOL_SIZE, thread_name_prefix="tts"),
+    "audio": ThreadPoolExecutor(max_workers=AUDIO_POOL_SIZE, thread_name_prefix="audio"),
+}
+
+# Shared, connection-pooled speech service (created at startup)
+ELEVENLABS_MAX_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", str(STT_POOL_SIZE + TTS_POOL_SIZE)))
+speech_service: Optional[SpeechService] = None
+
+# Content-addressed cache for synthesized speech (repeated utterances skip ElevenLabs)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "512"))
+# Cache speech sentence by sentence and join the MP3 frames, so repeated sentences are reused
+TTS_SEGMENTS = os.getenv("TTS_SEGMENTS", "true").lower() in ("1", "true", "yes")
+
+# Translation memo shared by all sessions and persisted across restarts
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "translation_cache.sqlite3")
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))
+translation_cache = TranslationCache(TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_MAX_ENTRIES)
+
+# Run the step-completion check in the background instead of before the reply
+DEFER_STEP_EVALUATION = os.getenv("DEFER_STEP_EVALUATION", "false").lower() in ("1", "true", "yes")
+
+# Gemini turn engine: "two_call" (reply, then step check) or "structured" (one JSON call)
+CHAT_ENGINE = os.getenv("CHAT_ENGINE", "two_call")
+if CHAT_ENGINE not in ENGINES:
+    raise RuntimeError(f"Invalid CHAT_ENGINE '{CHAT_ENGINE}', expected one of: {', '.join(ENGINES)}")
+
+# History entries kept verbatim in prompts (older turns are summarized)
+CONTEXT_TURNS = int(os.getenv("CONTEXT_TURNS", "8"))
+
+# In-memory upload transcoding; at most FFMPEG_CONCURRENCY ffmpeg processes at once
+FFMPEG_CONCURRENCY = int(os.getenv("FFMPEG_CONCURRENCY", "4"))
+transcoder = AudioTranscoder(max_processes=FFMPEG_CONCURRENCY, executor=executors["audio"])
+
+# Containers forwarded to STT untouched (others are transcoded to WAV). Empty means the
+# STT backend's own list; set to "wav" to always transcode.
+STT_NATIVE_FORMATS = [f.strip() for f in os.getenv("STT_NATIVE_FORMATS", "").split(",") if f.strip()]
+
+# Voice activity detection before STT: recordings without speech are rejected with a 422
+# instead of being transcribed, and leading/trailing silence is cut when at least
+# VAD_MIN_TRIM_SECONDS of it can be removed
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("1", "true", "yes")
+VAD_MIN_TRIM_SECONDS = float(os.getenv("VAD_MIN_TRIM_SECONDS", "0.5"))
+
+# Speak replies sentence by sentence while Gemini is still writing them (WebSocket turns
+# and non-streamed HTTP turns); at most SPEECH_PIPELINE_CONCURRENCY sentences of a reply
+# are synthesized at once
+SPEECH_PIPELINE = os.getenv("SPEECH_PIPELINE", "true").lower() in ("1", "true", "yes")
+SPEECH_PIPELINE_CONCURRENCY = int(os.getenv("SPEECH_PIPELINE_CONCURRENCY", "3"))
+
+# Keep a copy of each upload as input_N.<ext> in the session audio directory
+ARCHIVE_UPLOADS = os.getenv("ARCHIVE_UPLOADS", "false").lower() in ("1", "true", "yes")
+
+# Close code for WebSocket conversations on a session that does not exist
+WS_CLOSE_SESSION_NOT_FOUND = 4404
+
+# Where sessions live: "memory://" (this process only) or "redis://host:port/db" to
+# share them between workers and keep them across restarts
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "memory://")
+
 # Pydantic models
 class SessionStartRequest(BaseModel):
     scenario: str
     language: str
+    stream: bool = False  # Return a streaming audio URL instead of a finished file
 
 class SessionStartResponse(BaseModel):
     sessionId: str
@@ -65,6 +175,7 @@ class SessionStatusResponse(BaseModel):
     stepName: str
     isComplete: bool
     exchangeCount: int
+    promptTokens: int  # Estimated tokens in the last prompt sent to Gemini
 
 class AudioProcessResponse(BaseModel):
     message: str
@@ -74,125 +185,477 @@ class AudioProcessResponse(BaseModel):
     userText: str  # Add user's transcribed text
 
 # Helper functions
-def cleanup_expired_sessions():
+def get_speech_service() -> SpeechService:
+    """Get the process-wide speech service, creating it on first use"""
+    global speech_service
+    if speech_service is None:
+        cache = TTSCache(
+            TTS_CACHE_DIR,
+            memory_max_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+            disk_max_bytes=TTS_CACHE_DISK_MB * 1024 * 1024
+        )
+        speech_service = SpeechService(max_connections=ELEVENLABS_MAX_CONNECTIONS, cache=cache,
+                                       segments=TTS_SEGMENTS)
+        if STT_NATIVE_FORMATS:
+            speech_service.native_formats = frozenset(STT_NATIVE_FORMATS)
+    return speech_service
+
+async def run_blocking(stage: str, func, *args, **kwargs):
+    """Run a blocking call on the worker pool for the given stage"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executors[stage], functools.partial(func, *args, **kwargs))
+
+def create_chatbot(scenario: str, language: str) -> VoiceLanguageLearningChatbot:
+    """Build a chatbot for a scenario with the server's configuration"""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key and not replaying():
+        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
+    
+    return VoiceLanguageLearningChatbot(
+        api_key=api_key,
+        scenario=scenario_registry.get(scenario),
+        language=language,
+        translation_cache=translation_cache,
+        defer_step_evaluation=DEFER_STEP_EVALUATION,
+        engine=CHAT_ENGINE,
+        context_turns=CONTEXT_TURNS
+    )
+
+def serialize_session(session: Dict) -> Dict:
+    """Convert a session into plain data for a persistent session store"""
+    return {
+        "scenario": session["scenario"],
+        "language": session["language"],
+        "created_at": session["created_at"].isoformat(),
+        "last_activity": session["last_activity"].isoformat(),
+        "audio_counter": session["audio_counter"],
+        "pending_speech": {str(counter): text for counter, text in session["pending_speech"].items()},
+        "chatbot": session["chatbot"].to_state()
+    }
+
+def deserialize_session(data: Dict) -> Optional[Dict]:
+    """Rebuild a session (including its chatbot) from serialize_session output; None if
+    its scenario no longer exists (removed or renamed since the session started)"""
+    if scenario_registry.get(data["scenario"]) is None:
+        print(f"Dropping stored session: scenario '{data['scenario']}' no longer exists")
+        return None
+    chatbot = create_chatbot(data["scenario"], data["language"])
+    chatbot.restore_state(data["chatbot"])
+    return {
+        "chatbot": chatbot,
+        "created_at": datetime.fromisoformat(data["created_at"]),
+        "last_activity": datetime.fromisoformat(data["last_activity"]),
+        "scenario": data["scenario"],
+        "language": data["language"],
+        "audio_counter": data["audio_counter"],
+        "pending_speech": {int(counter): text for counter, text in data["pending_speech"].items()}
+    }
+
+session_store = create_session_store(
+    SESSION_STORE_URL,
+    encode=serialize_session,
+    decode=deserialize_session,
+    ttl_seconds=int(SESSION_TIMEOUT.total_seconds())
+)
+
+async def cleanup_expired_sessions():
     """Remove expired sessions"""
-    current_time = datetime.now()
-    expired_sessions = [
-        session_id for session_id, session_data in sessions.items()
-        if current_time - session_data["last_activity"] > SESSION_TIMEOUT
-    ]
+    sweep_started = time.perf_counter()
+    expired_sessions = await session_store.expired()
     for session_id in expired_sessions:
-        # Clean up audio files
-        session_audio_dir = os.path.join(AUDIO_DIR, session_id)
-        if os.path.exists(session_audio_dir):
-            shutil.rmtree(session_audio_dir)
         # Remove from sessions
-        del sessions[session_id]
+        await session_store.delete(session_id)
         print(f"Cleaned up expired session: {session_id}")
+    
+    # Clean up audio files off the event loop, a batch at a time
+    for start in range(0, len(expired_sessions), SESSION_CLEANUP_BATCH):
+        batch = expired_sessions[start:start + SESSION_CLEANUP_BATCH]
+        expiry_stats["removed_dirs"] += await run_blocking("audio", audio_store.remove_sessions, batch)
+    
+    expiry_stats["sweeps"] += 1
+    expiry_stats["expired_sessions"] += len(expired_sessions)
+    expiry_stats["last_sweep_expired"] = len(expired_sessions)
+    expiry_stats["last_sweep_ms"] = round((time.perf_counter() - sweep_started) * 1000, 2)
 
-def get_session(session_id: str) -> Dict:
+async def get_session(session_id: str) -> Dict:
     """Get session by ID or raise 404"""
-    if session_id not in sessions:
+    session = await session_store.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Update last activity
-    sessions[session_id]["last_activity"] = datetime.now()
-    return sessions[session_id]
+    await session_store.touch(session_id, session)
+    return session
 
-def create_session_audio_dir(session_id: str):
-    """Create directory for session audio files"""
-    session_dir = os.path.join(AUDIO_DIR, session_id)
-    os.makedirs(session_dir, exist_ok=True)
-    return session_dir
+async def settle_and_save(session_id: str, session: Dict, lock):
+    """Apply a deferred step evaluation (and, for a stored session, the background
+    summary), store the session and release its turn lock"""
+    try:
+        await run_blocking("llm", session["chatbot"].settle_step_evaluation)
+        if session_store.persistent:
+            await run_blocking("llm", session["chatbot"].settle_summary)
+        await session_store.save(session_id, session)
+    finally:
+        await lock.release()
+
+def audio_url(session_id: str, name: str) -> str:
+    """Public URL of a session audio file"""
+    return f"http://localhost:8000/audio/{audio_store.relative_dir(session_id)}/{name}"
+
+async def save_audio_file(session_id: str, filename: str, content: bytes, counter: int) -> str:
+    """Archive uploaded audio bytes and return the path"""
+    file_extension = os.path.splitext(filename)[1]
+    return await run_blocking("audio", audio_store.write, session_id, f"input_{counter}{file_extension}", content)
 
-async def save_audio_file(session_id: str, audio_file: UploadFile, counter: int) -> str:
-    """Save uploaded audio file and return the path"""
-    session_dir = create_session_audio_dir(session_id)
-    file_extension = os.path.splitext(audio_file.filename)[1]
-    file_path = os.path.join(session_dir, f"input_{counter}{file_extension}")
+async def negotiate_stt_input(filename: str, content: bytes) -> Tuple[bytes, str, Dict]:
+    """Pick what to send to STT: the upload as-is if the backend accepts its
+    container, otherwise a WAV transcode. Returns (audio, filename, details)."""
+    container = detect_container(content)
+    if container == "unknown":
+        container = os.path.splitext(filename)[1].lstrip('.').lower() or "unknown"
+    
+    details = {"container": container, "upload_bytes": len(content), "transcode_ms": 0.0}
+    if get_speech_service().accepts_format(container):
+        details["mode"] = "native"
+        return content, f"input.{container}", details
+    
+    started = time.perf_counter()
+    try:
+        with timed("transcode"):
+            wav = await transcoder.to_wav(content)
+        count_bytes("transcode", "in", len(content))
+        count_bytes("transcode", "out", len(wav))
+    except Exception as e:
+        print(f"Audio conversion failed, using original upload: {e}")
+        wav = b""
+    details["transcode_ms"] = (time.perf_counter() - started) * 1000
     
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await audio_file.read()
-        await f.write(content)
+    # Use the original upload if conversion failed or produced (almost) nothing
+    if len(wav) < 1000:
+        details["mode"] = "passthrough"
+        return content, filename, details
     
-    return file_path
+    details["mode"] = "transcoded"
+    return wav, "input.wav", details
 
-async def convert_to_wav(input_path: str) -> str:
-    """Convert audio file to WAV format if needed"""
+async def trim_to_speech(stt_content: bytes, stt_filename: str,
+                         details: Dict) -> Optional[Tuple[bytes, str]]:
+    """Cut leading and trailing silence from the STT input. Returns None if it holds no
+    speech, and the input unchanged if it cannot be decoded or there is little to cut"""
+    if details["mode"] == "passthrough":
+        # ffmpeg could not decode it either; let STT have a go
+        return stt_content, stt_filename
+    
+    # Imported here so the server does not load numpy unless VAD is used
+    import vad
+    
+    started = time.perf_counter()
     try:
-        # Check if file is already in WAV format
-        if input_path.lower().endswith('.wav'):
-            return input_path
-            
-        # For WebM files, we need to convert to WAV
-        if input_path.lower().endswith('.webm'):
-            # Create output path
-            wav_path = input_path.replace('.webm', '.wav')
-            
-            # Try to use ffmpeg for conversion
-            import subprocess
-            try:
-                result = subprocess.run([
-                    'ffmpeg', '-i', input_path, '-ar', '16000', '-ac', '1', wav_path
-                ], capture_output=True, text=True, timeout=30)
-                
-                if result.returncode != 0:
-                    raise Exception(f"ffmpeg conversion failed: {result.stderr}")
-                
-                return wav_path
-            except subprocess.TimeoutExpired:
-                raise Exception("Audio conversion timed out")
-            except FileNotFoundError:
-                # Fallback to pydub if ffmpeg is not available
-                try:
-                    from pydub import AudioSegment
-                    audio = AudioSegment.from_file(input_path)
-                    audio.set_frame_rate(16000).set_channels(1).export(wav_path, format="wav")
-                    return wav_path
-                except ImportError:
-                    return input_path
-                except Exception:
-                    return input_path
-        
-        # For other formats, return as-is
-        return input_path
-    except Exception:
-        return input_path  # Return original file if conversion fails
+        with timed("vad"):
+            if details["mode"] == "transcoded":
+                pcm, sample_rate = vad.read_wav(stt_content)
+            else:
+                pcm, sample_rate = await transcoder.to_pcm(stt_content), transcoder.sample_rate
+            speech, vad_details = await run_blocking("audio", vad.trim_silence, pcm, sample_rate)
+    except Exception as e:
+        print(f"Voice activity detection skipped: {e}")
+        return stt_content, stt_filename
+    finally:
+        details["vad_ms"] = (time.perf_counter() - started) * 1000
+    
+    if speech is None:
+        return None
+    
+    removed = vad_details["duration"] - (vad_details["end"] - vad_details["start"])
+    if removed < VAD_MIN_TRIM_SECONDS:
+        return stt_content, stt_filename
+    details["trimmed_seconds"] = removed
+    
+    if details["mode"] == "native":
+        # Keep the compact upload format by cutting without re-encoding
+        try:
+            cut = await transcoder.cut(
+                stt_content, details["container"], vad_details["start"], vad_details["end"]
+            )
+            if len(cut) >= 1000:
+                return cut, stt_filename
+        except Exception as e:
+            print(f"Could not cut {details['container']} audio, sending WAV: {e}")
+    
+    return vad.write_wav(speech, sample_rate), "input.wav"
+
+def log_stt_input(details: Dict, stt_bytes: int, stt_ms: float, duration: Optional[float]):
+    """Log what was sent to STT, how long it took and the bytes saved versus 16 kHz WAV"""
+    message = (
+        f"STT input {details.get('upload_sha256', '')[:12]}: "
+        f"{details['container']} ({details['mode']}), {stt_bytes} bytes sent, "
+        f"transcode {details['transcode_ms']:.0f} ms, VAD {details.get('vad_ms', 0.0):.0f} ms, "
+        f"STT {stt_ms:.0f} ms"
+    )
+    if details.get("trimmed_seconds"):
+        message += f", {details['trimmed_seconds']:.1f} s of silence trimmed"
+    if details["mode"] == "native" and duration:
+        # 16 kHz, 16-bit mono PCM plus a 44-byte header
+        wav_bytes = int(duration * 16000) * 2 + 44
+        message += f", ~{wav_bytes - stt_bytes} bytes saved vs WAV"
+    print(message)
+
+def _synthesize_to_file(text: str, language: str, output_path: str) -> bool:
+    """Generate speech for text and write it to output_path (blocking)"""
+    return get_speech_service().text_to_speech_file(text, language, output_path)
+
+def speech_url(session_id: str, counter: int) -> str:
+    """URL of the streaming speech endpoint for a response"""
+    return f"http://localhost:8000/api/session/{session_id}/speech/{counter}"
+
+def queue_streamed_response(session: Dict, session_id: str, text: str, counter: int) -> str:
+    """Register text to be synthesized when the client fetches its speech URL"""
+    session["pending_speech"][counter] = text
+    return speech_url(session_id, counter)
+
+async def synthesize_stream(text: str, language: str):
+    """Stream TTS chunks for text, running the blocking SDK iterator on the TTS pool"""
+    with timed("tts_stream"):
+        chunks = await run_blocking("tts", get_speech_service().text_to_speech_stream, text, language)
+        while True:
+            chunk = await run_blocking("tts", next, chunks, None)
+            if chunk is None:
+                break
+            count_bytes("tts_stream", "out", len(chunk))
+            yield chunk
+    count_bytes("tts_stream", "in", len(text.encode("utf-8")))
+
+def start_speech_pipeline(language: str) -> SpeechPipeline:
+    """A pipeline speaking a reply in language; sentence by sentence if SPEECH_PIPELINE is on"""
+    return SpeechPipeline(
+        lambda text: synthesize_stream(text, language),
+        split=SPEECH_PIPELINE,
+        max_concurrent=SPEECH_PIPELINE_CONCURRENCY
+    )
+
+async def save_speech(session_id: str, counter: int, chunks):
+    """Pass speech chunks through while writing them to response_NNN.mp3; the file is
+    only published once all chunks arrived"""
+    name = f"response_{counter:03d}.mp3"
+    output_path = audio_store.path(session_id, name)
+    partial_path = audio_store.partial_path(session_id, name)
+    
+    try:
+        async with aiofiles.open(partial_path, 'wb') as f:
+            async for chunk in chunks:
+                await f.write(chunk)
+                yield chunk
+        os.replace(partial_path, output_path)
+        await run_blocking("audio", audio_store.record, session_id, name)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+
+class SpeechBroadcast:
+    """One response's speech being synthesized, shared by every request for it.
+
+    The synthesis runs as a task of its own, so it is paid for once and the file
+    is still saved if the client that started it goes away. Each listener gets
+    all chunks from the first one, then the rest as they arrive.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = []
+        self.error: Optional[Exception] = None
+        self.done = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(chunks))
+
+    async def _run(self, chunks):
+        try:
+            async for chunk in chunks:
+                self.chunks.append(chunk)
+                self._changed.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+
+    async def listen(self):
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                self._changed.clear()
+                await self._changed.wait()
+
+# (session ID, response counter) -> speech being synthesized for a speech URL
+speech_broadcasts: Dict[Tuple[str, int], SpeechBroadcast] = {}
+
+async def stream_speech(session: Dict, session_id: str, counter: int, language: str):
+    """Tee TTS chunks to response_NNN.mp3 and pass them on"""
+    text = session["pending_speech"][counter]
+    async for chunk in save_speech(session_id, counter, synthesize_stream(text, language)):
+        yield chunk
+    session["pending_speech"].pop(counter, None)
+
+def join_speech(session: Dict, session_id: str, counter: int, language: str) -> SpeechBroadcast:
+    """The in-flight synthesis of a response's speech, started if there is none"""
+    key = (session_id, counter)
+    broadcast = speech_broadcasts.get(key)
+    if broadcast is None:
+        broadcast = SpeechBroadcast(stream_speech(session, session_id, counter, language))
+        speech_broadcasts[key] = broadcast
+        broadcast.task.add_done_callback(lambda _: speech_broadcasts.pop(key, None))
+    return broadcast
+
+async def save_pipelined_speech(session_id: str, pipeline: SpeechPipeline, counter: int) -> str:
+    """Wait for a pipeline's remaining audio, save it as the response file and return the URL"""
+    with timed("tts"):
+        async for _ in save_speech(session_id, counter, pipeline.audio()):
+            pass
+    return audio_url(session_id, f"response_{counter:03d}.mp3")
 
 async def generate_audio_response(session_id: str, text: str, language: str, counter: int) -> str:
     """Generate audio response from text and return the URL"""
-    session_dir = create_session_audio_dir(session_id)
-    output_path = os.path.join(session_dir, f"response_{counter:03d}.mp3")
-    
-    # Create a temporary audio interface instance
-    audio_interface = AudioInterface()
+    name = f"response_{counter:03d}.mp3"
+    output_path = audio_store.path(session_id, name)
     
-    try:
-        # Generate speech and save to file
-        success = audio_interface.text_to_speech_file(text, language, output_path)
+    # Generate speech and save to file
+    with timed("tts"):
+        success = await run_blocking("tts", _synthesize_to_file, text, language, output_path)
         if not success:
             raise Exception("Failed to generate audio response")
+    count_bytes("tts", "in", len(text.encode("utf-8")))
+    count_bytes("tts", "out", os.path.getsize(output_path))
+    await run_blocking("audio", audio_store.record, session_id, name)
+    
+    # Return the URL
+    return audio_url(session_id, name)
+
+async def transcribe(session_id: str, session: Dict, filename: str, content: bytes,
+                     upload_sha256: str) -> Tuple[str, str]:
+    """Speech-to-text for a recorded turn. The caller holds the session's turn lock.
+    Returns (user_input, language_code)"""
+    # Transcode in memory if needed (no intermediate files)
+    try:
+        if ARCHIVE_UPLOADS:
+            await save_audio_file(session_id, filename, content, session["audio_counter"])
+        stt_content, stt_filename, stt_details = await negotiate_stt_input(filename, content)
+        stt_details["upload_sha256"] = upload_sha256
+        if VAD_ENABLED:
+            speech = await trim_to_speech(stt_content, stt_filename, stt_details)
+            if speech is not None:
+                stt_content, stt_filename = speech
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read audio: {str(e)}")
+    
+    if VAD_ENABLED and speech is None:
+        raise HTTPException(status_code=422, detail="No speech detected in the recording")
+    
+    # Process audio through speech-to-text
+    try:
+        stt_started = time.perf_counter()
+        with timed("stt"):
+            stt_result = await run_blocking(
+                "stt", get_speech_service().speech_to_text, stt_content, stt_filename
+            )
+        count_bytes("stt", "in", len(stt_content))
+        log_stt_input(
+            stt_details,
+            len(stt_content),
+            (time.perf_counter() - stt_started) * 1000,
+            stt_result.get('duration') if isinstance(stt_result, dict) else None
+        )
         
-        # Return the URL
-        return f"http://localhost:8000/audio/{session_id}/response_{counter:03d}.mp3"
-    finally:
-        audio_interface.cleanup()
+        if isinstance(stt_result, dict):
+            user_input = stt_result.get('text', '')
+            language_code = stt_result.get('language_code', '')
+        else:
+            # Backward compatibility
+            user_input = stt_result
+            language_code = ''
+        count_bytes("stt", "out", len((user_input or '').encode("utf-8")))
+    
+        # Log the user's transcribed text for debugging
+        print(f"User transcribed text: '{user_input}'")
+        print(f"Detected language code: '{language_code}'")
+    
+        if not user_input or user_input.strip() == '':
+            # Don't raise an error, just return a default response
+            user_input = "I didn't catch that, could you please repeat?"
+            print(f"Using default user input: '{user_input}'")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Speech-to-text failed: {str(e)}")
+    
+    return user_input, language_code
+
+async def respond(chatbot: VoiceLanguageLearningChatbot, user_input: str, language_code: str,
+                  pipeline: Optional[SpeechPipeline] = None) -> Tuple[str, bool]:
+    """Generate the chatbot's reply, feeding it to pipeline as it streams; the pipeline
+    has the whole reply before the step check runs. Returns (ai_response, is_complete)"""
+    on_text = pipeline.feed_threadsafe if pipeline is not None else None
+    on_reply = pipeline.finish_threadsafe if pipeline is not None else None
+    try:
+        with timed("chatbot_turn"):
+            ai_response, is_complete = await run_blocking(
+                "llm", chatbot.generate_response, user_input, language_code, on_text, on_reply
+            )
+    except Exception as e:
+        if pipeline is not None:
+            pipeline.cancel()
+        raise HTTPException(status_code=500, detail=f"Failed to generate response: {str(e)}")
+    
+    if pipeline is not None:
+        pipeline.finish(ai_response)
+    return ai_response, is_complete
 
 # API Routes
 @app.on_event("startup")
 async def startup_event():
     """Initialize the API server"""
     print("Voice Chatbot API Server started")
-    print(f"Loaded {len(SCENARIOS)} scenarios")
-    cleanup_expired_sessions()
+    print(f"Loaded {len(scenario_registry)} scenarios")
+    print(f"Chat engine: {CHAT_ENGINE}")
+    print(f"Session store: {SESSION_STORE_URL}")
+    await cleanup_expired_sessions()
+    
+    # Index audio left on disk and remove directories of sessions that no longer exist
+    on_disk = await run_blocking("audio", audio_store.list_sessions)
+    live = {session_id for session_id in on_disk if await session_store.exists(session_id)}
+    report = await run_blocking("audio", audio_store.reconcile, live)
+    print(f"Audio store: {report['files']} files, {report['bytes']} bytes, "
+          f"{report['orphans_removed']} orphaned session directories removed")
+    
+    # Provider SDKs are imported lazily; load them in the background so the
+    # worker accepts requests right away and the first session does not wait
+    asyncio.create_task(warm_up_providers())
+
+async def warm_up_providers():
+    """Import the Gemini and ElevenLabs SDKs off the event loop"""
+    if replaying():
+        return
+    try:
+        await asyncio.gather(
+            run_blocking("llm", load_genai),
+            run_blocking("tts", importlib.import_module, "elevenlabs.client")
+        )
+    except Exception as e:
+        print(f"Provider warm-up failed: {e}")
 
 @app.post("/api/session/start", response_model=SessionStartResponse)
+@timed_handler("session_start")
 async def start_session(request: SessionStartRequest):
     """Start a new conversation session"""
     print(f"Session start request: scenario={request.scenario}, language={request.language}")
     
     # Validate scenario
-    if request.scenario not in SCENARIOS:
+    # Pick up scenario files edited since the last check
+    scenario_registry.refresh()
+    scenario = scenario_registry.get(request.scenario)
+    if scenario is None:
         print(f"Invalid scenario: {request.scenario}")
         raise HTTPException(status_code=400, detail=f"Invalid scenario: {request.scenario}")
     
@@ -223,147 +686,413 @@ async def start_session(request: SessionStartRequest):
     
     # Initialize chatbot
     try:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
-        
-        chatbot = VoiceLanguageLearningChatbot(
-            api_key=api_key,
-            scenario=SCENARIOS[request.scenario],
-            language=language
-        )
+        chatbot = await run_blocking("llm", create_chatbot, request.scenario, language)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to initialize chatbot: {str(e)}")
     
     # Start conversation
     try:
-        initial_message = chatbot.start_conversation()
+        initial_message = await run_blocking("llm", chatbot.start_conversation)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start conversation: {str(e)}")
     
-    # Generate initial audio response
-    try:
-        audio_url = await generate_audio_response(
-            session_id=session_id,
-            text=initial_message,
-            language=language,
-            counter=0
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate audio: {str(e)}")
-    
-    # Store session
-    sessions[session_id] = {
+    session = {
         "chatbot": chatbot,
         "created_at": datetime.now(),
         "last_activity": datetime.now(),
         "scenario": request.scenario,
         "language": language,
-        "audio_counter": 1  # Next audio file number
+        "audio_counter": 1,  # Next audio file number
+        "pending_speech": {}  # Response counter -> text awaiting streamed synthesis
     }
     
+    # Generate initial audio response
+    try:
+        if request.stream:
+            audio_url = queue_streamed_response(session, session_id, initial_message, counter=0)
+        else:
+            audio_url = await generate_audio_response(
+                session_id=session_id,
+                text=initial_message,
+                language=language,
+                counter=0
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate audio: {str(e)}")
+    
+    # Store session
+    await session_store.save(session_id, session)
+    
     return SessionStartResponse(
         sessionId=session_id,
         message=initial_message,
         audioUrl=audio_url,
         scenario={
-            "title": SCENARIOS[request.scenario]["title"],
-            "role": SCENARIOS[request.scenario]["role"]
+            "title": scenario.title,
+            "role": scenario.role
         }
     )
 
 @app.post("/api/session/{session_id}/process", response_model=AudioProcessResponse)
-async def process_audio(session_id: str, audio: UploadFile = File(...)):
+@timed_handler("turn")
+async def process_audio(session_id: str, background_tasks: BackgroundTasks,
+                        audio: UploadFile = File(...), stream: bool = False):
     """Process user audio input and return AI response"""
-    # Get session
-    session = get_session(session_id)
-    chatbot = session["chatbot"]
+    # Check the session exists before reading the upload; it is loaded under the lock
+    if not await session_store.exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
     
     # Validate audio file
     if not audio.filename:
         raise HTTPException(status_code=400, detail="No audio file provided")
     
-    # Check file size (max 10MB)
-    if audio.size and audio.size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="Audio file too large (max 10MB)")
-    
-    # Save audio file
-    try:
-        input_path = await save_audio_file(session_id, audio, session["audio_counter"])
-        wav_path = await convert_to_wav(input_path)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save audio: {str(e)}")
+    # Read the upload in chunks, enforcing the size limit and hashing it
+    with timed("upload"):
+        content, upload_sha256 = await read_upload(audio, MAX_UPLOAD_BYTES)
+    count_bytes("upload", "in", len(content))
     
-    # Process audio through speech-to-text
+    # Turns within a session run one at a time (across workers too); other sessions
+    # proceed concurrently. The session is loaded under the lock so it is current.
+    lock = session_store.lock(session_id)
+    await lock.acquire()
+    release_lock = True
     try:
-        # Check if the audio file exists and has content
-        import os
-        if not os.path.exists(wav_path) or os.path.getsize(wav_path) < 1000:
-            # Try to process with the original file if conversion failed
-            wav_path = input_path
+        session = await get_session(session_id)
+        chatbot = session["chatbot"]
         
-        audio_interface = AudioInterface()
-        stt_result = audio_interface.speech_to_text(wav_path)
+        user_input, language_code = await transcribe(
+            session_id, session, audio.filename, content, upload_sha256
+        )
         
-        if isinstance(stt_result, dict):
-            user_input = stt_result.get('text', '')
-            language_code = stt_result.get('language_code', '')
-        else:
-            # Backward compatibility
-            user_input = stt_result
-            language_code = ''
+        # Without streaming, speech is synthesized while the reply is still being generated
+        pipeline = start_speech_pipeline(session["language"]) if SPEECH_PIPELINE and not stream else None
+        ai_response, is_complete = await respond(chatbot, user_input, language_code, pipeline)
         
-        # Log the user's transcribed text for debugging
-        print(f"User transcribed text: '{user_input}'")
-        print(f"Detected language code: '{language_code}'")
+        # Generate audio response
+        try:
+            if stream:
+                audio_url = queue_streamed_response(
+                    session, session_id, ai_response, session["audio_counter"]
+                )
+            elif pipeline is not None:
+                audio_url = await save_pipelined_speech(session_id, pipeline, session["audio_counter"])
+            else:
+                audio_url = await generate_audio_response(
+                    session_id=session_id,
+                    text=ai_response,
+                    language=session["language"],
+                    counter=session["audio_counter"]
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to generate audio: {str(e)}")
         
-        if not user_input or user_input.strip() == '':
-            # Don't raise an error, just return a default response
-            user_input = "I didn't catch that, could you please repeat?"
-            print(f"Using default user input: '{user_input}'")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Speech-to-text failed: {str(e)}")
-    finally:
-        audio_interface.cleanup()
-    
-    # Generate AI response
-    try:
-        ai_response, is_complete = chatbot.generate_response(user_input, language_code)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate response: {str(e)}")
-    
-    # Generate audio response
-    try:
-        audio_url = await generate_audio_response(
-            session_id=session_id,
-            text=ai_response,
-            language=session["language"],
-            counter=session["audio_counter"]
+        # Update session
+        session["audio_counter"] += 1
+        session["last_activity"] = datetime.now()
+        await session_store.save(session_id, session)
+        
+        # A stored session must include the deferred step evaluation and summary, so
+        # apply them after the response is sent and keep the turn lock until it is saved
+        if session_store.persistent and (chatbot.has_pending_evaluation() or chatbot.has_pending_summary()):
+            background_tasks.add_task(settle_and_save, session_id, session, lock)
+            release_lock = False
+        
+        # Get current step info
+        current_step = chatbot.get_current_step()
+
+        return AudioProcessResponse(
+            message=ai_response,
+            audioUrl=audio_url,
+            isComplete=is_complete,
+            currentStep=current_step["name"],
+            userText=user_input  # Include the user's transcribed text
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate audio: {str(e)}")
+    finally:
+        if release_lock:
+            await lock.release()
+
+@app.get("/api/session/{session_id}/speech/{counter}")
+async def get_speech(session_id: str, counter: int):
+    """Stream a response's speech as it is synthesized, or serve it once finished"""
+    session = await get_session(session_id)
     
-    # Update session
-    session["audio_counter"] += 1
-    session["last_activity"] = datetime.now()
+    name = f"response_{counter:03d}.mp3"
+    if audio_store.exists(session_id, name):
+        return FileResponse(audio_store.path(session_id, name), media_type="audio/mpeg")
     
-    # Get current step info
-    current_step = chatbot.get_current_step()
+    # A retry or range request while the speech is still being synthesized joins it
+    if (session_id, counter) not in speech_broadcasts and counter not in session["pending_speech"]:
+        raise HTTPException(status_code=404, detail="Audio not found")
     
-    return AudioProcessResponse(
-        message=ai_response,
-        audioUrl=audio_url,
-        isComplete=is_complete,
-        currentStep=current_step["name"],
-        userText=user_input  # Include the user's transcribed text
-    )
+    broadcast = join_speech(session, session_id, counter, session["language"])
+    return StreamingResponse(broadcast.listen(), media_type="audio/mpeg")
+
+class ConversationSocket:
+    """A full-duplex conversation over one WebSocket, on an existing session.
+
+    Binary messages from the client are mic audio frames (e.g. MediaRecorder
+    chunks); the frames of one utterance together form a recording. Text messages
+    are JSON controls: {"type": "start", "format": "webm"} (optional),
+    {"type": "end"} when the user stops speaking and {"type": "cancel"}.
+
+    As soon as the first frame arrives, the session's turn lock is taken and the
+    previous turn's step evaluation is settled, so after the end of speech only
+    STT, the chatbot and TTS remain. Events are sent as JSON as they happen
+    (speech_end, transcript, reply, step) and reply audio as binary MP3 frames
+    between audio_start and audio_end. Audio starts with the reply's first
+    sentence, so the reply event may arrive while it is streaming or just after
+    audio_end; it always precedes the next utterance's events. The user can
+    start the next utterance while a reply is still streaming; replies are sent
+    in order.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, session: Dict):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.step_name = session["chatbot"].get_current_step()["name"]
+        self._send_lock = asyncio.Lock()
+        self._previous_turn: Optional[asyncio.Task] = None
+        self._turns = set()
+        self._reset_utterance()
+
+    def _reset_utterance(self, audio_format: str = "webm"):
+        self.frames = FrameBuffer(MAX_UPLOAD_BYTES)
+        self.audio_format = audio_format
+        self.rejected = False  # Frames past the size limit are dropped until the next utterance
+        self.prepared: Optional[asyncio.Task] = None
+
+    async def send_event(self, event_type: str, **fields):
+        async with self._send_lock:
+            await self.websocket.send_json({"type": event_type, **fields})
+
+    async def run(self):
+        await self.send_event("ready", sessionId=self.session_id, currentStep=self.step_name)
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await self.on_frame(message["bytes"])
+                elif message.get("text") is not None:
+                    await self.on_control(message["text"])
+        finally:
+            await self.discard_utterance()
+            # Let turns in flight finish updating the session
+            if self._turns:
+                await asyncio.gather(*self._turns, return_exceptions=True)
+
+    async def on_frame(self, frame: bytes):
+        if self.rejected:
+            return
+        try:
+            self.frames.append(frame)
+        except HTTPException as e:
+            await self.discard_utterance()
+            self.rejected = True
+            await self.send_event("error", detail=e.detail)
+            return
+        count_bytes("upload", "in", len(frame))
+        if self.prepared is None:
+            self.prepared = asyncio.create_task(self.prepare_turn())
+
+    async def on_control(self, text: str):
+        try:
+            control = json.loads(text)
+            control_type = control["type"]
+        except (ValueError, TypeError, KeyError):
+            await self.send_event("error", detail="Expected a JSON object with a type")
+            return
+
+        if control_type == "start":
+            await self.discard_utterance()
+            self._reset_utterance(str(control.get("format", "webm")).lower())
+        elif control_type == "end":
+            await self.end_utterance()
+        elif control_type == "cancel":
+            await self.discard_utterance()
+        else:
+            await self.send_event("error", detail=f"Unknown message type: {control_type}")
+
+    async def prepare_turn(self):
+        """Take the turn lock and settle the last step evaluation while the user speaks"""
+        lock = session_store.lock(self.session_id)
+        await lock.acquire()
+        try:
+            session = await get_session(self.session_id)
+            await run_blocking("llm", session["chatbot"].settle_step_evaluation)
+        except BaseException:
+            await lock.release()
+            raise
+        return session, lock
+
+    async def discard_utterance(self):
+        """Drop the current utterance, releasing the turn lock if it was taken"""
+        prepared = self.prepared
+        self._reset_utterance(self.audio_format)
+        if prepared is None:
+            return
+        prepared.cancel()
+        try:
+            _, lock = await prepared
+        except (asyncio.CancelledError, Exception):
+            return
+        await lock.release()
+
+    async def end_utterance(self):
+        if self.rejected or self.prepared is None:
+            if not self.rejected:
+                await self.send_event("error", detail="No audio received")
+            self._reset_utterance(self.audio_format)
+            return
+
+        content, upload_sha256 = self.frames.content()
+        filename = f"recording.{self.audio_format}"
+        prepared = self.prepared
+        self._reset_utterance(self.audio_format)
+        await self.send_event("speech_end", bytes=len(content))
+
+        turn = asyncio.create_task(self.run_turn(prepared, filename, content, upload_sha256, self._previous_turn))
+        self._previous_turn = turn
+        self._turns.add(turn)
+        turn.add_done_callback(self._turns.discard)
+
+    async def run_turn(self, prepared: asyncio.Task, filename: str, content: bytes, upload_sha256: str,
+                       previous: Optional[asyncio.Task]):
+        """Answer one utterance and stream the reply audio"""
+        try:
+            with timed("ws_turn"):
+                await self._run_turn(prepared, filename, content, upload_sha256, previous)
+        except HTTPException as e:
+            try:
+                await self.send_event("error", detail=e.detail)
+            except Exception:
+                pass
+        except Exception as e:
+            # Typically the client disconnected while the reply was being sent
+            print(f"WebSocket turn for session {self.session_id} ended early: {e}")
+
+    async def _run_turn(self, prepared: asyncio.Task, filename: str, content: bytes, upload_sha256: str,
+                        previous: Optional[asyncio.Task]):
+        session, lock = await prepared
+        try:
+            user_input, language_code = await transcribe(
+                self.session_id, session, filename, content, upload_sha256
+            )
+        except BaseException:
+            await lock.release()
+            raise
+        
+        # The reply is spoken sentence by sentence as Gemini writes it; synthesis starts
+        # right away, even while the previous reply is still being sent
+        counter = session["audio_counter"]
+        pipeline = start_speech_pipeline(session["language"])
+        replying = asyncio.create_task(
+            self.reply_and_save(session, lock, user_input, language_code, pipeline)
+        )
+        announcing = None
+        
+        try:
+            # Keep events and audio in utterance order
+            if previous is not None:
+                await asyncio.wait([previous])
+            
+            await self.send_event("transcript", text=user_input, languageCode=language_code)
+            announcing = asyncio.create_task(self.announce_reply(replying, session["chatbot"]))
+            
+            await self.send_event("audio_start", counter=counter, format="audio/mpeg")
+            size = 0
+            try:
+                async for chunk in save_speech(self.session_id, counter, pipeline.audio()):
+                    async with self._send_lock:
+                        await self.websocket.send_bytes(chunk)
+                    size += len(chunk)
+            except SpeechCancelled:
+                # The reply failed; awaiting it raises the reason
+                await replying
+                raise
+            
+            await self.send_event(
+                "audio_end", counter=counter, bytes=size,
+                audioUrl=audio_url(self.session_id, f"response_{counter:03d}.mp3")
+            )
+            # isComplete needs the step check, which may still be running
+            await announcing
+        finally:
+            pipeline.cancel()
+            if announcing is not None and not announcing.done():
+                announcing.cancel()
+            # Wait for the session to be saved and its lock handed on, whatever happened here
+            _, _, settling = await replying
+        
+        if settling is not None:
+            await settling
+            await self.send_step_change(session["chatbot"])
+
+    async def reply_and_save(self, session: Dict, lock, user_input: str, language_code: str,
+                             pipeline: SpeechPipeline) -> Tuple[str, bool, Optional[asyncio.Task]]:
+        """Generate the reply into pipeline, then store the session and release its turn lock.
+        Returns (ai_response, is_complete, task applying a deferred step evaluation or None)"""
+        chatbot = session["chatbot"]
+        try:
+            ai_response, is_complete = await respond(chatbot, user_input, language_code, pipeline)
+            session["audio_counter"] += 1
+            session["last_activity"] = datetime.now()
+            await session_store.save(self.session_id, session)
+        except BaseException:
+            await lock.release()
+            raise
+        
+        # Check step completion (and, for a stored session, finish the summary) while
+        # the reply streams; the next turn waits for it
+        if chatbot.has_pending_evaluation() or (session_store.persistent and chatbot.has_pending_summary()):
+            settling = asyncio.create_task(settle_and_save(self.session_id, session, lock))
+            return ai_response, is_complete, settling
+        await lock.release()
+        return ai_response, is_complete, None
+
+    async def announce_reply(self, replying: asyncio.Task, chatbot: VoiceLanguageLearningChatbot):
+        """Send the reply text, and any step change, as soon as the reply is complete"""
+        try:
+            ai_response, is_complete, _ = await replying
+        except Exception:
+            # Reported by the turn itself
+            return
+        await self.send_event("reply", text=ai_response, isComplete=is_complete)
+        await self.send_step_change(chatbot)
+
+    async def send_step_change(self, chatbot: VoiceLanguageLearningChatbot):
+        current_step = chatbot.get_current_step()
+        if current_step["name"] != self.step_name:
+            self.step_name = current_step["name"]
+            await self.send_event(
+                "step",
+                currentStep=current_step["name"],
+                stepName=current_step["name"].replace('_', ' ').title(),
+                isComplete=chatbot.is_conversation_complete()
+            )
+
+@app.websocket("/api/session/{session_id}/ws")
+async def conversation_socket(websocket: WebSocket, session_id: str):
+    """Full-duplex conversation: mic audio frames in, events and reply audio out"""
+    await websocket.accept()
+    try:
+        session = await get_session(session_id)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=WS_CLOSE_SESSION_NOT_FOUND)
+        return
+
+    await ConversationSocket(websocket, session_id, session).run()
 
 @app.get("/api/session/{session_id}/status", response_model=SessionStatusResponse)
 async def get_session_status(session_id: str):
     """Get current session status"""
-    session = get_session(session_id)
+    session = await get_session(session_id)
     chatbot = session["chatbot"]
     
+    # Report step state only after any background evaluation has been applied
+    await run_blocking("llm", chatbot.settle_step_evaluation)
     current_step = chatbot.get_current_step()
     
     return SessionStatusResponse(
@@ -371,28 +1100,28 @@ async def get_session_status(session_id: str):
         currentStep=current_step["name"],
         stepName=current_step["name"].replace('_', ' ').title(),
         isComplete=chatbot.is_conversation_complete(),
-        exchangeCount=current_step["exchange_count"]
+        exchangeCount=chatbot.get_current_exchange_count(),
+        promptTokens=chatbot.last_prompt_tokens
     )
 
 @app.delete("/api/session/{session_id}")
 async def end_session(session_id: str):
     """End a conversation session and clean up resources"""
-    if session_id not in sessions:
+    session = await session_store.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Clean up chatbot
     try:
-        sessions[session_id]["chatbot"].cleanup()
+        session["chatbot"].cleanup()
     except:
         pass  # Ignore cleanup errors
     
-    # Clean up audio files
-    session_dir = os.path.join(AUDIO_DIR, session_id)
-    if os.path.exists(session_dir):
-        shutil.rmtree(session_dir)
-    
     # Remove session
-    del sessions[session_id]
+    await session_store.delete(session_id)
+    
+    # Clean up audio files
+    await run_blocking("audio", audio_store.remove_sessions, [session_id])
     
     return {"message": "Session ended successfully"}
 
@@ -419,7 +1148,45 @@ async def options_session_end(session_id: str):
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "active_sessions": len(sessions)}
+    return {
+        "status": "healthy",
+        "active_sessions": await session_store.count(),
+        "session_expiry": expiry_stats,
+        "audio_store": audio_store.stats(),
+        "scenarios": scenario_registry.stats(),
+        "providers": provider_stats(),
+        "tts_cache": get_speech_service().cache.stats(),
+        "translation_cache": translation_cache.stats()
+    }
+
+ACTIVE_SESSIONS = REGISTRY.gauge("voicechat_active_sessions", "Sessions in the session store")
+
+def collect_store_metrics():
+    """Cache, audio store and session expiry figures for /api/metrics"""
+    caches = [("translation", translation_cache.stats())]
+    if speech_service is not None and speech_service.cache is not None:
+        caches.append(("tts", speech_service.cache.stats()))
+    audio = audio_store.stats()
+    return [
+        ("voicechat_cache_hits_total", "counter", "Cache lookups answered from the cache",
+         [({"cache": name}, stats["hits"]) for name, stats in caches]),
+        ("voicechat_cache_misses_total", "counter", "Cache lookups that went to the provider",
+         [({"cache": name}, stats["misses"]) for name, stats in caches]),
+        ("voicechat_audio_store_bytes", "gauge", "Bytes of session audio on disk",
+         [({}, audio["bytes"])]),
+        ("voicechat_audio_store_evictions_total", "counter", "Audio files deleted to stay within quota",
+         [({}, audio["evictions"])]),
+        ("voicechat_expired_sessions_total", "counter", "Sessions removed after their idle timeout",
+         [({}, expiry_stats["expired_sessions"])]),
+    ]
+
+REGISTRY.register_collector(collect_store_metrics)
+
+@app.get("/api/metrics")
+async def metrics():
+    """Per-stage latency histograms and counters in the Prometheus text format"""
+    ACTIVE_SESSIONS.set(value=await session_store.count())
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Add a catch-all OPTIONS handler (must be after all other routes)
 @app.options("/{path:path}")
@@ -427,14 +1194,27 @@ async def options_catch_all(path: str):
     """Handle OPTIONS preflight requests for all paths"""
     return {"status": "ok"}
 
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Stop the blocking-call worker pools"""
+    for executor in executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    if speech_service is not None:
+        speech_service.close()
+    translation_cache.close()
+    await session_store.close()
+
 # Run cleanup periodically
 @app.on_event("startup")
 async def setup_cleanup_task():
     """Setup periodic cleanup of expired sessions"""
     async def cleanup_task():
         while True:
-            await asyncio.sleep(300)  # Run every 5 minutes
-            cleanup_expired_sessions()
+            await asyncio.sleep(SESSION_SWEEP_SECONDS)
+            try:
+                await cleanup_expired_sessions()
+            except Exception as e:
+                print(f"Session cleanup failed: {e}")
     
     asyncio.create_task(cleanup_task())
 
@@ -3,21 +3,21 @@ import pyaudio
 import wave
 import tempfile
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
 from elevenlabs.play import play
 import threading
 import time
 import io
 import pygame
+from speech_service import SpeechService
+from vad import EndpointDetector, trim_silence
 
 load_dotenv()
 
 class AudioInterface:
-    def __init__(self):
-        # Initialize ElevenLabs client
-        self.elevenlabs = ElevenLabs(
-            api_key=os.getenv("ELEVEN_API_KEY"),
-        )
+    def __init__(self, speech_service=None):
+        # Network STT/TTS is delegated to the (device-free) speech service
+        self.speech = speech_service or SpeechService()
+        self.elevenlabs = self.speech.elevenlabs
         
         # Audio recording parameters
         self.FORMAT = pyaudio.paInt16
@@ -25,22 +25,17 @@ class AudioInterface:
         self.RATE = 44100
         self.CHUNK = 1024
         self.RECORD_SECONDS = 5  # Maximum recording time
+        self.END_SILENCE_MS = 900  # Stop recording after this much silence following speech
         self.audio = pyaudio.PyAudio()
         
         # Initialize pygame mixer for audio playback
         pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
         
         # Voice mappings for different languages
-        self.voice_mappings = {
-            "english": "UpphzPau5vxibPYV2NeV",
-            "spanish": "9EU0h6CVtEDS6vriwwq5",
-            "french": "ohItIVrXTBI80RrUECOD",
-            "chinese": "ZL9dtgFhmkTzAHUUtQL8",
-            "japanese": "3JDquces8E8bkmvbh6Bc"
-        }
+        self.voice_mappings = self.speech.voice_mappings
     
     def record_audio(self, max_seconds=5):
-        """Record audio from microphone and save to temporary file."""
+        """Record audio from microphone until the speaker pauses and save to temporary file."""
         print("\n🎤 Recording... Speak now (press Enter to stop early)")
         
         stream = self.audio.open(format=self.FORMAT,
@@ -50,6 +45,7 @@ class AudioInterface:
                                 frames_per_buffer=self.CHUNK)
         
         frames = []
+        detector = EndpointDetector(self.RATE, end_silence_ms=self.END_SILENCE_MS)
         
         # Start recording in a separate thread to allow early termination
         stop_recording = threading.Event()
@@ -63,81 +59,49 @@ class AudioInterface:
         input_thread.start()
         
         start_time = time.time()
+        end_of_speech = False
         while not stop_recording.is_set() and (time.time() - start_time) < max_seconds:
             data = stream.read(self.CHUNK)
             frames.append(data)
+            if detector.feed(data):
+                end_of_speech = True
+                break
         
         stream.stop_stream()
         stream.close()
         
-        if stop_recording.is_set():
+        if end_of_speech:
+            print("Recording stopped after you finished speaking")
+        elif stop_recording.is_set():
             print("Recording stopped by user")
         else:
             print("Maximum recording time reached")
         
-        # Save to temporary file
+        return self._save_recording(frames)
+    
+    def _save_recording(self, frames):
+        """Write recorded frames to a temporary WAV file, without leading and trailing silence."""
+        pcm = b''.join(frames)
+        speech, _ = trim_silence(pcm, self.RATE)
+        
         temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
         with wave.open(temp_file.name, 'wb') as wf:
             wf.setnchannels(self.CHANNELS)
             wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
             wf.setframerate(self.RATE)
-            wf.writeframes(b''.join(frames))
+            # Keep everything if no speech was found and let STT have the final word
+            wf.writeframes(speech or pcm)
         
         return temp_file.name
     
     def speech_to_text(self, audio_file_path):
         """Convert audio file to text using ElevenLabs STT."""
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                transcription = self.elevenlabs.speech_to_text.convert(
-                    file=audio_file,
-                    model_id="scribe_v1",
-                    tag_audio_events=False,
-                    diarize=False,
-                )
-            
+            return self.speech.speech_to_text(audio_file_path)
+        finally:
             # Clean up temporary file
             if os.path.exists(audio_file_path):
                 os.unlink(audio_file_path)
-            
-            # Extract both text and language_code from the transcription response
-            result = {
-                'text': '',
-                'language_code': ''
-            }
-            
-            if hasattr(transcription, 'text') and hasattr(transcription, 'language_code'):
-                # Direct access to attributes
-                result['text'] = transcription.text.strip()
-                result['language_code'] = transcription.language_code
-            else:
-                # Parse from string representation
-                transcription_str = str(transcription)
-                
-                # Extract text
-                if 'text=' in transcription_str:
-                    import re
-                    text_match = re.search(r'text="([^"]*)"', transcription_str)
-                    if text_match:
-                        result['text'] = text_match.group(1).strip()
-                
-                # Extract language_code
-                if 'language_code=' in transcription_str:
-                    lang_match = re.search(r'language_code=\'([^\']*)\'', transcription_str)
-                    if lang_match:
-                        result['language_code'] = lang_match.group(1)
-                
-                # Fallback for text if not found
-                if not result['text']:
-                    result['text'] = transcription_str.strip()
-            
-            return result
-        except Exception as e:
-            print(f"Error in speech-to-text: {e}")
-            # Clean up temporary file even if there's an error
-            if os.path.exists(audio_file_path):
-                os.unlink(audio_file_path)
-            return {'text': '', 'language_code': ''}
     
     def text_to_speech(self, text, language="english"):
         """Convert text to speech using ElevenLabs TTS."""
@@ -172,39 +136,11 @@ class AudioInterface:
     
     def text_to_speech_file(self, text, language="english", output_path=None):
         """Convert text to speech and save to file using ElevenLabs TTS."""
-        try:
-            # Get appropriate voice for the language
-            voice_id = self.voice_mappings.get(language.lower(), "rachel")
-            
-            print(f"Generating speech with voice: {voice_id}")
-            print(f"Text to convert: '{text}'")
-            
-            audio = self.elevenlabs.text_to_speech.convert(
-                text=text,
-                voice_id=voice_id,
-                model_id="eleven_multilingual_v2",
-                output_format="mp3_44100_128",
-            )
-            
-            # If no output path provided, create a temporary file
-            if not output_path:
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-                    output_path = temp_file.name
-            
-            # Save audio to file
-            with open(output_path, "wb") as f:
-                for chunk in audio:
-                    f.write(chunk)
-            
-            print(f"✅ Audio saved to: {output_path}")
-            return True
-            
-        except Exception as e:
-            print(f"Error in text-to-speech: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+        return self.speech.text_to_speech_file(text, language, output_path)
+    
+    def text_to_speech_stream(self, text, language="english"):
+        """Start ElevenLabs TTS and return an iterator over MP3 chunks as they arrive."""
+        return self.speech.text_to_speech_stream(text, language)
     
     def record_and_transcribe(self, max_seconds=5):
         """Record audio and return transcribed text."""
@@ -243,15 +179,7 @@ class AudioInterface:
         
         print("Recording stopped")
         
-        # Save to temporary file
-        temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-        with wave.open(temp_file.name, 'wb') as wf:
-            wf.setnchannels(self.CHANNELS)
-            wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-            wf.setframerate(self.RATE)
-            wf.writeframes(b''.join(frames))
-        
-        return temp_file.name
+        return self._save_recording(frames)
     
     def record_and_transcribe_push_to_talk(self):
         """Record audio using push-to-talk and return transcribed text."""
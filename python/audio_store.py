@@ -0,0 +1,288 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Suffix of files still being written (never indexed, removed by reconcile)
+PARTIAL_SUFFIX = ".part"
+# Written into every session directory the store creates; reconcile only ever deletes
+# directories carrying it, so other audio under root (e.g. committed samples) is safe
+SESSION_MARKER = ".audio_store"
+
+
+def is_session_id(name: str) -> bool:
+    """Check if a directory name is a session ID (a UUID in canonical form)."""
+    try:
+        return str(uuid.UUID(name)) == name
+    except ValueError:
+        return False
+
+
+class AudioStore:
+    """Session audio files (uploads and synthesized responses) with bounded disk usage.
+
+    Files live under root/<first 2 chars of session id>/<session id>/<name>, so no
+    directory grows with the number of sessions. An in-memory index records every
+    file's size in write order; it is rebuilt from disk by reconcile() at startup.
+
+    Two byte quotas are enforced after every write by deleting the oldest files:
+    session_quota_bytes per session and max_bytes over the whole store. The file
+    just written is never evicted.
+
+    Only directories the store created itself (marked with SESSION_MARKER) are
+    ever garbage-collected; anything else found under root is left alone.
+    """
+
+    def __init__(self, root: str, session_quota_bytes: int, max_bytes: int,
+                 orphan_grace_seconds: float = 300):
+        self.root = root
+        self.session_quota_bytes = session_quota_bytes
+        self.max_bytes = max_bytes
+        self.orphan_grace_seconds = orphan_grace_seconds
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # (session id, name) -> size, oldest first
+        self._artifacts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # session id -> {name: size}, oldest first
+        self._sessions: Dict[str, "OrderedDict[str, int]"] = {}
+        self._session_bytes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._evictions = 0
+        self._orphans_removed = 0
+
+    def relative_dir(self, session_id: str) -> str:
+        """Session directory relative to root (also its URL path under /audio)."""
+        return f"{session_id[:2]}/{session_id}"
+
+    def session_dir(self, session_id: str) -> str:
+        """Create (if needed) and return a session's directory."""
+        path = os.path.join(self.root, session_id[:2], session_id)
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            open(os.path.join(path, SESSION_MARKER), "a").close()
+        return path
+
+    def path(self, session_id: str, name: str) -> str:
+        """Path of a session file (the directory is created if needed)."""
+        return os.path.join(self.session_dir(session_id), name)
+
+    def partial_path(self, session_id: str, name: str) -> str:
+        """A new, uniquely named partial file for writing name; concurrent writers of
+        the same file each get their own, so none can remove another's."""
+        fd, path = tempfile.mkstemp(prefix=f"{name}.", suffix=PARTIAL_SUFFIX, dir=self.session_dir(session_id))
+        os.fchmod(fd, 0o644)  # mkstemp creates it private; the finished file is served
+        os.close(fd)
+        return path
+
+    def exists(self, session_id: str, name: str) -> bool:
+        return os.path.exists(os.path.join(self.root, session_id[:2], session_id, name))
+
+    def write(self, session_id: str, name: str, data: bytes) -> str:
+        """Write a file atomically, index it and enforce quotas (blocking)."""
+        path = self.path(session_id, name)
+        partial_path = self.partial_path(session_id, name)
+        with open(partial_path, "wb") as f:
+            f.write(data)
+        os.replace(partial_path, path)
+        self.record(session_id, name)
+        return path
+
+    def record(self, session_id: str, name: str):
+        """Index a file written directly to path() and enforce quotas (blocking)."""
+        try:
+            size = os.path.getsize(self.path(session_id, name))
+        except OSError:
+            return
+
+        with self._lock:
+            self._forget(session_id, name)
+            self._add(session_id, name, size)
+            victims = self._select_evictions(session_id, name)
+            for victim in victims:
+                self._forget(*victim)
+            self._evictions += len(victims)
+
+        for victim_session, victim_name in victims:
+            try:
+                os.unlink(os.path.join(self.root, victim_session[:2], victim_session, victim_name))
+            except OSError:
+                pass
+
+    def remove_sessions(self, session_ids: Iterable[str]) -> int:
+        """Delete the directories of the given sessions (blocking); returns how many existed."""
+        removed = 0
+        for session_id in session_ids:
+            with self._lock:
+                for name in list(self._sessions.get(session_id, ())):
+                    self._forget(session_id, name)
+            session_dir = os.path.join(self.root, session_id[:2], session_id)
+            if os.path.isdir(session_dir):
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed += 1
+            self._remove_empty_shard(session_id)
+        return removed
+
+    def list_sessions(self) -> List[str]:
+        """IDs of all sessions with a directory on disk (blocking)."""
+        session_ids = []
+        for shard in self._scandirs(self.root):
+            if len(shard.name) == 2:
+                session_ids.extend(entry.name for entry in self._scandirs(shard.path))
+            elif is_session_id(shard.name):
+                # Pre-sharding layout: root/<session id>
+                session_ids.append(shard.name)
+        return session_ids
+
+    def reconcile(self, live_session_ids: Set[str]) -> Dict:
+        """Rebuild the index from disk and garbage-collect orphans (blocking).
+
+        Directories the store created for sessions not in live_session_ids are
+        deleted once they have been idle for orphan_grace_seconds, as are leftover
+        partial files. Session directories in the old flat layout (root/<session
+        id>) are deleted the same way if their session is gone, and moved into
+        their shard if it is live. Other directories (sharded ones without the
+        store's marker, names that are not session IDs) are never deleted.
+        """
+        cutoff = time.time() - self.orphan_grace_seconds
+        found = []
+        orphans = 0
+
+        for entry in self._scandirs(self.root):
+            if len(entry.name) == 2 or not is_session_id(entry.name):
+                continue
+            if entry.name in live_session_ids:
+                self._adopt_flat(entry.name)
+            elif entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                orphans += 1
+
+        for shard in self._scandirs(self.root):
+            if len(shard.name) != 2:
+                # Flat directory of a session still idling within the grace period,
+                # or not a session directory at all
+                continue
+
+            for session in self._scandirs(shard.path):
+                if session.name not in live_session_ids:
+                    marked = os.path.exists(os.path.join(session.path, SESSION_MARKER))
+                    if marked and session.stat().st_mtime < cutoff:
+                        shutil.rmtree(session.path, ignore_errors=True)
+                        orphans += 1
+                    continue
+
+                for entry in os.scandir(session.path):
+                    if not entry.is_file() or entry.name == SESSION_MARKER:
+                        continue
+                    stat = entry.stat()
+                    if entry.name.endswith(PARTIAL_SUFFIX):
+                        if stat.st_mtime < cutoff:
+                            os.unlink(entry.path)
+                        continue
+                    found.append((stat.st_mtime, session.name, entry.name, stat.st_size))
+            self._remove_empty_dir(shard.path)
+
+        found.sort()
+        with self._lock:
+            self._artifacts.clear()
+            self._sessions.clear()
+            self._session_bytes.clear()
+            self._total_bytes = 0
+            for _, session_id, name, size in found:
+                self._add(session_id, name, size)
+            self._orphans_removed += orphans
+
+        # Apply the global quota to what was found, oldest files first
+        if self._artifacts:
+            newest_session, newest_name = next(reversed(self._artifacts))
+            self.record(newest_session, newest_name)
+
+        return {"files": len(found), "bytes": self._total_bytes, "orphans_removed": orphans}
+
+    def _adopt_flat(self, session_id: str):
+        """Move a live session's directory from the old flat layout into its shard."""
+        target = os.path.join(self.root, session_id[:2], session_id)
+        if os.path.exists(target):
+            # Both layouts exist; keep the sharded one and fold the old files into it
+            for entry in os.scandir(os.path.join(self.root, session_id)):
+                if entry.is_file() and not os.path.exists(os.path.join(target, entry.name)):
+                    os.replace(entry.path, os.path.join(target, entry.name))
+            shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(self.root, session_id), target)
+        open(os.path.join(target, SESSION_MARKER), "a").close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "files": len(self._artifacts),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "session_quota_bytes": self.session_quota_bytes,
+                "evictions": self._evictions,
+                "orphans_removed": self._orphans_removed
+            }
+
+    def _add(self, session_id: str, name: str, size: int):
+        self._artifacts[(session_id, name)] = size
+        self._sessions.setdefault(session_id, OrderedDict())[name] = size
+        self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + size
+        self._total_bytes += size
+
+    def _forget(self, session_id: str, name: str):
+        size = self._artifacts.pop((session_id, name), None)
+        if size is None:
+            return
+        files = self._sessions[session_id]
+        del files[name]
+        self._session_bytes[session_id] -= size
+        self._total_bytes -= size
+        if not files:
+            del self._sessions[session_id]
+            del self._session_bytes[session_id]
+
+    def _select_evictions(self, session_id: str, keep_name: str) -> List[Tuple[str, str]]:
+        """Oldest files to delete so both quotas hold again, sparing (session_id, keep_name)."""
+        victims = []
+        freed = 0
+        keep = (session_id, keep_name)
+
+        session_bytes = self._session_bytes.get(session_id, 0)
+        for name, size in self._sessions.get(session_id, {}).items():
+            if session_bytes - freed <= self.session_quota_bytes:
+                break
+            if name != keep_name:
+                victims.append((session_id, name))
+                freed += size
+
+        chosen = set(victims)
+        for artifact, size in self._artifacts.items():
+            if self._total_bytes - freed <= self.max_bytes:
+                break
+            if artifact != keep and artifact not in chosen:
+                victims.append(artifact)
+                freed += size
+        return victims
+
+    def _remove_empty_shard(self, session_id: str):
+        self._remove_empty_dir(os.path.join(self.root, session_id[:2]))
+
+    @staticmethod
+    def _remove_empty_dir(path: str):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _scandirs(path: str):
+        try:
+            return [entry for entry in os.scandir(path) if entry.is_dir()]
+        except FileNotFoundError:
+            return []
@@ -0,0 +1,100 @@
+"""Measure the API server's import time and check its module boundary.
+
+Imports api_server in a fresh interpreter under `python -X importtime` and reports
+the total import time and the slowest modules. Fails (exit status 1) if:
+  - a module that the server must not load at import is imported: audio device
+    libraries, the local voice interface, the provider SDKs or numpy (loaded lazily)
+  - scenarios are loaded more than once
+  - the total import time exceeds --budget-ms
+
+Usage:
+    python benchmarks/bench_import.py [--runs 5] [--budget-ms 1500] [--top 15]
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Modules the API server must not import at module load
+FORBIDDEN_MODULES = (
+    "pyaudio",
+    "pygame",
+    "keyboard",
+    "audio_interface",
+    "elevenlabs.play",
+    "elevenlabs.client",
+    "google.generativeai",
+    "numpy",  # only voice activity detection needs it
+)
+
+
+IMPORT_CODE = "import api_server; print('scenario loads:', api_server.scenario_registry.loads)"
+
+
+def import_once():
+    """Import api_server in a new interpreter; returns ({module: cumulative us}, stdout)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_CODE],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing api_server failed:\n{result.stderr}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative_us)
+    return modules, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API server import time and module boundary check")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        modules, stdout = import_once()
+        totals.append(modules["api_server"] / 1000)
+
+    failures = []
+    imported = [name for name in FORBIDDEN_MODULES if name in modules]
+    if imported:
+        failures.append(f"server imports {', '.join(imported)} at module load")
+
+    scenario_loads = int(stdout.rsplit("scenario loads:", 1)[1])
+    scenario_count = len([f for f in os.listdir(os.path.join(SERVER_DIR, "scenarios")) if f.endswith(".json")])
+    if scenario_loads > scenario_count:
+        failures.append(f"scenarios loaded {scenario_loads // max(scenario_count, 1)} times")
+
+    median = statistics.median(totals)
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f} ms exceeds budget of {args.budget_ms:.0f} ms")
+
+    print(f"import api_server: median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms "
+          f"over {args.runs} runs")
+    print("\nSlowest modules (cumulative, last run):")
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative_us in slowest[:args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
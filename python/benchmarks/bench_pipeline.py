@@ -0,0 +1,167 @@
+"""Compare time-to-first-audio with and without sentence-level LLM -> TTS pipelining.
+
+Runs api_server.app in-process with the fake Gemini and ElevenLabs providers from
+loadtest.py, using multi-sentence replies that Gemini streams word by word. For
+each mode, learners hold WebSocket conversations and non-streamed HTTP turns:
+  - whole:     the reply is spoken once Gemini has finished it (SPEECH_PIPELINE=false)
+  - sentences: each sentence is synthesized as soon as Gemini has written it
+
+Reports, per mode:
+  - first audio: end of speech -> first reply audio frame on the WebSocket
+  - ws turn:     end of speech -> audio_end on the WebSocket
+  - http turn:   POST /process with stream=false -> response (reply audio saved)
+
+Usage:
+    python benchmarks/bench_pipeline.py [--learners 4] [--turns 5] [--llm-ms 1500]
+        [--stt-ms 300] [--tts-ms 600] [--sigma 0.2] [--json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadtest import (Latency, make_fake_genai, make_fake_elevenlabs, load_samples, speech_samples,
+                      summarize)
+
+# Replies long enough for pipelining to matter: three or four sentences each
+REPLIES = [
+    "Très bien, c'est noté. Je vous apporte ça tout de suite. "
+    "Désirez-vous aussi une carafe d'eau pour la table ?",
+    "Parfait, excellent choix ! Le poulet rôti est servi avec des pommes de terre et des haricots verts. "
+    "Il faut compter une vingtaine de minutes. Et comme boisson, qu'est-ce que je vous sers ?",
+    "Bien sûr, nous avons une table libre près de la fenêtre. Suivez-moi, s'il vous plaît. "
+    "Voici la carte du jour. Avez-vous déjà choisi une entrée ?",
+]
+
+MODES = (("whole", False), ("sentences", True))
+
+
+def run_learner(client, api_server, sample, turns, stats, errors):
+    """One learner: a session with a WebSocket conversation, then HTTP turns."""
+    session_id = client.post("/api/session/start", json={"scenario": "restaurant", "language": "fr"}).json()["sessionId"]
+    with client.websocket_connect(f"/api/session/{session_id}/ws") as ws:
+        ws.receive_json()
+        for _ in range(turns):
+            for offset in range(0, len(sample), 4000):
+                ws.send_bytes(sample[offset:offset + 4000])
+            ended = time.perf_counter()
+            ws.send_text(json.dumps({"type": "end"}))
+            first_audio = None
+            while True:
+                message = ws.receive()
+                if message.get("bytes") is not None:
+                    if first_audio is None:
+                        first_audio = time.perf_counter() - ended
+                    continue
+                event = json.loads(message["text"])
+                if event["type"] == "error":
+                    errors.append(event["detail"])
+                    break
+                if event["type"] == "audio_end":
+                    stats["first_audio"].append(first_audio)
+                    stats["ws_turn"].append(time.perf_counter() - ended)
+                    break
+
+    for _ in range(turns):
+        started = time.perf_counter()
+        response = client.post(
+            f"/api/session/{session_id}/process",
+            files={"audio": ("input.webm", sample, "audio/webm")}
+        )
+        if response.status_code != 200:
+            errors.append(f"process {response.status_code}")
+            continue
+        stats["http_turn"].append(time.perf_counter() - started)
+    client.delete(f"/api/session/{session_id}")
+
+
+def run_mode(client, api_server, samples, args, pipelined):
+    api_server.SPEECH_PIPELINE = pipelined
+    stats = {"first_audio": [], "ws_turn": [], "http_turn": []}
+    errors = []
+    threads = [
+        threading.Thread(target=run_learner, args=(client, api_server, samples[i % len(samples)],
+                                                  args.turns, stats, errors))
+        for i in range(args.learners)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {name: summarize(values) for name, values in stats.items()}, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=4, help="Concurrent learners")
+    parser.add_argument("--turns", type=int, default=5, help="WebSocket and HTTP turns per learner")
+    parser.add_argument("--llm-ms", type=float, default=1500, help="Median Gemini latency for a whole reply")
+    parser.add_argument("--stt-ms", type=float, default=300, help="Median speech-to-text latency")
+    parser.add_argument("--tts-ms", type=float, default=600, help="Median text-to-speech latency")
+    parser.add_argument("--sigma", type=float, default=0.2, help="Log-normal spread of the latencies")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    work_dir = tempfile.mkdtemp(prefix="voicechat-pipeline-")
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ.setdefault("ELEVEN_API_KEY", "offline")
+    os.environ["AUDIO_DIR"] = os.path.join(work_dir, "audio")
+    os.environ["TTS_CACHE_DIR"] = os.path.join(work_dir, "tts_cache")
+    os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(work_dir, "translation_cache.sqlite3")
+    os.environ["SESSION_STORE_URL"] = "memory://"
+
+    import providers
+    providers.load_genai().GenerativeModel = make_fake_genai(Latency(args.llm_ms, args.sigma), 0.3, REPLIES)
+    import elevenlabs.client
+    elevenlabs.client.ElevenLabs = make_fake_elevenlabs(
+        Latency(args.stt_ms, args.sigma), Latency(args.tts_ms, args.sigma)
+    )
+
+    import api_server
+    from fastapi.testclient import TestClient
+
+    # Each mode synthesizes the same texts; only a cold cache keeps the comparison fair
+    api_server.get_speech_service().cache = None
+
+    report = {"learners": args.learners, "turns": args.turns, "modes": {}}
+    server_output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(server_output), TestClient(api_server.app) as client:
+            samples = load_samples()
+            if api_server.VAD_ENABLED:
+                samples = client.portal.call(speech_samples, api_server.transcoder, samples)
+            for name, pipelined in MODES:
+                results, errors = run_mode(client, api_server, samples, args, pipelined)
+                report["modes"][name] = {"errors": len(errors), **results}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"learners {args.learners} x {args.turns} turns; fake latency medians: "
+          f"llm {args.llm_ms:.0f} ms per reply, stt {args.stt_ms:.0f} ms, tts {args.tts_ms:.0f} ms")
+    print()
+    print(f"{'mode':<10} {'measure':<12} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, results in report["modes"].items():
+        for measure in ("first_audio", "ws_turn", "http_turn"):
+            row = results[measure]
+            print(f"{name:<10} {measure:<12} {row['count']:>6} {row['p50_ms']:>8.0f} "
+                  f"{row['p95_ms']:>8.0f} {row['max_ms']:>8.0f}")
+        if results["errors"]:
+            print(f"{name:<10} errors       {results['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
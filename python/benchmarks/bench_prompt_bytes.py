@@ -0,0 +1,121 @@
+"""Compare bytes sent to Gemini per turn: flat prompt vs persistent chat engine.
+
+Runs a scripted conversation through VoiceLanguageLearningChatbot with an offline
+fake Gemini model and reports, for each turn's reply request:
+  - flat:      size of the flat prompt (guidelines + whole history, resent every turn)
+  - chat wire: size of the chat request (system instruction + chat history + message)
+  - chat new:  size of the new message the client composes for the turn
+
+Usage:
+    python benchmarks/bench_prompt_bytes.py [--turns 20] [--context-turns 8]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import providers
+import voice_convo
+
+USER_LINES = [
+    "Bonjour, une table pour deux s'il vous plaît",
+    "Je voudrais un café au lait",
+    "Oui, avec un peu de sucre",
+    "Je vais prendre le poulet rôti",
+    "Non, pas d'allergies",
+    "Oui, c'est parfait",
+    "C'est délicieux, merci",
+    "L'addition s'il vous plaît",
+]
+
+REPLY = "Très bien, c'est noté. Voulez-vous autre chose avec cela ?"
+
+
+class Recorder:
+    """Collects the size of each reply request."""
+
+    def __init__(self):
+        self.requests = []
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, content):
+        history_bytes = sum(len(part.encode("utf-8")) for entry in self.history for part in entry["parts"])
+        new_bytes = len(content.encode("utf-8"))
+        wire_bytes = len(self.model.system_instruction.encode("utf-8")) + history_bytes + new_bytes
+        self.model.recorder.requests.append((wire_bytes, new_bytes))
+
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [REPLY]})
+        return FakeResponse(REPLY)
+
+
+def make_fake_model(recorder):
+    class FakeGenerativeModel:
+        def __init__(self, model_name=None, system_instruction=None, **kwargs):
+            self.system_instruction = system_instruction or ""
+            self.recorder = recorder
+
+        def generate_content(self, prompt, **kwargs):
+            if "Your response as the" in prompt:
+                size = len(prompt.encode("utf-8"))
+                recorder.requests.append((size, size))
+                return FakeResponse(REPLY)
+            if "Update the summary" in prompt:
+                return FakeResponse("The customer asked for a table for two and ordered a coffee and roast chicken.")
+            # Step evaluation: never advance, so the whole run stays on one prompt shape
+            return FakeResponse("no")
+
+        def start_chat(self, history=None):
+            return FakeChat(self, history or [])
+
+    return FakeGenerativeModel
+
+
+def run(engine, turns, context_turns):
+    recorder = Recorder()
+    providers.load_genai().GenerativeModel = make_fake_model(recorder)
+
+    chatbot = voice_convo.VoiceLanguageLearningChatbot(
+        "offline", voice_convo.SCENARIOS["restaurant"], "french",
+        engine=engine, context_turns=context_turns
+    )
+    chatbot.max_exchanges_per_step = turns + 1
+    chatbot.conversation_history.append({"role": "assistant", "content": "Bonjour ! Bienvenue. Combien êtes-vous ?"})
+
+    for turn in range(turns):
+        chatbot.generate_response(USER_LINES[turn % len(USER_LINES)], "fra")
+    return recorder.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes sent per turn: flat prompt vs chat engine")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--context-turns", type=int, default=8)
+    args = parser.parse_args()
+
+    flat = run("two_call", args.turns, args.context_turns)
+    chat = run("chat", args.turns, args.context_turns)
+
+    print(f"{'turn':>4} {'flat':>8} {'chat wire':>10} {'chat new':>9}")
+    for turn, ((flat_bytes, _), (wire_bytes, new_bytes)) in enumerate(zip(flat, chat), start=1):
+        print(f"{turn:>4} {flat_bytes:>8} {wire_bytes:>10} {new_bytes:>9}")
+
+    print(f"\nTotal flat:      {sum(b for b, _ in flat)} bytes")
+    print(f"Total chat wire: {sum(b for b, _ in chat)} bytes")
+    print(f"Total chat new:  {sum(n for _, n in chat)} bytes")
+
+
+if __name__ == "__main__":
+    main()
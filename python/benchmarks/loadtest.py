@@ -0,0 +1,432 @@
+"""Offline load test for the API server with fake Gemini and ElevenLabs providers.
+
+Runs api_server.app in-process (lifespan included) and drives simulated learners
+through start -> process x N -> delete over the ASGI interface, uploading the
+sample recordings in benchmarks/samples/. The providers are replaced by local fakes:
+  - Gemini: GenerativeModel.generate_content (streamed or not) and chat sessions,
+    with canned replies
+  - ElevenLabs: speech_to_text.convert and text_to_speech.convert / .stream,
+    returning canned transcripts and silent MP3 frames
+Each fake call sleeps for a latency drawn from a log-normal distribution with the
+given median (ms) and --sigma, in the calling worker thread like the real SDKs.
+With --cassette, recorded provider calls are replayed instead (see providers.py).
+
+Reports throughput, start/turn latency percentiles, server stage means (from
+/api/metrics) and the peak RSS of the process (server and client together).
+The server uses a temporary AUDIO_DIR and caches, so nothing in the tree changes.
+
+Usage:
+    python benchmarks/loadtest.py [--learners 50] [--turns 5] [--llm-ms 400]
+        [--stt-ms 300] [--tts-ms 500] [--sigma 0.35] [--stream] [--json]
+    python benchmarks/loadtest.py --cassette provider_cassette.jsonl.gz [--latency-scale 1]
+"""
+import io
+import os
+import sys
+import json
+import math
+import glob
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import contextlib
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# Learner recordings, kept out of AUDIO_DIR so the server's audio store never touches them
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+sys.path.insert(0, SERVER_DIR)
+
+BASE_URL = "http://localhost:8000"
+
+REPLIES = [
+    "Très bien, c'est noté. Voulez-vous autre chose ?",
+    "Parfait ! Et comme boisson, qu'est-ce que je vous sers ?",
+    "Bien sûr. Vous préférez une table près de la fenêtre ?",
+    "Merci beaucoup. Avez-vous des allergies alimentaires ?",
+]
+TRANSCRIPTS = [
+    ("Bonjour, une table pour deux s'il vous plaît", "fra"),
+    ("Je voudrais un café au lait", "fra"),
+    ("Oui, avec un peu de sucre", "fra"),
+    ("Je vais prendre le poulet rôti", "fra"),
+]
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz frame: 4-byte header, 417 bytes in total
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+MP3_FRAMES_PER_SECOND = 44100 / 1152
+SPOKEN_CHARS_PER_SECOND = 14
+
+
+class Latency:
+    """Log-normal latency around a median, in seconds."""
+
+    def __init__(self, median_ms: float, sigma: float):
+        self.mu = math.log(max(median_ms, 0.001) / 1000)
+        self.sigma = sigma
+
+    def draw(self) -> float:
+        return random.lognormvariate(self.mu, self.sigma)
+
+    def sleep(self, fraction: float = 1.0):
+        time.sleep(self.draw() * fraction)
+
+
+def fake_mp3(text: str) -> bytes:
+    """Silent MP3 about as long as text would take to say."""
+    seconds = max(len(text) / SPOKEN_CHARS_PER_SECOND, 0.5)
+    return MP3_FRAME * int(seconds * MP3_FRAMES_PER_SECOND)
+
+
+def make_fake_genai(latency: Latency, advance_probability: float, replies=REPLIES):
+    class FakeResponse:
+        def __init__(self, text):
+            self.text = text
+
+    def stream_text(text: str):
+        # The first words arrive after ~30% of the call's latency, the rest at an even pace
+        total = latency.draw()
+        words = text.split(" ")
+        time.sleep(total * 0.3)
+        for index, word in enumerate(words):
+            yield FakeResponse(word if index == len(words) - 1 else word + " ")
+            time.sleep(total * 0.7 / len(words))
+
+    def answer(prompt: str) -> str:
+        if 'Answer with only "yes" or "no"' in prompt:
+            return "yes" if random.random() < advance_probability else "no"
+        if "Respond with a JSON object only" in prompt:
+            return json.dumps({"reply": random.choice(replies),
+                               "step_complete": random.random() < advance_probability})
+        if "Update the summary" in prompt:
+            return "The customer asked for a table for two and ordered a coffee and roast chicken."
+        if "Translate the following" in prompt:
+            return "Je voudrais un café, s'il vous plaît."
+        return random.choice(replies)
+
+    class FakeChat:
+        def __init__(self, history):
+            self.history = list(history)
+
+        def send_message(self, content):
+            latency.sleep()
+            text = random.choice(replies)
+            self.history.append({"role": "user", "parts": [content]})
+            self.history.append({"role": "model", "parts": [text]})
+            return FakeResponse(text)
+
+    class FakeGenerativeModel:
+        def __init__(self, model_name=None, system_instruction=None, **kwargs):
+            pass
+
+        def generate_content(self, prompt, stream=False, **kwargs):
+            if stream:
+                return stream_text(answer(prompt))
+            latency.sleep()
+            return FakeResponse(answer(prompt))
+
+        def start_chat(self, history=None):
+            return FakeChat(history or [])
+
+    return FakeGenerativeModel
+
+
+def make_fake_elevenlabs(stt_latency: Latency, tts_latency: Latency):
+    class Word:
+        def __init__(self, end):
+            self.end = end
+
+    class Transcription:
+        def __init__(self, text, language_code):
+            self.text = text
+            self.language_code = language_code
+            self.words = [Word(len(text) / SPOKEN_CHARS_PER_SECOND)]
+
+    class SpeechToText:
+        def convert(self, file, **kwargs):
+            stt_latency.sleep()
+            return Transcription(*random.choice(TRANSCRIPTS))
+
+    class TextToSpeech:
+        def convert(self, text, **kwargs):
+            tts_latency.sleep()
+            return iter([fake_mp3(text)])
+
+        def stream(self, text, **kwargs):
+            # Time to first chunk is ~40% of the full synthesis time
+            audio = fake_mp3(text)
+            chunk_size = len(MP3_FRAME) * 10
+            chunks = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+
+            def generate():
+                tts_latency.sleep(0.4)
+                for chunk in chunks:
+                    yield chunk
+                    tts_latency.sleep(0.6 / len(chunks))
+            return generate()
+
+    class FakeElevenLabs:
+        def __init__(self, *args, **kwargs):
+            self.speech_to_text = SpeechToText()
+            self.text_to_speech = TextToSpeech()
+
+    return FakeElevenLabs
+
+
+def load_samples():
+    """Sample recordings uploaded by the simulated learners."""
+    paths = sorted(glob.glob(os.path.join(SAMPLES_DIR, "*.webm")))
+    if not paths:
+        sys.exit(f"No sample recordings found in {SAMPLES_DIR}")
+    samples = []
+    for path in paths:
+        with open(path, "rb") as f:
+            samples.append(f.read())
+    return samples
+
+
+async def speech_samples(transcoder, samples):
+    """The samples that hold speech; silent ones would be rejected with a 422 by the server.
+
+    A sample that cannot be decoded is kept, as the server skips VAD for it too.
+    """
+    import vad
+    kept = []
+    undecoded = 0
+    for sample in samples:
+        try:
+            speech, _ = vad.trim_silence(await transcoder.to_pcm(sample), transcoder.sample_rate)
+        except Exception as e:
+            undecoded += 1
+            error = e
+            speech = sample
+        if speech is not None:
+            kept.append(sample)
+    if undecoded:
+        print(f"Voice activity detection skipped for {undecoded} samples: {error}", file=sys.stderr)
+    if not kept:
+        sys.exit("None of the sample recordings hold speech")
+    return kept
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": max(values) * 1000 if values else float("nan"),
+    }
+
+
+def stage_means(metrics_text: str):
+    """Mean duration per stage from the server's Prometheus metrics."""
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        for suffix, target in (("_sum", sums), ("_count", counts)):
+            prefix = f"voicechat_stage_duration_seconds{suffix}" + '{stage="'
+            if line.startswith(prefix):
+                stage, value = line[len(prefix):].split('"} ')
+                target[stage] = float(value) if suffix == "_sum" else int(value)
+    return {stage: (counts[stage], sums[stage] / counts[stage] * 1000)
+            for stage in sorted(counts) if counts[stage]}
+
+
+async def run_learner(client, args, samples, results, start_gate):
+    import httpx
+
+    async with start_gate:
+        started = time.perf_counter()
+        response = await client.post("/api/session/start", json={
+            "scenario": random.choice(args.scenarios),
+            "language": args.language,
+            "stream": args.stream
+        })
+    if response.status_code != 200:
+        results["errors"].append(f"start {response.status_code}")
+        return
+    results["start"].append(time.perf_counter() - started)
+    session_id = response.json()["sessionId"]
+
+    try:
+        for turn in range(args.turns):
+            if args.think_ms:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+            audio = random.choice(samples)
+            started = time.perf_counter()
+            response = await client.post(
+                f"/api/session/{session_id}/process",
+                params={"stream": "true"} if args.stream else None,
+                files={"audio": ("recording.webm", audio, "audio/webm")}
+            )
+            if response.status_code != 200:
+                results["errors"].append(f"process {response.status_code}")
+                continue
+            results["turn"].append(time.perf_counter() - started)
+
+            # Play the reply: fetch the audio URL to the last byte
+            audio_url = response.json()["audioUrl"]
+            async with client.stream("GET", audio_url) as speech:
+                size = 0
+                async for chunk in speech.aiter_bytes():
+                    size += len(chunk)
+            if speech.status_code != 200 or not size:
+                results["errors"].append(f"audio {speech.status_code}")
+                continue
+            results["turn_with_audio"].append(time.perf_counter() - started)
+    except httpx.HTTPError as e:
+        results["errors"].append(f"http {type(e).__name__}")
+    finally:
+        await client.delete(f"/api/session/{session_id}")
+
+
+async def run(args):
+    import httpx
+
+    work_dir = tempfile.mkdtemp(prefix="voicechat-loadtest-")
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ.setdefault("ELEVEN_API_KEY", "offline")
+    os.environ["AUDIO_DIR"] = os.path.join(work_dir, "audio")
+    os.environ["TTS_CACHE_DIR"] = os.path.join(work_dir, "tts_cache")
+    os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(work_dir, "translation_cache.sqlite3")
+    os.environ.setdefault("SESSION_STORE_URL", "memory://")
+
+    if args.cassette:
+        # Serve recorded provider calls instead of the fakes
+        os.environ["PROVIDER_MODE"] = "replay"
+        os.environ["PROVIDER_CASSETTE"] = args.cassette
+        os.environ["PROVIDER_LATENCY_SCALE"] = str(args.latency_scale)
+    else:
+        import providers
+        providers.load_genai().GenerativeModel = make_fake_genai(
+            Latency(args.llm_ms, args.sigma), args.advance_probability
+        )
+        import elevenlabs.client
+        elevenlabs.client.ElevenLabs = make_fake_elevenlabs(
+            Latency(args.stt_ms, args.sigma), Latency(args.tts_ms, args.sigma)
+        )
+
+    import api_server
+    if not args.scenarios:
+        args.scenarios = sorted(api_server.scenario_registry.scenarios)
+    samples = load_samples()
+    if api_server.VAD_ENABLED:
+        samples = await speech_samples(api_server.transcoder, samples)
+    results = {"start": [], "turn": [], "turn_with_audio": [], "errors": []}
+    server_output = io.StringIO()
+
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else server_output):
+            async with api_server.app.router.lifespan_context(api_server.app):
+                transport = httpx.ASGITransport(app=api_server.app)
+                async with httpx.AsyncClient(transport=transport, base_url=BASE_URL, timeout=300) as client:
+                    start_gate = asyncio.Semaphore(args.ramp)
+                    started = time.perf_counter()
+                    await asyncio.gather(*[
+                        run_learner(client, args, samples, results, start_gate)
+                        for _ in range(args.learners)
+                    ])
+                    wall = time.perf_counter() - started
+                    metrics_text = (await client.get("/api/metrics")).text
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    import providers
+    return {
+        "config": {
+            "learners": args.learners, "turns": args.turns, "stream": args.stream,
+            "llm_ms": args.llm_ms, "stt_ms": args.stt_ms, "tts_ms": args.tts_ms, "sigma": args.sigma,
+            "cassette": args.cassette, "latency_scale": args.latency_scale,
+            "engine": os.getenv("CHAT_ENGINE", "two_call"),
+            "defer_step_evaluation": os.getenv("DEFER_STEP_EVALUATION", "false")
+        },
+        "wall_seconds": wall,
+        "sessions_per_second": len(results["start"]) / wall,
+        "turns_per_second": len(results["turn"]) / wall,
+        "start": summarize(results["start"]),
+        "turn": summarize(results["turn"]),
+        "turn_with_audio": summarize(results["turn_with_audio"]),
+        "errors": len(results["errors"]),
+        "error_kinds": sorted(set(results["errors"])),
+        "peak_rss_mb": peak_rss_mb,
+        "providers": providers.provider_stats(),
+        "stages": {stage: {"count": count, "mean_ms": mean}
+                   for stage, (count, mean) in stage_means(metrics_text).items()}
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"learners {config['learners']} x {config['turns']} turns, engine {config['engine']}, "
+          f"stream {'on' if config['stream'] else 'off'}, deferred evaluation {config['defer_step_evaluation']}")
+    if config["cassette"]:
+        print(f"replaying {config['cassette']} at {config['latency_scale']}x recorded latency\n")
+    else:
+        print(f"fake latency medians: llm {config['llm_ms']} ms, stt {config['stt_ms']} ms, "
+              f"tts {config['tts_ms']} ms (sigma {config['sigma']})\n")
+    print(f"wall time        {report['wall_seconds']:.2f} s")
+    print(f"throughput       {report['turns_per_second']:.2f} turns/s, "
+          f"{report['sessions_per_second']:.2f} sessions/s")
+    print(f"errors           {report['errors']} {' '.join(report['error_kinds'])}")
+    print(f"peak RSS         {report['peak_rss_mb']:.1f} MB")
+    cassette = report["providers"].get("cassette")
+    if cassette:
+        print(f"cassette         {cassette['hits']} matched, {cassette['misses']} unmatched calls, "
+              f"{cassette['recorded']} recorded")
+    print()
+    print(f"{'latency':<16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name in ("start", "turn", "turn_with_audio"):
+        stats = report[name]
+        print(f"{name:<16} {stats['count']:>6} {stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} "
+              f"{stats['p99_ms']:>8.0f} {stats['max_ms']:>8.0f}")
+    print(f"\n{'server stage':<20} {'count':>6} {'mean ms':>8}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<20} {stats['count']:>6} {stats['mean_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with fake Gemini and ElevenLabs")
+    parser.add_argument("--learners", type=int, default=50, help="Simulated learners (concurrent sessions)")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per learner")
+    parser.add_argument("--ramp", type=int, default=10, help="Session starts in flight at once")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a learner's turns")
+    parser.add_argument("--llm-ms", type=float, default=400, help="Median fake Gemini latency")
+    parser.add_argument("--stt-ms", type=float, default=300, help="Median fake STT latency")
+    parser.add_argument("--tts-ms", type=float, default=500, help="Median fake TTS latency")
+    parser.add_argument("--sigma", type=float, default=0.35, help="Log-normal spread of fake latencies")
+    parser.add_argument("--advance-probability", type=float, default=0.35,
+                        help="Chance the fake step evaluation says a step is complete")
+    parser.add_argument("--cassette", help="Replay this provider cassette (PROVIDER_MODE=record) instead of the fakes")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Factor applied to recorded latencies when replaying a cassette")
+    parser.add_argument("--scenarios", nargs="*", help="Scenarios to pick from (default: all)")
+    parser.add_argument("--language", default="french")
+    parser.add_argument("--stream", action="store_true", help="Use streamed speech responses")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a prompt (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+class ConversationContext:
+    """Bounded view of a conversation history for prompt building.
+
+    The most recent max_turns history entries are kept verbatim. Older entries are
+    folded into a running summary, in batches of fold_batch, by calling
+    summarizer(previous_summary, entries). Prompt size therefore stays roughly
+    constant instead of growing with the length of the session.
+
+    start_fold() runs the summarizer on an executor and apply_fold() picks up its
+    result later, so summarizing never delays a reply.
+    """
+
+    def __init__(self, max_turns: int = 8, fold_batch: int = 4,
+                 summarizer: Optional[Callable[[str, List[Dict]], str]] = None):
+        self.max_turns = max_turns
+        self.fold_batch = fold_batch
+        self.summarizer = summarizer
+        self.summary = ""
+        self.summarized_count = 0  # Number of history entries folded into the summary
+        # Background fold: (summarized_count it started from, fold_upto, future summary)
+        self._pending: Optional[Tuple[int, int, Future]] = None
+
+    def needs_fold(self, history: List[Dict]) -> bool:
+        """Check if the unsummarized entries have overflowed the window."""
+        return bool(self.summarizer) and len(history) - self.summarized_count > self.max_turns + self.fold_batch
+
+    def start_fold(self, history: List[Dict], executor: Executor):
+        """Start folding on executor if the window overflowed and no fold is running."""
+        if self._pending is not None or not self.needs_fold(history):
+            return
+        fold_upto = len(history) - self.max_turns
+        entries = list(history[self.summarized_count:fold_upto])
+        future = executor.submit(self.summarizer, self.summary, entries)
+        self._pending = (self.summarized_count, fold_upto, future)
+
+    def fold_pending(self) -> bool:
+        """Check if a background fold has not been applied yet."""
+        return self._pending is not None
+
+    def apply_fold(self, wait: bool = False):
+        """Apply the background fold's summary if it is ready (or, with wait, once it is)."""
+        if self._pending is None:
+            return
+        start, fold_upto, future = self._pending
+        if not wait and not future.done():
+            return
+        self._pending = None
+        try:
+            summary = future.result()
+        except Exception as e:
+            # Keep the entries verbatim and try again on a later turn
+            print(f"Error summarizing conversation: {e}")
+            return
+        # Ignore a fold overtaken by a restored state
+        if start == self.summarized_count:
+            self.summary = summary
+            self.summarized_count = fold_upto
+
+    def recent(self, history: List[Dict]) -> List[Dict]:
+        """Entries that have not been folded into the summary."""
+        return history[self.summarized_count:]
@@ -0,0 +1,122 @@
+from typing import Optional
+
+# Layer III bitrates (kbps) by bitrate index, for MPEG-1 and for MPEG-2/2.5
+BITRATES_MPEG1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+BITRATES_MPEG2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# Sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5) and rate index
+SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+ID3V1_SIZE = 128
+
+
+def frame_length(header: bytes) -> Optional[int]:
+    """Length in bytes of the Layer III frame starting with this 4-byte header.
+
+    None if the bytes are not a valid Layer III header (free-format frames included).
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = (BITRATES_MPEG1 if version == 3 else BITRATES_MPEG2)[bitrate_index] * 1000
+    samples = 1152 if version == 3 else 576
+    padding = (header[2] >> 1) & 1
+    return samples // 8 * bitrate // SAMPLE_RATES[version][rate_index] + padding
+
+
+def id3v2_size(data: bytes) -> int:
+    """Size of the ID3v2 tag at the start of data, header and footer included (0 if none)."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def is_info_frame(frame: bytes) -> bool:
+    """Whether a frame is a Xing/Info or VBRI header rather than audio.
+
+    Such a frame holds the frame count and seek table of its own clip, which
+    would make players misjudge the length of a joined stream.
+    """
+    version = (frame[1] >> 3) & 3
+    mono = frame[3] >> 6 == 3
+    if version == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    offset = 4 + side_info + (0 if frame[1] & 1 else 2)  # 2-byte CRC when protected
+    return frame[offset:offset + 4] in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+
+class FrameStream:
+    """Cuts MP3 bytes, fed in chunks of any size, into bare audio frames.
+
+    The ID3v2 tag in front, a Xing/Info/VBRI header frame and the ID3v1 tag at
+    the end are dropped, so the output for several clips of the same format can
+    be concatenated into one playable stream without re-encoding. Input that does
+    not parse as MPEG Layer III is passed through unchanged.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._started = False
+        self._passthrough = False
+        self._frames = 0
+
+    def feed(self, data: bytes) -> bytes:
+        """Add bytes and return the complete frames they finished."""
+        buffer = self._buffer
+        buffer += data
+        output = bytearray()
+        while not self._passthrough:
+            if not self._started:
+                if len(buffer) < 10:
+                    break
+                tag_size = id3v2_size(buffer)
+                if tag_size:
+                    if len(buffer) < tag_size:
+                        break
+                    del buffer[:tag_size]
+                    continue
+                self._started = True
+
+            if len(buffer) < 4 or buffer[:3] == b"TAG":
+                # A trailing ID3v1 tag is only recognisable once the input ends
+                break
+            length = frame_length(buffer[:4])
+            if length is None:
+                self._passthrough = True
+                break
+            if len(buffer) < length:
+                break
+            frame = bytes(buffer[:length])
+            del buffer[:length]
+            self._frames += 1
+            if self._frames == 1 and is_info_frame(frame):
+                continue
+            output += frame
+
+        if self._passthrough:
+            output += buffer
+            buffer.clear()
+        return bytes(output)
+
+    def close(self) -> bytes:
+        """Whatever is left once the input is complete, without an ID3v1 tag."""
+        rest = bytes(self._buffer)
+        self._buffer.clear()
+        if len(rest) == ID3V1_SIZE and rest[:3] == b"TAG":
+            return b""
+        return rest
+
+
+def bare_frames(data: bytes) -> bytes:
+    """The audio frames of a complete MP3 clip, without tags or header frames."""
+    stream = FrameStream()
+    return stream.feed(data) + stream.close()
@@ -0,0 +1,527 @@
+import os
+import json
+import gzip
+import time
+import atexit
+import base64
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Provider mode: "live" calls Gemini and ElevenLabs; "record" calls them and appends every
+# request/response pair to the cassette; "replay" serves calls from the cassette, offline
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()
+PROVIDER_CASSETTE = os.getenv("PROVIDER_CASSETTE", "provider_cassette.jsonl.gz")
+# Replayed calls take their recorded latency times this factor (0 replays without delays)
+PROVIDER_LATENCY_SCALE = float(os.getenv("PROVIDER_LATENCY_SCALE", "1"))
+# In replay mode, fail calls that were never recorded instead of serving a recorded call of the same kind
+PROVIDER_REPLAY_STRICT = os.getenv("PROVIDER_REPLAY_STRICT", "false").lower() in ("1", "true", "yes")
+
+MODES = ("live", "record", "replay")
+TTS_CONVERT = "text_to_speech"
+TTS_STREAM = "text_to_speech_stream"
+CASSETTE_VERSION = 1
+
+
+def load_genai():
+    """Import the Gemini SDK on first use; it accounts for most of the import time."""
+    import google.generativeai as genai
+    return genai
+
+
+def request_key(op: str, *parts) -> str:
+    """Hash identifying a provider request, used to match replayed calls."""
+    material = json.dumps([op, *parts], ensure_ascii=False, sort_keys=True, default=repr)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def generate_key(model_name: str, system_instruction: Optional[str], prompt, kwargs: Dict) -> str:
+    """Request key for a generate_content call, the same whether it was streamed or not."""
+    options = {name: value for name, value in kwargs.items() if name != "stream"}
+    return request_key("generate_content", model_name, system_instruction, prompt, options)
+
+
+def chunk_text(chunk) -> str:
+    """Text of a streamed Gemini chunk; chunks carrying only metadata have none."""
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def content_text(content) -> Tuple[str, str]:
+    """(role, text) of a chat history entry (dict or protobuf Content)."""
+    if isinstance(content, dict):
+        role, parts = content["role"], content["parts"]
+    else:
+        role, parts = content.role, content.parts
+    return role, "".join(part if isinstance(part, str) else getattr(part, "text", "") for part in parts)
+
+
+class CassetteMiss(LookupError):
+    """A replayed call that has no recorded counterpart."""
+
+
+class Cassette:
+    """Recorded provider calls in a gzip-compressed JSON lines file.
+
+    Each call line holds the provider, operation, request key, a readable copy of
+    the request (prompts, TTS text; uploaded audio only by hash and size), the
+    response and its latency. Synthesized audio is stored once per distinct clip
+    in a separate blob line, and each TTS call keeps its chunk sizes and arrival
+    times so streams replay with their original pacing; streamed Gemini replies
+    keep their text pieces and arrival times the same way.
+
+    Recording appends, so several runs can build one cassette. Replay matches calls
+    by request key, serving repeated requests in recorded order; a request that was
+    never recorded gets the same request made through a similar operation (e.g. TTS
+    convert for stream), or else the next recorded call of the same operation (real
+    response shapes and timings for different inputs) unless strict is set.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0, strict: bool = False):
+        self.path = path
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+        self._lock = threading.Lock()
+        self._writer = None
+        self._blob_ids = set()
+        self._blobs: Dict[str, bytes] = {}
+        self._by_key: Dict[str, List[Dict]] = {}
+        self._by_op: Dict[str, List[Dict]] = {}
+        self._cursors: Dict[Tuple[str, str], int] = {}
+
+        self.calls = 0
+        self.recorded = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _read_lines(self) -> Iterator[Dict]:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except EOFError:
+                # Recording was interrupted; everything flushed before that is intact
+                pass
+
+    def load(self):
+        """Read the cassette for replay."""
+        for entry in self._read_lines():
+            if entry["type"] == "blob":
+                self._blobs[entry["id"]] = base64.b64decode(entry["data"])
+            elif entry["type"] == "call":
+                self._by_key.setdefault(entry["key"], []).append(entry)
+                self._by_op.setdefault(entry["op"], []).append(entry)
+                self.calls += 1
+        print(f"Loaded {self.calls} recorded provider calls from {self.path}")
+
+    def record(self, provider: str, op: str, key: str, request: Dict, response: Dict, latency: float,
+               audio: Optional[bytes] = None, chunks: Optional[List[List[float]]] = None):
+        """Append a call (and its audio, if new) to the cassette."""
+        call = {
+            "type": "call", "provider": provider, "op": op, "key": key,
+            "request": request, "response": response, "latency": round(latency, 4)
+        }
+        lines = []
+        with self._lock:
+            writer = self._open_writer()
+            if audio is not None:
+                blob_id = hashlib.sha256(audio).hexdigest()[:32]
+                if blob_id not in self._blob_ids:
+                    self._blob_ids.add(blob_id)
+                    lines.append({"type": "blob", "id": blob_id, "data": base64.b64encode(audio).decode("ascii")})
+                call["audio"] = blob_id
+                call["chunks"] = chunks
+            lines.append(call)
+            for line in lines:
+                writer.write(json.dumps(line, ensure_ascii=False) + "\n")
+            writer.flush()
+            self.recorded += 1
+
+    def _open_writer(self):
+        if self._writer is None:
+            exists = os.path.exists(self.path)
+            if exists:
+                self._blob_ids = {entry["id"] for entry in self._read_lines() if entry["type"] == "blob"}
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._writer = gzip.open(self.path, "at", encoding="utf-8")
+            if not exists:
+                self._writer.write(json.dumps({"type": "header", "version": CASSETTE_VERSION}) + "\n")
+            atexit.register(self.close)
+        return self._writer
+
+    def next_call(self, op: str, key: str, similar_ops: Tuple[str, ...] = (),
+                  similar_keys: Tuple[str, ...] = ()) -> Dict:
+        """The recorded call to serve for a request.
+
+        Unmatched requests fall back to similar_keys (the same request through
+        similar_ops), then to recorded calls of op, or else of similar_ops.
+        """
+        with self._lock:
+            key = next((name for name in (key, *similar_keys) if name in self._by_key), key)
+            calls = self._by_key.get(key)
+            cursor = ("key", key)
+            if calls:
+                self.hits += 1
+            else:
+                self.misses += 1
+                fallback = next((name for name in (op, *similar_ops) if name in self._by_op), None)
+                if self.strict or fallback is None:
+                    raise CassetteMiss(f"No recorded {op} call matches this request ({self.path})")
+                calls = self._by_op[fallback]
+                cursor = ("op", fallback)
+            index = self._cursors.get(cursor, 0)
+            self._cursors[cursor] = index + 1
+            return calls[index % len(calls)]
+
+    def wait(self, call: Dict):
+        """Sleep for a replayed call's (scaled) latency."""
+        delay = call["latency"] * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+    def replay_chunks(self, call: Dict) -> Iterator[bytes]:
+        """Yield a recorded TTS call's audio in its original chunks, at its original (scaled) pace."""
+        audio = self._blobs[call["audio"]]
+        started = time.monotonic()
+        offset = 0
+        for arrived, size in call["chunks"]:
+            delay = arrived * self.latency_scale - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+            yield audio[offset:offset + size]
+            offset += size
+
+    def replay_text_chunks(self, call: Dict) -> Iterator[SimpleNamespace]:
+        """Yield a recorded Gemini reply as streamed chunks, at its original (scaled) pace.
+
+        Replies recorded without streaming arrive in one chunk after their latency.
+        """
+        pieces = call["response"].get("chunks") or [[call["latency"], call["response"]["text"]]]
+        started = time.monotonic()
+        for arrived, text in pieces:
+            delay = arrived * self.latency_scale - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+            yield SimpleNamespace(text=text)
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "calls": self.calls,
+                "recorded": self.recorded,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Gemini
+
+class RecordingGenerativeModel:
+    """Gemini model that records every generate_content call and chat message."""
+
+    def __init__(self, model, cassette: Cassette, model_name: str, system_instruction: Optional[str]):
+        self._model = model
+        self._cassette = cassette
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def generate_content(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return self._record_stream(prompt, kwargs)
+        started = time.perf_counter()
+        response = self._model.generate_content(prompt, **kwargs)
+        self._record(prompt, kwargs, {"text": response.text}, time.perf_counter() - started)
+        return response
+
+    def _record_stream(self, prompt, kwargs: Dict) -> Iterator:
+        started = time.perf_counter()
+        pieces = []
+        for chunk in self._model.generate_content(prompt, **kwargs):
+            pieces.append([round(time.perf_counter() - started, 4), chunk_text(chunk)])
+            yield chunk
+        self._record(
+            prompt, kwargs, {"text": "".join(text for _, text in pieces), "chunks": pieces},
+            time.perf_counter() - started
+        )
+
+    def _record(self, prompt, kwargs: Dict, response: Dict, latency: float):
+        self._cassette.record(
+            "gemini", "generate_content",
+            generate_key(self.model_name, self.system_instruction, prompt, kwargs),
+            {"model": self.model_name, "system_instruction": self.system_instruction, "prompt": prompt},
+            response, latency
+        )
+
+    def start_chat(self, history=None):
+        return RecordingChat(self._model.start_chat(history=history), self)
+
+
+class RecordingChat:
+    def __init__(self, chat, model: RecordingGenerativeModel):
+        self._chat = chat
+        self._model = model
+
+    @property
+    def history(self):
+        return self._chat.history
+
+    def send_message(self, content, **kwargs):
+        history = [content_text(entry) for entry in self._chat.history]
+        started = time.perf_counter()
+        response = self._chat.send_message(content, **kwargs)
+        text = response.text
+        model = self._model
+        model._cassette.record(
+            "gemini", "send_message",
+            request_key("send_message", model.model_name, model.system_instruction, history, content, kwargs),
+            {"model": model.model_name, "system_instruction": model.system_instruction,
+             "history": history, "message": content},
+            {"text": text},
+            time.perf_counter() - started
+        )
+        return response
+
+
+class ReplayGenerativeModel:
+    """Stand-in for a Gemini model that serves responses from a cassette."""
+
+    def __init__(self, cassette: Cassette, model_name: str, system_instruction: Optional[str]):
+        self._cassette = cassette
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def generate_content(self, prompt, **kwargs):
+        call = self._cassette.next_call(
+            "generate_content", generate_key(self.model_name, self.system_instruction, prompt, kwargs)
+        )
+        if kwargs.get("stream"):
+            return self._cassette.replay_text_chunks(call)
+        self._cassette.wait(call)
+        return SimpleNamespace(text=call["response"]["text"])
+
+    def start_chat(self, history=None):
+        return ReplayChat(self, history or [])
+
+
+class ReplayChat:
+    def __init__(self, model: ReplayGenerativeModel, history: List):
+        self._model = model
+        self.history = [{"role": role, "parts": [text]} for role, text in map(content_text, history)]
+
+    def send_message(self, content, **kwargs):
+        model = self._model
+        history = [content_text(entry) for entry in self.history]
+        call = model._cassette.next_call(
+            "send_message",
+            request_key("send_message", model.model_name, model.system_instruction, history, content, kwargs)
+        )
+        model._cassette.wait(call)
+        text = call["response"]["text"]
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [text]})
+        return SimpleNamespace(text=text)
+
+
+# ElevenLabs
+
+def upload_bytes(file) -> bytes:
+    """Contents of an STT upload (file object or (filename, file object) tuple), left unread."""
+    if isinstance(file, tuple):
+        file = file[1]
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    position = file.tell()
+    data = file.read()
+    file.seek(position)
+    return data
+
+
+def stt_request(file, kwargs: Dict) -> Tuple[str, Dict]:
+    """Request key and readable request for a speech-to-text call."""
+    audio = upload_bytes(file)
+    digest = hashlib.sha256(audio).hexdigest()
+    return request_key("speech_to_text", digest, kwargs), {"audio_sha256": digest, "audio_bytes": len(audio), **kwargs}
+
+
+def tts_key(op: str, text: str, kwargs: Dict) -> str:
+    """Request key for a text-to-speech call through op (TTS_CONVERT or TTS_STREAM)."""
+    return request_key(op, text, kwargs)
+
+
+class RecordingSpeechToText:
+    def __init__(self, api, cassette: Cassette):
+        self._api = api
+        self._cassette = cassette
+
+    def convert(self, file, **kwargs):
+        key, request = stt_request(file, kwargs)
+        started = time.perf_counter()
+        transcription = self._api.convert(file=file, **kwargs)
+        words = getattr(transcription, "words", None)
+        self._cassette.record(
+            "elevenlabs", "speech_to_text", key, request,
+            {
+                "text": getattr(transcription, "text", str(transcription)),
+                "language_code": getattr(transcription, "language_code", ""),
+                "duration": getattr(words[-1], "end", None) if words else None
+            },
+            time.perf_counter() - started
+        )
+        return transcription
+
+
+class RecordingTextToSpeech:
+    def __init__(self, api, cassette: Cassette):
+        self._api = api
+        self._cassette = cassette
+
+    def convert(self, text: str, **kwargs) -> Iterator[bytes]:
+        return self._record(TTS_CONVERT, self._api.convert, text, kwargs)
+
+    def stream(self, text: str, **kwargs) -> Iterator[bytes]:
+        return self._record(TTS_STREAM, self._api.stream, text, kwargs)
+
+    def _record(self, op: str, method, text: str, kwargs: Dict) -> Iterator[bytes]:
+        started = time.perf_counter()
+        chunks = method(text=text, **kwargs)
+        received = []
+        timings = []
+        for chunk in chunks:
+            received.append(chunk)
+            timings.append([round(time.perf_counter() - started, 4), len(chunk)])
+            yield chunk
+        self._cassette.record(
+            "elevenlabs", op, tts_key(op, text, kwargs), {"text": text, **kwargs}, {},
+            time.perf_counter() - started, audio=b"".join(received), chunks=timings
+        )
+
+
+class RecordingElevenLabs:
+    """ElevenLabs client that records speech-to-text and text-to-speech calls."""
+
+    def __init__(self, client, cassette: Cassette):
+        self._client = client
+        self.speech_to_text = RecordingSpeechToText(client.speech_to_text, cassette)
+        self.text_to_speech = RecordingTextToSpeech(client.text_to_speech, cassette)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class ReplaySpeechToText:
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    def convert(self, file, **kwargs):
+        key, _ = stt_request(file, kwargs)
+        call = self._cassette.next_call("speech_to_text", key)
+        self._cassette.wait(call)
+        response = call["response"]
+        words = [SimpleNamespace(end=response["duration"])] if response.get("duration") is not None else []
+        return SimpleNamespace(text=response["text"], language_code=response["language_code"], words=words)
+
+
+class ReplayTextToSpeech:
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    def convert(self, text: str, **kwargs) -> Iterator[bytes]:
+        return self._replay(TTS_CONVERT, TTS_STREAM, text, kwargs)
+
+    def stream(self, text: str, **kwargs) -> Iterator[bytes]:
+        return self._replay(TTS_STREAM, TTS_CONVERT, text, kwargs)
+
+    def _replay(self, op: str, other_op: str, text: str, kwargs: Dict) -> Iterator[bytes]:
+        # The same text synthesized through the other operation is used only if op has no recording
+        call = self._cassette.next_call(
+            op, tts_key(op, text, kwargs), (other_op,), (tts_key(other_op, text, kwargs),)
+        )
+        return self._cassette.replay_chunks(call)
+
+
+class ReplayElevenLabs:
+    """Stand-in for the ElevenLabs client that serves speech from a cassette."""
+
+    def __init__(self, cassette: Cassette):
+        self.speech_to_text = ReplaySpeechToText(cassette)
+        self.text_to_speech = ReplayTextToSpeech(cassette)
+
+
+# Factories used by the chatbot and the speech service
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette for record and replay modes (None when live)."""
+    global _cassette
+    if PROVIDER_MODE not in MODES:
+        raise ValueError(f"Unknown PROVIDER_MODE '{PROVIDER_MODE}', expected one of: {', '.join(MODES)}")
+    if PROVIDER_MODE == "live":
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            cassette = Cassette(PROVIDER_CASSETTE, PROVIDER_LATENCY_SCALE, PROVIDER_REPLAY_STRICT)
+            if PROVIDER_MODE == "replay":
+                cassette.load()
+            _cassette = cassette
+    return _cassette
+
+
+def replaying() -> bool:
+    """Check if provider calls are served from a cassette (no API keys or network needed)."""
+    return PROVIDER_MODE == "replay"
+
+
+def configure_gemini(api_key: Optional[str]):
+    """Set the Gemini API key (not needed when replaying)."""
+    if not replaying():
+        load_genai().configure(api_key=api_key)
+
+
+def gemini_model(model_name: str, system_instruction: Optional[str] = None):
+    """A Gemini model for the current provider mode."""
+    cassette = get_cassette()
+    if replaying():
+        return ReplayGenerativeModel(cassette, model_name, system_instruction)
+
+    kwargs = {"system_instruction": system_instruction} if system_instruction else {}
+    model = load_genai().GenerativeModel(model_name, **kwargs)
+    if cassette is not None:
+        return RecordingGenerativeModel(model, cassette, model_name, system_instruction)
+    return model
+
+
+def elevenlabs_client(api_key: Optional[str], httpx_client=None):
+    """An ElevenLabs client for the current provider mode."""
+    cassette = get_cassette()
+    if replaying():
+        return ReplayElevenLabs(cassette)
+
+    from elevenlabs.client import ElevenLabs
+    client = ElevenLabs(api_key=api_key, httpx_client=httpx_client)
+    if cassette is not None:
+        return RecordingElevenLabs(client, cassette)
+    return client
+
+
+def provider_stats() -> Dict:
+    """Provider mode and cassette counters, for health checks."""
+    stats = {"mode": PROVIDER_MODE}
+    if _cassette is not None:
+        stats["cassette"] = _cassette.stats()
+    return stats
@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import logging
+import threading
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompt templates. Scenario fields are filled in once when a scenario is compiled;
+# the remaining fields are per session or per turn and filled in when rendering.
+
+PROMPT_PREFIX_TEMPLATE = """
+You are a friendly {role} having a conversation with someone who is practicing their language skills.
+
+Current scenario: {title}
+Language: {language}
+Current step: {step_name}
+
+For this step:
+- {step_instruction}
+
+Guidelines:
+- Stay in character as a {role} throughout the conversation
+- Respond naturally to what the other person says
+- Keep your responses concise and conversational
+- Focus on your role as a {role}, not on language teaching{language_instruction}
+- Unless you are ending the conversation, always end your reply with ONE short, relevant, open-ended question that invites the learner to speak.
+- Keep responses to 1–2 short sentences followed by a single question. Do not ask multiple questions at once and do not answer your own question.
+- For the final part of the conversation, recognize when the other person is saying goodbye and end the conversation
+"""
+
+CHAT_INSTRUCTION_TEMPLATE = """You are a friendly {role} having a conversation with someone who is practicing their language skills.
+
+Scenario: {title}
+Language: {language}
+
+Some customer messages begin with a [Step: ...] note saying which step of the conversation you are in and what to do in it. Follow it, but never mention it.
+
+Guidelines:
+- Stay in character as a {role} throughout the conversation
+- Respond naturally to what the other person says
+- Keep your responses concise and conversational
+- Focus on your role as a {role}, not on language teaching{language_instruction}
+- Unless you are ending the conversation, always end your reply with ONE short, relevant, open-ended question that invites the learner to speak.
+- Keep responses to 1–2 short sentences followed by a single question. Do not ask multiple questions at once and do not answer your own question.
+- For the final part of the conversation, recognize when the other person is saying goodbye and end the conversation
+"""
+
+GREETING_TEMPLATE = """
+You are a friendly {role}. Start the conversation with a customer who just approached you.
+
+Language: {language}
+
+Begin the conversation with a warm greeting as the {role}. Keep it natural and concise.{language_instruction}
+End your greeting with one short, friendly question that invites the learner to respond.
+"""
+
+EVALUATION_TEMPLATE = """
+You are evaluating a conversation between a {role} and a customer.
+
+Current task: {step_name}
+Task instruction: {step_instruction}
+Completion criteria: {completion_criteria}
+
+Customer said: "{user_input}"
+{role_title} responded: "{ai_response}"
+
+Based on the completion criteria, is the current task complete? Answer with only "yes" or "no".
+"""
+
+REQUIRED_STEP_FIELDS = ("name", "instruction", "completion_criteria")
+
+
+class PromptTemplate:
+    """A prompt template with its static fields already substituted.
+
+    The template is parsed once; scenario text is inserted as literal text, so
+    braces in scenario files need no escaping. render() only joins strings.
+    """
+
+    def __init__(self, template: str, **static_fields):
+        self.parts: List[Tuple[bool, str]] = []  # (is_field, literal text or field name)
+        literal = []
+        for text, field, _, _ in Formatter().parse(template):
+            literal.append(text)
+            if field is None:
+                continue
+            if field in static_fields:
+                literal.append(str(static_fields[field]))
+            else:
+                self.parts.append((False, "".join(literal)))
+                self.parts.append((True, field))
+                literal = []
+        self.parts.append((False, "".join(literal)))
+
+    def render(self, **fields) -> str:
+        return "".join(fields[value] if is_field else value for is_field, value in self.parts)
+
+
+class ScenarioError(ValueError):
+    """A scenario file that could not be loaded.
+
+    errors is a list of {"file", "path", "message"} dicts, one per problem found.
+    """
+
+    def __init__(self, file: str, errors: List[Dict]):
+        self.file = file
+        self.errors = errors
+        super().__init__(f"{file}: " + "; ".join(f"{e['path']}: {e['message']}" for e in errors))
+
+
+def validate_scenario(data, file: str = "<scenario>") -> List[Dict]:
+    """Check a scenario definition; returns a list of problems (empty if valid)."""
+    errors = []
+
+    def error(path: str, message: str):
+        errors.append({"file": file, "path": path, "message": message})
+
+    if not isinstance(data, dict):
+        error("$", "scenario must be a JSON object")
+        return errors
+
+    for field in ("title", "role"):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            error(field, "required non-empty string")
+    if "description" in data and not isinstance(data["description"], str):
+        error("description", "must be a string")
+
+    steps = data.get("steps")
+    if not isinstance(steps, list) or not steps:
+        error("steps", "required non-empty list")
+        return errors
+
+    seen_ids = set()
+    seen_names = set()
+    for index, step in enumerate(steps):
+        path = f"steps[{index}]"
+        if not isinstance(step, dict):
+            error(path, "step must be a JSON object")
+            continue
+        for field in REQUIRED_STEP_FIELDS:
+            if not isinstance(step.get(field), str) or not step[field].strip():
+                error(f"{path}.{field}", "required non-empty string")
+        step_id = step.get("id")
+        if not isinstance(step_id, int) or isinstance(step_id, bool):
+            error(f"{path}.id", "required integer")
+        elif step_id in seen_ids:
+            error(f"{path}.id", f"duplicate step id {step_id}")
+        else:
+            seen_ids.add(step_id)
+        if isinstance(step.get("name"), str):
+            if step["name"] in seen_names:
+                error(f"{path}.name", f"duplicate step name '{step['name']}'")
+            seen_names.add(step["name"])
+    return errors
+
+
+def language_instruction(language: str) -> str:
+    """Extra guideline lines for a non-English conversation."""
+    if language == "english":
+        return ""
+    return f"\n- Respond in {language.title()}\n- Adapt your responses to reflect the cultural context of {language.title()} speakers"
+
+
+def greeting_language_instruction(language: str) -> str:
+    """Extra greeting instruction for a non-English conversation."""
+    if language == "english":
+        return ""
+    return f" Respond in {language.title()} and adapt your greeting to reflect the cultural context of {language.title()} speakers."
+
+
+class Scenario:
+    """A validated scenario with its prompt templates compiled.
+
+    Scenarios are shared by every session and never modified. Item access
+    (scenario["title"], scenario["steps"], ...) reads the original definition.
+    Rendered prompts are memoized per language, since they only depend on it.
+    """
+
+    def __init__(self, name: str, data: Dict, file: str = "<scenario>"):
+        errors = validate_scenario(data, file)
+        if errors:
+            raise ScenarioError(file, errors)
+
+        self.name = name
+        self.data = data
+        self.title = data["title"]
+        self.role = data["role"]
+        self.steps: List[Dict] = data["steps"]
+
+        self._prompt_prefixes = [
+            PromptTemplate(
+                PROMPT_PREFIX_TEMPLATE,
+                role=self.role, title=self.title,
+                step_name=step["name"], step_instruction=step["instruction"]
+            )
+            for step in self.steps
+        ]
+        self._evaluations = [
+            PromptTemplate(
+                EVALUATION_TEMPLATE,
+                role=self.role, role_title=self.role.title(),
+                step_name=step["name"], step_instruction=step["instruction"],
+                completion_criteria=step["completion_criteria"]
+            )
+            for step in self.steps
+        ]
+        self._chat_instruction = PromptTemplate(CHAT_INSTRUCTION_TEMPLATE, role=self.role, title=self.title)
+        self._greeting = PromptTemplate(GREETING_TEMPLATE, role=self.role)
+        self._rendered: Dict[Tuple, str] = {}
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def _memoized(self, key: Tuple, template: PromptTemplate, language: str, instruction: str) -> str:
+        prompt = self._rendered.get(key)
+        if prompt is None:
+            prompt = self._rendered[key] = template.render(
+                language=language.title(), language_instruction=instruction
+            )
+        return prompt
+
+    def prompt_prefix(self, step_index: int, language: str) -> str:
+        """Static part of a normal turn's prompt (role, scenario, step, guidelines)."""
+        return self._memoized(("prefix", step_index, language), self._prompt_prefixes[step_index],
+                              language, language_instruction(language))
+
+    def chat_instruction(self, language: str) -> str:
+        """System instruction for the chat engine (without the running summary)."""
+        return self._memoized(("chat", language), self._chat_instruction,
+                              language, language_instruction(language))
+
+    def greeting_prompt(self, language: str) -> str:
+        """Prompt for the opening line of a conversation."""
+        return self._memoized(("greeting", language), self._greeting,
+                              language, greeting_language_instruction(language))
+
+    def evaluation_prompt(self, step_index: int, user_input: str, ai_response: str) -> str:
+        """Prompt asking whether a step's completion criteria are met."""
+        return self._evaluations[step_index].render(user_input=user_input, ai_response=ai_response)
+
+
+class ScenarioRegistry:
+    """Scenarios loaded from a directory of JSON files, reloaded when files change.
+
+    refresh() stats the directory's files (at most once per check_interval
+    seconds) and reloads only files whose modification time or size changed.
+    A file that fails validation is logged and reported in errors; if an earlier
+    version of it loaded fine, that version stays in use.
+    """
+
+    def __init__(self, directory: str = "scenarios", check_interval: float = 2.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.scenarios: Dict[str, Scenario] = {}
+        self.errors: Dict[str, List[Dict]] = {}  # file name -> problems
+        self.loads = 0
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def __len__(self) -> int:
+        return len(self.scenarios)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.scenarios
+
+    def get(self, name: str) -> Optional[Scenario]:
+        return self.scenarios.get(name)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload changed, added and removed scenario files; returns True if anything changed."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json") and e.is_file()]
+            except FileNotFoundError:
+                logger.error("Scenarios directory not found", extra={"directory": self.directory})
+                entries = []
+
+            changed = False
+            scenarios = dict(self.scenarios)
+            signatures = {}
+            for entry in entries:
+                stat = entry.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                signatures[entry.name] = signature
+                if self._signatures.get(entry.name) == signature:
+                    continue
+                changed = True
+                scenario = self._load(entry.name, entry.path)
+                if scenario is not None:
+                    scenarios[scenario.name] = scenario
+
+            for file_name in set(self._signatures) - set(signatures):
+                changed = True
+                scenarios.pop(file_name[:-5], None)
+                self.errors.pop(file_name, None)
+                logger.info("Removed scenario", extra={"scenario": file_name[:-5]})
+
+            self._signatures = signatures
+            # Replace the mapping in one step so readers never see a partial reload
+            self.scenarios = scenarios
+            return changed
+
+    def _load(self, file_name: str, path: str) -> Optional[Scenario]:
+        name = file_name[:-5]  # Remove .json extension
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            scenario = Scenario(name, data, file=file_name)
+        except json.JSONDecodeError as e:
+            error = ScenarioError(file_name, [{
+                "file": file_name, "path": f"line {e.lineno} column {e.colno}", "message": e.msg
+            }])
+        except ScenarioError as e:
+            error = e
+        except OSError as e:
+            error = ScenarioError(file_name, [{"file": file_name, "path": "$", "message": str(e)}])
+        else:
+            self.loads += 1
+            self.errors.pop(file_name, None)
+            logger.info("Loaded scenario", extra={"scenario": name, "steps": len(scenario.steps)})
+            return scenario
+
+        self.errors[file_name] = error.errors
+        logger.error("Invalid scenario file %s", error, extra={"file": file_name, "errors": error.errors})
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": sorted(self.scenarios),
+            "errors": [error for errors in self.errors.values() for error in errors]
+        }
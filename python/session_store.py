@@ -0,0 +1,292 @@
+import json
+import time
+import uuid
+import heapq
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class SessionStore(ABC):
+    """Where live conversation sessions are kept between requests.
+
+    A session is a dict holding the chatbot and its bookkeeping (scenario,
+    language, audio counter, ...). Persistent stores serialize it on save()
+    and rebuild it on get(), so they can outlive the process and be shared by
+    several worker processes.
+    """
+
+    # Whether save() must be called for changes to a session to be kept
+    persistent = False
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict]:
+        """Load a session, or None if it does not exist."""
+
+    @abstractmethod
+    async def save(self, session_id: str, session: Dict):
+        """Store a new or updated session."""
+
+    async def exists(self, session_id: str) -> bool:
+        """Whether a session is live."""
+        return await self.get(session_id) is not None
+
+    @abstractmethod
+    async def touch(self, session_id: str, session: Dict):
+        """Record activity on a session (extends its lifetime)."""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Remove a session; returns False if it did not exist."""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of live sessions."""
+
+    @abstractmethod
+    def lock(self, session_id: str):
+        """Lock that serializes turns within one session.
+
+        Usable as an async context manager, or via awaited acquire()/release()
+        when the lock has to outlive the request handler.
+        """
+
+    async def expired(self) -> List[str]:
+        """IDs of sessions whose idle deadline has passed (removed by the caller).
+
+        Each ID is reported once; only expired entries are visited.
+        """
+        return []
+
+    async def close(self):
+        """Release any connections."""
+
+
+class LocalLock:
+    """Per-process session lock with the same awaitable interface as RedisLock."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        await self._lock.acquire()
+
+    async def release(self):
+        self._lock.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions kept as live objects in this process (lost on restart).
+
+    Idle deadlines are kept in a min-heap. Touching a session pushes a new entry
+    and leaves the old one behind; stale entries are skipped when they surface.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.sessions: Dict[str, Dict] = {}
+        self._locks: Dict[str, LocalLock] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def _set_deadline(self, session_id: str):
+        deadline = time.monotonic() + self.ttl_seconds
+        self._deadlines[session_id] = deadline
+        heapq.heappush(self._heap, (deadline, session_id))
+
+        # Drop stale entries once they outnumber live ones
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(d, s) for s, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        return self.sessions.get(session_id)
+
+    async def save(self, session_id: str, session: Dict):
+        if session_id not in self.sessions:
+            self._set_deadline(session_id)
+        self.sessions[session_id] = session
+
+    async def touch(self, session_id: str, session: Dict):
+        session["last_activity"] = datetime.now()
+        self._set_deadline(session_id)
+
+    async def delete(self, session_id: str) -> bool:
+        self._locks.pop(session_id, None)
+        self._deadlines.pop(session_id, None)
+        return self.sessions.pop(session_id, None) is not None
+
+    async def count(self) -> int:
+        return len(self.sessions)
+
+    def lock(self, session_id: str) -> LocalLock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = LocalLock()
+        return lock
+
+    async def expired(self) -> List[str]:
+        now = time.monotonic()
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, session_id = heapq.heappop(self._heap)
+            if self._deadlines.get(session_id) == deadline:
+                del self._deadlines[session_id]
+                expired.append(session_id)
+        return expired
+
+
+# Delete the lock only if it still holds our token, in one step: between a separate
+# GET and DEL the lock could expire and be taken by another worker
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """Cross-process session lock built on SET NX with an expiry."""
+
+    def __init__(self, client, key: str, timeout_seconds: float = 120, poll_seconds: float = 0.05):
+        self.client = client
+        self.key = key
+        self.timeout_ms = int(timeout_seconds * 1000)
+        self.poll_seconds = poll_seconds
+        self.token = None
+
+    async def acquire(self):
+        token = uuid.uuid4().hex
+        while not await self.client.set(self.key, token, nx=True, px=self.timeout_ms):
+            await asyncio.sleep(self.poll_seconds)
+        self.token = token
+
+    async def release(self):
+        if self.token is None:
+            return
+        await self.client.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+        self.token = None
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions serialized into Redis (or anything speaking its protocol).
+
+    Each session is one compact JSON value whose TTL is the session timeout, so
+    Redis expires idle sessions itself. Idle deadlines are also kept in a sorted
+    set so expired() can report which sessions went away (for file cleanup).
+    encode turns a live session dict into a JSON-serializable dict and decode
+    rebuilds it, or returns None if the session can no longer be rebuilt (it is
+    then dropped).
+    """
+
+    persistent = True
+
+    def __init__(self, client, encode: Callable[[Dict], Dict], decode: Callable[[Dict], Dict],
+                 ttl_seconds: int, prefix: str = "voicechat:session:",
+                 lock_prefix: str = "voicechat:lock:",
+                 deadlines_key: str = "voicechat:deadlines"):
+        self.client = client
+        self.encode = encode
+        self.decode = decode
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.lock_prefix = lock_prefix
+        self.deadlines_key = deadlines_key
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        raw = await self.client.get(self._key(session_id))
+        if raw is None:
+            return None
+        session = self.decode(json.loads(raw))
+        if session is None:
+            # Its deadline stays, so expired() still reports it for file cleanup
+            await self.client.delete(self._key(session_id))
+        return session
+
+    def _queue_deadline(self, pipe, session_id: str):
+        pipe.zadd(self.deadlines_key, {session_id: time.time() + self.ttl_seconds})
+
+    async def save(self, session_id: str, session: Dict):
+        raw = json.dumps(self.encode(session), ensure_ascii=False, separators=(",", ":"))
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self._key(session_id), raw.encode("utf-8"), ex=self.ttl_seconds)
+            self._queue_deadline(pipe, session_id)
+            await pipe.execute()
+
+    async def touch(self, session_id: str, session: Dict):
+        session["last_activity"] = datetime.now()
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.expire(self._key(session_id), self.ttl_seconds)
+            self._queue_deadline(pipe, session_id)
+            await pipe.execute()
+
+    async def delete(self, session_id: str) -> bool:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(self._key(session_id))
+            pipe.zrem(self.deadlines_key, session_id)
+            deleted, _ = await pipe.execute()
+        return bool(deleted)
+
+    async def expired(self) -> List[str]:
+        expired = await self.client.zrangebyscore(self.deadlines_key, "-inf", time.time())
+        # Whichever worker removes an ID from the set reports it
+        claimed = []
+        for member in expired:
+            if await self.client.zrem(self.deadlines_key, member):
+                claimed.append(member.decode())
+        return claimed
+
+    async def exists(self, session_id: str) -> bool:
+        return bool(await self.client.exists(self._key(session_id)))
+
+    async def count(self) -> int:
+        # Sessions whose idle deadline has not passed; Redis has expired the others
+        return await self.client.zcount(self.deadlines_key, time.time(), "+inf")
+
+    def lock(self, session_id: str) -> RedisLock:
+        return RedisLock(self.client, f"{self.lock_prefix}{session_id}")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_session_store(url: str, encode: Callable[[Dict], Dict], decode: Callable[[Dict], Dict],
+                         ttl_seconds: int) -> SessionStore:
+    """Create a session store from a URL.
+
+    memory://         in-process store (default)
+    redis://...       Redis or a Redis-protocol server (needs the redis package)
+    fakeredis://      in-process Redis stand-in for local runs (needs fakeredis[lua])
+    """
+    if not url or url.startswith("memory://"):
+        return InMemorySessionStore(ttl_seconds)
+
+    if url.startswith("fakeredis://"):
+        from fakeredis import FakeAsyncRedis
+        client = FakeAsyncRedis()
+    elif url.startswith(("redis://", "rediss://", "unix://")):
+        import redis.asyncio as redis
+        client = redis.from_url(url)
+    else:
+        raise ValueError(f"Unsupported session store URL: {url}")
+
+    return RedisSessionStore(client, encode, decode, ttl_seconds)
@@ -0,0 +1,190 @@
+import re
+import asyncio
+from typing import AsyncIterator, Callable, List, Optional
+
+# A sentence ends at . ! ? or … followed by closing quotes/brackets and whitespace, or at
+# full-width CJK punctuation (which is not followed by a space)
+SENTENCE_END = re.compile(r'[.!?…]+["\'”’»)\]]*\s+|[。！？]+["”’」』)]*')
+# Sentences shorter than this are merged with the next one: every segment is a TTS
+# request of its own, and a lone "Oui !" loses the intonation of its sentence
+MIN_SEGMENT_CHARS = 20
+
+
+class SentenceSplitter:
+    """Cuts text arriving in pieces into segments of whole sentences."""
+
+    def __init__(self, min_chars: int = MIN_SEGMENT_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return the segments it completed."""
+        self._buffer += text
+        segments = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            segment = self._buffer[start:match.end()].strip()
+            if len(segment) >= self.min_chars:
+                segments.append(segment)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """The text left over once the input is complete, if any."""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        return segment or None
+
+
+class SpeechCancelled(Exception):
+    """The pipeline was cancelled before the reply was fully spoken."""
+
+
+class _Segment:
+    def __init__(self, text: str):
+        self.text = text
+        self.chunks: "asyncio.Queue" = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SpeechPipeline:
+    """Speaks a reply sentence by sentence while it is still being generated.
+
+    Reply text is fed as it arrives (feed_threadsafe() from the thread generating
+    it, then finish_threadsafe() with the full reply) and every complete segment
+    is synthesized right away, up to max_concurrent at a time, with
+    synthesize(text), an async iterator over audio chunks. audio() yields the
+    segments' audio in order, streaming the chunks of the segment being played as
+    they arrive while later ones are synthesized. With split=False the whole reply
+    is a single segment, synthesized once finish() is called.
+
+    Must be created on the event loop that consumes it.
+    """
+
+    def __init__(self, synthesize: Callable[[str], AsyncIterator[bytes]], split: bool = True,
+                 max_concurrent: int = 3):
+        self._synthesize = synthesize
+        self._splitter = SentenceSplitter() if split else None
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._loop = asyncio.get_running_loop()
+        self._segments: List[_Segment] = []
+        self._played = 0  # Segments audio() has started to yield
+        self._changed = asyncio.Event()
+        self.text = ""
+        self.finished = False
+        self._cancelled = False
+
+    def feed(self, text: str):
+        """Add reply text; segments it completes start synthesizing."""
+        if self.finished or not text:
+            return
+        self.text += text
+        if self._splitter is not None:
+            for segment in self._splitter.feed(text):
+                self._start(segment)
+
+    def feed_threadsafe(self, text: str):
+        """feed() from another thread, e.g. the worker streaming the Gemini reply."""
+        try:
+            self._loop.call_soon_threadsafe(self.feed, text)
+        except RuntimeError:
+            # The loop is closing; nobody will play this reply
+            pass
+
+    def finish_threadsafe(self, reply: str):
+        """finish() from another thread."""
+        try:
+            self._loop.call_soon_threadsafe(self.finish, reply)
+        except RuntimeError:
+            pass
+
+    def finish(self, reply: str):
+        """Mark the reply complete. reply is the full text; whatever was not fed is spoken too.
+
+        If reply does not continue the text fed so far, it replaces the segments that
+        audio() has not reached yet; segments already being played are kept.
+        """
+        if self.finished:
+            return
+        if self._splitter is None:
+            if reply.strip():
+                self._start(reply.strip())
+        else:
+            if not reply.startswith(self.text):
+                # The reply was replaced (e.g. by an error message) after part of it was
+                # fed: segments not played yet are dropped, and whatever was already
+                # spoken is followed by the new reply
+                self._drop_unplayed()
+                self._splitter = SentenceSplitter()
+                self.text = ""
+            self.feed(reply[len(self.text):])
+            rest = self._splitter.flush()
+            if rest:
+                self._start(rest)
+        self.text = reply
+        self.finished = True
+        self._changed.set()
+
+    def cancel(self):
+        """Stop synthesizing; audio() raises SpeechCancelled instead of waiting for more."""
+        if self._cancelled:
+            return
+        self.finished = True
+        self._cancelled = True
+        for segment in self._segments:
+            segment.task.cancel()
+            # A task cancelled before it started never reports its end itself
+            segment.chunks.put_nowait(None)
+        self._changed.set()
+
+    def _drop_unplayed(self):
+        for segment in self._segments[self._played:]:
+            segment.task.cancel()
+            segment.chunks.put_nowait(None)
+        del self._segments[self._played:]
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    def _start(self, text: str):
+        segment = _Segment(text)
+        segment.task = asyncio.create_task(self._run(segment))
+        self._segments.append(segment)
+        self._changed.set()
+
+    async def _run(self, segment: _Segment):
+        try:
+            async with self._slots:
+                async for chunk in self._synthesize(segment.text):
+                    segment.chunks.put_nowait(chunk)
+        except Exception as e:
+            segment.chunks.put_nowait(e)
+        finally:
+            segment.chunks.put_nowait(None)
+
+    async def audio(self) -> AsyncIterator[bytes]:
+        """Audio chunks of all segments, in reply order, until the reply is finished."""
+        try:
+            while True:
+                if self._cancelled:
+                    raise SpeechCancelled("Speech synthesis was cancelled")
+                if self._played < len(self._segments):
+                    segment = self._segments[self._played]
+                    self._played += 1
+                    while True:
+                        chunk = await segment.chunks.get()
+                        if chunk is None:
+                            break
+                        if isinstance(chunk, Exception):
+                            raise chunk
+                        yield chunk
+                elif self.finished:
+                    return
+                else:
+                    self._changed.clear()
+                    await self._changed.wait()
+        finally:
+            # Stop synthesizing segments nobody will hear (error or client gone)
+            self.cancel()
@@ -0,0 +1,319 @@
+import os
+import re
+import io
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Union
+from dotenv import load_dotenv
+from tts_cache import TTSCache
+from providers import elevenlabs_client
+from speech_pipeline import SentenceSplitter
+import mp3
+
+load_dotenv()
+
+# Voice mappings for different languages
+VOICE_MAPPINGS = {
+    "english": "UpphzPau5vxibPYV2NeV",
+    "spanish": "9EU0h6CVtEDS6vriwwq5",
+    "french": "ohItIVrXTBI80RrUECOD",
+    "chinese": "ZL9dtgFhmkTzAHUUtQL8",
+    "japanese": "3JDquces8E8bkmvbh6Bc"
+}
+
+STT_MODEL_ID = "scribe_v1"
+# Containers ElevenLabs STT accepts as uploaded, without transcoding to WAV first
+STT_NATIVE_FORMATS = frozenset({"webm", "ogg", "mp3", "wav", "mp4", "flac"})
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+# Segments of one reply synthesized at once when it is not in the cache
+SEGMENT_CONCURRENCY = 4
+
+
+def split_segments(text: str) -> List[str]:
+    """Split a reply into the sentences that are synthesized and cached separately."""
+    splitter = SentenceSplitter()
+    segments = splitter.feed(text)
+    rest = splitter.flush()
+    if rest:
+        segments.append(rest)
+    return segments
+
+
+def parse_transcription(transcription) -> Dict[str, str]:
+    """Extract text and language_code from an ElevenLabs transcription response."""
+    result = {
+        'text': '',
+        'language_code': ''
+    }
+
+    if hasattr(transcription, 'text') and hasattr(transcription, 'language_code'):
+        # Direct access to attributes
+        result['text'] = transcription.text.strip()
+        result['language_code'] = transcription.language_code
+
+        # Speech duration, from the end of the last word (when timestamps are present)
+        words = getattr(transcription, 'words', None)
+        if words and getattr(words[-1], 'end', None) is not None:
+            result['duration'] = words[-1].end
+    else:
+        # Parse from string representation
+        transcription_str = str(transcription)
+
+        # Extract text
+        if 'text=' in transcription_str:
+            text_match = re.search(r'text="([^"]*)"', transcription_str)
+            if text_match:
+                result['text'] = text_match.group(1).strip()
+
+        # Extract language_code
+        if 'language_code=' in transcription_str:
+            lang_match = re.search(r'language_code=\'([^\']*)\'', transcription_str)
+            if lang_match:
+                result['language_code'] = lang_match.group(1)
+
+        # Fallback for text if not found
+        if not result['text']:
+            result['text'] = transcription_str.strip()
+
+    return result
+
+
+class SpeechService:
+    """Headless speech-to-text and text-to-speech backed by ElevenLabs.
+
+    Has no microphone or speaker dependencies, so one instance can be created at
+    server startup and shared by every request. All calls go through a single
+    pooled HTTP client, so connections (and TLS sessions) are reused across turns.
+    When a TTSCache is given, repeated utterances are served without calling ElevenLabs.
+
+    With segments on (and a cache), replies are synthesized and cached sentence by
+    sentence and the MP3 frames of the sentences joined without re-encoding, so a
+    reply that repeats earlier sentences (e.g. the fixed parts of a template) only
+    pays for its new ones.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, max_connections: int = 32, timeout: float = 60.0,
+                 cache: Optional[TTSCache] = None, segments: bool = True):
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=timeout
+        )
+        # The SDK client, or its recording/replaying stand-in (see PROVIDER_MODE)
+        self.elevenlabs = elevenlabs_client(
+            api_key=api_key or os.getenv("ELEVEN_API_KEY"),
+            httpx_client=self.http_client
+        )
+        self.voice_mappings = dict(VOICE_MAPPINGS)
+        self.cache = cache
+        self.segments = segments and TTS_OUTPUT_FORMAT.startswith("mp3")
+        self.native_formats = STT_NATIVE_FORMATS
+        # Uncached segments of a reply are synthesized here, not on the caller's pool,
+        # which may be the one running this call
+        self.segment_executor = ThreadPoolExecutor(max_workers=SEGMENT_CONCURRENCY,
+                                                   thread_name_prefix="tts-segment")
+
+    def accepts_format(self, container: str) -> bool:
+        """Check if STT can take audio in this container without transcoding."""
+        return container in self.native_formats
+
+    def voice_for(self, language: str) -> str:
+        """Get the voice ID for a language."""
+        return self.voice_mappings.get(language.lower(), "rachel")
+
+    def speech_to_text(self, audio: Union[str, bytes], filename: str = "audio") -> Dict[str, str]:
+        """Transcribe an audio file path or raw audio bytes.
+
+        Returns a dict with 'text' and 'language_code' (both empty on failure).
+        """
+        try:
+            if isinstance(audio, (bytes, bytearray)):
+                transcription = self.elevenlabs.speech_to_text.convert(
+                    file=(filename, io.BytesIO(audio)),
+                    model_id=STT_MODEL_ID,
+                    tag_audio_events=False,
+                    diarize=False,
+                )
+            else:
+                with open(audio, "rb") as audio_file:
+                    transcription = self.elevenlabs.speech_to_text.convert(
+                        file=audio_file,
+                        model_id=STT_MODEL_ID,
+                        tag_audio_events=False,
+                        diarize=False,
+                    )
+
+            return parse_transcription(transcription)
+        except Exception as e:
+            print(f"Error in speech-to-text: {e}")
+            return {'text': '', 'language_code': ''}
+
+    def cache_key(self, text: str, language: str) -> str:
+        """TTS cache key for text spoken in language."""
+        return TTSCache.make_key(text, self.voice_for(language), TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+
+    def segment_key(self, text: str, language: str) -> str:
+        """TTS cache key for one segment, stored as bare MP3 frames."""
+        return TTSCache.make_key(text, self.voice_for(language), TTS_MODEL_ID, f"{TTS_OUTPUT_FORMAT}/frames")
+
+    def text_to_speech_stream(self, text: str, language: str = "english") -> Iterator[bytes]:
+        """Start TTS and return an iterator over MP3 chunks as they arrive."""
+        if self.cache and self.segments:
+            return self._stream_segments(split_segments(text) or [text], language)
+
+        if self.cache:
+            key = self.cache_key(text, language)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return iter([cached])
+
+        voice_id = self.voice_for(language)
+
+        print(f"Streaming speech with voice: {voice_id}")
+        print(f"Text to convert: '{text}'")
+
+        chunks = self.elevenlabs.text_to_speech.stream(
+            text=text,
+            voice_id=voice_id,
+            model_id=TTS_MODEL_ID,
+            output_format=TTS_OUTPUT_FORMAT,
+        )
+        if not self.cache:
+            return chunks
+        return self._cache_stream(key, chunks)
+
+    def _cache_stream(self, key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass chunks through and cache the audio once the stream completes."""
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.cache.put(key, b"".join(received))
+
+    def _stream_segments(self, segments: List[str], language: str) -> Iterator[bytes]:
+        """Stream the first segment while the others are synthesized in the background."""
+        later = [self.segment_executor.submit(self._segment_audio, segment, language)
+                 for segment in segments[1:]]
+        try:
+            yield from self._segment_stream(segments[0], language)
+            for future in later:
+                yield future.result()
+        finally:
+            for future in later:
+                future.cancel()
+
+    def _segment_stream(self, text: str, language: str) -> Iterator[bytes]:
+        """Stream one segment's MP3 frames, from the cache or from ElevenLabs."""
+        key = self.segment_key(text, language)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        voice_id = self.voice_for(language)
+
+        print(f"Streaming speech with voice: {voice_id}")
+        print(f"Text to convert: '{text}'")
+
+        frames = mp3.FrameStream()
+        received = []
+        for chunk in self.elevenlabs.text_to_speech.stream(
+            text=text,
+            voice_id=voice_id,
+            model_id=TTS_MODEL_ID,
+            output_format=TTS_OUTPUT_FORMAT,
+        ):
+            chunk = frames.feed(chunk)
+            if chunk:
+                received.append(chunk)
+                yield chunk
+        rest = frames.close()
+        if rest:
+            received.append(rest)
+            yield rest
+        self.cache.put(key, b"".join(received))
+
+    def _segment_audio(self, text: str, language: str) -> bytes:
+        """One segment's MP3 frames, from the cache or from ElevenLabs."""
+        key = self.segment_key(text, language)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        voice_id = self.voice_for(language)
+
+        print(f"Generating speech with voice: {voice_id}")
+        print(f"Text to convert: '{text}'")
+
+        audio = self.elevenlabs.text_to_speech.convert(
+            text=text,
+            voice_id=voice_id,
+            model_id=TTS_MODEL_ID,
+            output_format=TTS_OUTPUT_FORMAT,
+        )
+        audio = mp3.bare_frames(b"".join(audio))
+        self.cache.put(key, audio)
+        return audio
+
+    def synthesize(self, text: str, language: str = "english") -> bytes:
+        """Convert text to a complete MP3 byte string."""
+        if self.cache and self.segments:
+            segments = split_segments(text) or [text]
+            if len(segments) == 1:
+                return self._segment_audio(segments[0], language)
+            return b"".join(self.segment_executor.map(self._segment_audio, segments,
+                                                      [language] * len(segments)))
+
+        if self.cache:
+            key = self.cache_key(text, language)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        voice_id = self.voice_for(language)
+
+        print(f"Generating speech with voice: {voice_id}")
+        print(f"Text to convert: '{text}'")
+
+        audio = self.elevenlabs.text_to_speech.convert(
+            text=text,
+            voice_id=voice_id,
+            model_id=TTS_MODEL_ID,
+            output_format=TTS_OUTPUT_FORMAT,
+        )
+        audio = b"".join(audio)
+
+        if self.cache:
+            self.cache.put(key, audio)
+        return audio
+
+    def text_to_speech_file(self, text: str, language: str = "english", output_path: Optional[str] = None) -> bool:
+        """Convert text to speech and save it to output_path (a temp file if omitted)."""
+        try:
+            audio = self.synthesize(text, language)
+
+            # If no output path provided, create a temporary file
+            if not output_path:
+                import tempfile
+                with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
+                    output_path = temp_file.name
+
+            with open(output_path, "wb") as f:
+                f.write(audio)
+
+            print(f"✅ Audio saved to: {output_path}")
+            return True
+
+        except Exception as e:
+            print(f"Error in text-to-speech: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def close(self):
+        """Close the pooled HTTP client and the segment workers."""
+        self.segment_executor.shutdown(wait=False, cancel_futures=True)
+        self.http_client.close()
@@ -0,0 +1,58 @@
+"""The API server, in-process, with the sleeping fake providers from benchmarks/loadtest.py."""
+import os
+import sys
+import types
+import shutil
+import asyncio
+import tempfile
+
+import pytest
+
+PYTHON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, PYTHON_DIR)
+sys.path.insert(0, os.path.join(PYTHON_DIR, "benchmarks"))
+
+# Latency of every fake provider call
+PROVIDER_MS = 200
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The api_server module, started, with a sample recording and run(coroutine).
+
+    The server's lifespan can only run once per process, so every test runs its
+    coroutines with run() on the one event loop the server was started on. The
+    server uses a temporary AUDIO_DIR and caches.
+    """
+    work_dir = tempfile.mkdtemp(prefix="voicechat-test-")
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ.setdefault("ELEVEN_API_KEY", "offline")
+    os.environ["AUDIO_DIR"] = os.path.join(work_dir, "audio")
+    os.environ["TTS_CACHE_DIR"] = os.path.join(work_dir, "tts_cache")
+    os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(work_dir, "translation_cache.sqlite3")
+    os.environ["SESSION_STORE_URL"] = "memory://"
+    # Silence trimming needs ffmpeg; it is not what these tests measure
+    os.environ["VAD_ENABLED"] = "false"
+
+    from loadtest import Latency, make_fake_genai, make_fake_elevenlabs, load_samples
+    import providers
+    latency = Latency(PROVIDER_MS, 0)
+    providers.load_genai().GenerativeModel = make_fake_genai(latency, 0)
+    import elevenlabs.client
+    elevenlabs.client.ElevenLabs = make_fake_elevenlabs(latency, latency)
+
+    import api_server
+    loop = asyncio.new_event_loop()
+    lifespan = api_server.app.router.lifespan_context(api_server.app)
+    loop.run_until_complete(lifespan.__aenter__())
+    try:
+        yield types.SimpleNamespace(api_server=api_server, sample=load_samples()[0],
+                                    run=loop.run_until_complete)
+    finally:
+        loop.run_until_complete(lifespan.__aexit__(None, None, None))
+        # The server's periodic tasks (e.g. session cleanup) run until cancelled
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+        loop.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
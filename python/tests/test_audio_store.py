@@ -0,0 +1,54 @@
+"""Startup reconciliation over a mix of flat (legacy) and sharded session directories."""
+import os
+import time
+import uuid
+
+from audio_store import AudioStore, SESSION_MARKER
+
+
+def make_dir(root, *parts, files=("response_001.mp3",), marker=False, age=3600):
+    path = os.path.join(root, *parts)
+    os.makedirs(path)
+    for name in files:
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(b"x" * 100)
+    if marker:
+        open(os.path.join(path, SESSION_MARKER), "a").close()
+    old = time.time() - age
+    os.utime(path, (old, old))
+    return path
+
+
+def test_reconcile_flat_and_sharded_directories(tmp_path):
+    root = str(tmp_path)
+    flat_dead, flat_live, flat_recent = (str(uuid.uuid4()) for _ in range(3))
+    sharded_dead, sharded_live, unmarked = (str(uuid.uuid4()) for _ in range(3))
+
+    make_dir(root, flat_dead)
+    make_dir(root, flat_live, files=("input_1.webm", "response_001.mp3"))
+    make_dir(root, flat_recent, age=0)
+    make_dir(root, "samples")
+    make_dir(root, sharded_dead[:2], sharded_dead, marker=True)
+    make_dir(root, sharded_live[:2], sharded_live, marker=True)
+    make_dir(root, unmarked[:2], unmarked)
+
+    store = AudioStore(root, session_quota_bytes=10 ** 6, max_bytes=10 ** 7, orphan_grace_seconds=300)
+    report = store.reconcile({flat_live, sharded_live})
+
+    # Dead sessions go, whichever layout they used; recent or foreign directories stay
+    assert report["orphans_removed"] == 2
+    assert not os.path.exists(os.path.join(root, flat_dead))
+    assert not os.path.exists(os.path.join(root, sharded_dead[:2], sharded_dead))
+    assert os.path.isdir(os.path.join(root, flat_recent))
+    assert os.path.isdir(os.path.join(root, "samples"))
+    assert os.path.isdir(os.path.join(root, unmarked[:2], unmarked))
+
+    # A live flat session is moved into its shard and indexed there
+    assert not os.path.exists(os.path.join(root, flat_live))
+    assert store.exists(flat_live, "input_1.webm")
+    assert store.exists(flat_live, "response_001.mp3")
+    assert report["files"] == 3
+    assert store.stats()["sessions"] == 2
+
+    # Once moved, the directory is the store's own and is collected when the session ends
+    assert store.remove_sessions([flat_live]) == 1
@@ -0,0 +1,56 @@
+"""Concurrent turns on one worker: N sessions finish in about the time of one turn.
+
+Runs api_server.app in-process with the sleeping fake Gemini and ElevenLabs
+providers from benchmarks/loadtest.py, so no network or API keys are needed.
+Each fake call blocks its worker thread like the real SDKs do; if a stage ran on
+the event loop instead of a worker pool, the turns would serialize.
+"""
+import time
+import asyncio
+
+import httpx
+
+from conftest import PROVIDER_MS
+
+# Within the default STT and TTS pool sizes (8), so every turn gets a worker at once
+SESSIONS = 8
+
+
+async def run_turns(api_server, sample, sessions):
+    """Start sessions, then time one sequential turn and one round of concurrent turns."""
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost:8000", timeout=60) as client:
+        session_ids = []
+        for _ in range(sessions):
+            response = await client.post("/api/session/start",
+                                         json={"scenario": "restaurant", "language": "fr"})
+            assert response.status_code == 200
+            session_ids.append(response.json()["sessionId"])
+
+        async def turn(session_id):
+            response = await client.post(
+                f"/api/session/{session_id}/process",
+                files={"audio": ("recording.webm", sample, "audio/webm")}
+            )
+            assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await turn(session_ids[0])
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await asyncio.gather(*[turn(session_id) for session_id in session_ids])
+        concurrent = time.perf_counter() - started
+
+        for session_id in session_ids:
+            await client.delete(f"/api/session/{session_id}")
+    return single, concurrent
+
+
+def test_concurrent_sessions_take_about_one_turn(server):
+    single, concurrent = server.run(run_turns(server.api_server, server.sample, SESSIONS))
+
+    # One turn is several sequential provider calls (STT, Gemini, TTS)
+    assert single >= 2 * PROVIDER_MS / 1000
+    # Serialized, the round would take SESSIONS times as long
+    assert concurrent < 2 * single, f"{SESSIONS} concurrent turns took {concurrent:.2f}s, one took {single:.2f}s"
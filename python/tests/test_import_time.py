@@ -0,0 +1,16 @@
+"""The API server imports within budget and without its lazily loaded dependencies."""
+import os
+import sys
+import subprocess
+
+from conftest import PYTHON_DIR
+
+
+def test_bench_import_passes():
+    result = subprocess.run(
+        [sys.executable, os.path.join("benchmarks", "bench_import.py"), "--runs", "3"],
+        cwd=PYTHON_DIR,
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,65 @@
+"""Provider calls recorded to a cassette replay with the recorded responses."""
+from loadtest import Latency, make_fake_genai, make_fake_elevenlabs, load_samples
+
+from providers import (Cassette, RecordingGenerativeModel, RecordingElevenLabs,
+                       ReplayGenerativeModel, ReplayElevenLabs, chunk_text)
+
+MODEL = "gemini-test"
+SYSTEM = "You are a waiter in a French restaurant."
+PROMPT = "The customer says: bonjour. Reply in French."
+TEXT = "Bonjour, une table pour deux ?"
+
+
+def make_calls(model, client, audio):
+    """One call of every kind the server makes, returning what each produced."""
+    reply = model.generate_content(PROMPT).text
+    streamed = [chunk_text(chunk) for chunk in model.generate_content(PROMPT + " Stream it.", stream=True)]
+    chat = model.start_chat(history=[{"role": "user", "parts": ["Bonjour"]}])
+    answer = chat.send_message("Une table pour deux, s'il vous plaît.").text
+    transcription = client.speech_to_text.convert(file=("input.webm", audio), model_id="scribe_v1")
+    converted = list(client.text_to_speech.convert(text=TEXT, voice_id="voice"))
+    stream = list(client.text_to_speech.stream(text=TEXT, voice_id="voice"))
+    return {
+        "reply": reply,
+        "streamed": streamed,
+        "answer": answer,
+        "transcript": (transcription.text, transcription.language_code),
+        "converted": converted,
+        "stream": stream,
+    }
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    no_delay = Latency(0, 0)
+    audio = load_samples()[0]
+
+    recorder = Cassette(path)
+    model = RecordingGenerativeModel(make_fake_genai(no_delay, 0)(MODEL, SYSTEM), recorder, MODEL, SYSTEM)
+    client = RecordingElevenLabs(make_fake_elevenlabs(no_delay, no_delay)(), recorder)
+    recorded = make_calls(model, client, audio)
+    recorder.close()
+    assert recorder.recorded == 6
+
+    player = Cassette(path, latency_scale=0, strict=True)
+    player.load()
+    replayed = make_calls(ReplayGenerativeModel(player, MODEL, SYSTEM), ReplayElevenLabs(player), audio)
+
+    assert replayed == recorded
+    # Convert and stream of one text are separate recordings with their own chunking
+    assert len(recorded["converted"]) == 1 and len(recorded["stream"]) > 1
+    assert player.stats()["hits"] == 6 and player.stats()["misses"] == 0
+
+
+def test_tts_falls_back_to_the_other_operation(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    recorder = Cassette(path)
+    no_delay = Latency(0, 0)
+    client = RecordingElevenLabs(make_fake_elevenlabs(no_delay, no_delay)(), recorder)
+    stream = list(client.text_to_speech.stream(text=TEXT, voice_id="voice"))
+    recorder.close()
+
+    player = Cassette(path, latency_scale=0, strict=True)
+    player.load()
+    assert b"".join(ReplayElevenLabs(player).text_to_speech.convert(text=TEXT, voice_id="voice")) == b"".join(stream)
+    assert player.stats()["hits"] == 1
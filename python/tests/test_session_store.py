@@ -0,0 +1,133 @@
+"""The Redis session store, run against fakeredis (in-process, with Lua scripting)."""
+import json
+import time
+import asyncio
+from datetime import datetime
+
+import httpx
+
+from session_store import RedisLock, create_session_store
+
+TTL_SECONDS = 60
+
+
+def encode(session):
+    return {"turns": session["turns"]}
+
+
+def decode(data):
+    return {"turns": data["turns"], "last_activity": datetime.now()}
+
+
+def create_store(decode=decode):
+    return create_session_store("fakeredis://", encode, decode, TTL_SECONDS)
+
+
+async def expire(store, session_id):
+    """Move a session's idle deadline into the past (Redis drops the value itself)."""
+    await store.client.zadd(store.deadlines_key, {session_id: time.time() - 1})
+    await store.client.delete(store._key(session_id))
+
+
+def test_save_get_touch():
+    async def run():
+        store = create_store()
+        assert await store.get("a") is None
+        await store.save("a", {"turns": 1})
+        session = await store.get("a")
+        assert session["turns"] == 1 and await store.exists("a")
+
+        await store.client.expire(store._key("a"), 5)
+        await store.touch("a", session)
+        assert await store.client.ttl(store._key("a")) > 5
+        deadline = await store.client.zscore(store.deadlines_key, "a")
+        assert deadline > time.time() + TTL_SECONDS - 5
+
+        assert await store.delete("a")
+        assert not await store.delete("a")
+        assert await store.get("a") is None
+        await store.close()
+    asyncio.run(run())
+
+
+def test_expiry_through_the_deadlines_set():
+    async def run():
+        store = create_store()
+        for session_id in ("a", "b", "c"):
+            await store.save(session_id, {"turns": 0})
+        assert await store.count() == 3
+
+        await expire(store, "a")
+        await expire(store, "b")
+        assert await store.count() == 1
+        assert sorted(await store.expired()) == ["a", "b"]
+        # Each expired session is reported once
+        assert await store.expired() == []
+        assert await store.count() == 1 and await store.exists("c")
+        await store.close()
+    asyncio.run(run())
+
+
+def test_lock_release():
+    async def run():
+        store = create_store()
+        lock = store.lock("a")
+        await lock.acquire()
+        other = store.lock("a")
+        waiting = asyncio.create_task(other.acquire())
+        await asyncio.sleep(0.2)
+        assert not waiting.done()
+
+        await lock.release()
+        await asyncio.wait_for(waiting, 5)
+        await other.release()
+        assert await store.client.get(other.key) is None
+        await store.close()
+    asyncio.run(run())
+
+
+def test_lock_whose_token_was_stolen_is_not_released():
+    async def run():
+        store = create_store()
+        lock = RedisLock(store.client, "voicechat:lock:a", timeout_seconds=0.1)
+        await lock.acquire()
+        # The lock times out and another worker takes it
+        await asyncio.sleep(0.2)
+        thief = store.lock("a")
+        await thief.acquire()
+
+        await lock.release()
+        assert await store.client.get(thief.key) == thief.token.encode()
+        await thief.release()
+        assert await store.client.get(thief.key) is None
+        await store.close()
+    asyncio.run(run())
+
+
+def test_session_whose_scenario_is_gone_is_dropped(server):
+    api_server = server.api_server
+
+    async def run():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost:8000", timeout=60) as client:
+            response = await client.post("/api/session/start",
+                                         json={"scenario": "restaurant", "language": "fr"})
+            session_id = response.json()["sessionId"]
+            session = await api_server.session_store.get(session_id)
+            store = create_session_store("fakeredis://", api_server.serialize_session,
+                                         api_server.deserialize_session, TTL_SECONDS)
+            await store.save(session_id, session)
+            assert (await store.get(session_id))["scenario"] == "restaurant"
+            await client.delete(f"/api/session/{session_id}")
+
+            # The scenario was renamed or removed by a hot reload
+            raw = json.loads(await store.client.get(store._key(session_id)))
+            raw["scenario"] = "restaurant-renamed"
+            await store.client.set(store._key(session_id), json.dumps(raw))
+            assert await store.get(session_id) is None
+            assert not await store.exists(session_id)
+            # The deadline stays so the session's files are still cleaned up
+            assert await store.client.zscore(store.deadlines_key, session_id) is not None
+            await store.close()
+
+    server.run(run())
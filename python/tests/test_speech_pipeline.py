@@ -0,0 +1,41 @@
+"""A reply replaced after part of it was fed (e.g. by an error message) is spoken consistently."""
+import asyncio
+
+from speech_pipeline import SpeechPipeline
+
+FIRST = "Bonjour monsieur, bienvenue chez nous. "
+ERROR = "Sorry, I encountered an error: boom"
+
+
+async def synthesize(text):
+    await asyncio.sleep(0.01)
+    yield f"[{text}]".encode()
+
+
+async def speak(played_first: bool):
+    pipeline = SpeechPipeline(synthesize)
+    chunks = []
+    first_chunk = asyncio.Event()
+
+    async def listen():
+        async for chunk in pipeline.audio():
+            chunks.append(chunk)
+            first_chunk.set()
+
+    listening = asyncio.create_task(listen()) if played_first else None
+    pipeline.feed(FIRST + "Que dés")
+    if played_first:
+        await first_chunk.wait()
+    pipeline.finish(ERROR)
+    if listening is None:
+        listening = asyncio.create_task(listen())
+    await listening
+    return b"".join(chunks).decode()
+
+
+def test_unplayed_segments_are_replaced():
+    assert asyncio.run(speak(played_first=False)) == f"[{ERROR}]"
+
+
+def test_played_segments_are_followed_by_the_new_reply():
+    assert asyncio.run(speak(played_first=True)) == f"[{FIRST.strip()}][{ERROR}]"
@@ -0,0 +1,47 @@
+"""Concurrent requests for one speech URL share a single synthesis."""
+import os
+import asyncio
+
+import httpx
+
+
+async def fetch_twice(api_server, sample):
+    """Take a streamed turn, fetch its speech URL twice at once, then once more."""
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost:8000", timeout=60) as client:
+        response = await client.post("/api/session/start",
+                                     json={"scenario": "restaurant", "language": "fr", "stream": True})
+        session_id = response.json()["sessionId"]
+        response = await client.post(
+            f"/api/session/{session_id}/process",
+            params={"stream": "true"},
+            files={"audio": ("recording.webm", sample, "audio/webm")}
+        )
+        assert response.status_code == 200, response.text
+        speech_url = response.json()["audioUrl"]
+
+        first, second = await asyncio.gather(client.get(speech_url), client.get(speech_url))
+        files = sorted(os.listdir(api_server.audio_store.session_dir(session_id)))
+        third = await client.get(speech_url)
+        await client.delete(f"/api/session/{session_id}")
+    return first, second, third, files
+
+
+def test_concurrent_requests_share_one_synthesis(server, monkeypatch):
+    api_server = server.api_server
+    started = []
+    synthesize_stream = api_server.synthesize_stream
+
+    def counting_synthesize_stream(text, language):
+        started.append(text)
+        return synthesize_stream(text, language)
+
+    monkeypatch.setattr(api_server, "synthesize_stream", counting_synthesize_stream)
+    first, second, third, files = server.run(fetch_twice(api_server, server.sample))
+
+    assert first.status_code == second.status_code == third.status_code == 200
+    assert first.content and first.content == second.content == third.content
+    assert len(started) == 1
+    # Published once, no partial file left behind
+    assert "response_001.mp3" in files
+    assert not [name for name in files if name.endswith(".part")]
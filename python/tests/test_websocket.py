@@ -0,0 +1,173 @@
+"""The conversation WebSocket: events in order over two turns, and controls that fail cleanly."""
+import json
+import asyncio
+
+import httpx
+
+# Size of the audio frames sent, like MediaRecorder chunks
+FRAME_BYTES = 4000
+
+
+class WebSocketClient:
+    """Drives the app's WebSocket endpoint over ASGI on the server's event loop."""
+
+    def __init__(self, app, path: str):
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": path,
+            "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+            "server": ("localhost", 8000), "client": ("test", 50000), "subprotocols": []
+        }
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(app(scope, self.incoming.get, self.outgoing.put))
+
+    async def receive(self):
+        """Next message from the server: a dict for JSON events, bytes for audio."""
+        message = await asyncio.wait_for(self.outgoing.get(), 30)
+        if message["type"] == "websocket.accept":
+            return await self.receive()
+        if message["type"] == "websocket.close":
+            return message
+        if message.get("bytes") is not None:
+            return message["bytes"]
+        return json.loads(message["text"])
+
+    def send_bytes(self, data: bytes):
+        self.incoming.put_nowait({"type": "websocket.receive", "bytes": data})
+
+    def send_text(self, text: str):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": text})
+
+    def send_json(self, data):
+        self.send_text(json.dumps(data))
+
+    def utter(self, audio: bytes):
+        for offset in range(0, len(audio), FRAME_BYTES):
+            self.send_bytes(audio[offset:offset + FRAME_BYTES])
+        self.send_json({"type": "end"})
+
+    async def close(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, 30)
+
+
+async def lock_is_free(api_server, session_id):
+    lock = api_server.session_store.lock(session_id)
+    try:
+        await asyncio.wait_for(lock.acquire(), 2)
+    except asyncio.TimeoutError:
+        return False
+    await lock.release()
+    return True
+
+
+async def two_turns(api_server, sample):
+    """Say two utterances back to back; returns the event types, whether all audio came
+    between audio_start and audio_end, the session status and whether its lock was free."""
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost:8000", timeout=60) as client:
+        response = await client.post("/api/session/start", json={"scenario": "restaurant", "language": "fr"})
+        session_id = response.json()["sessionId"]
+
+        socket = WebSocketClient(api_server.app, f"/api/session/{session_id}/ws")
+        assert (await socket.receive())["type"] == "ready"
+        # The second utterance is sent while the first is being answered
+        socket.utter(sample)
+        socket.utter(sample)
+
+        received = []
+        audio_in_order = True
+        while received.count("audio_end") < 2 or received.count("reply") < 2:
+            message = await socket.receive()
+            if isinstance(message, bytes):
+                audio_in_order &= received.count("audio_start") == received.count("audio_end") + 1
+            else:
+                received.append(message["type"])
+        await socket.close()
+
+        status = (await client.get(f"/api/session/{session_id}/status")).json()
+        free = await lock_is_free(api_server, session_id)
+        await client.delete(f"/api/session/{session_id}")
+    return received, audio_in_order, status, free
+
+
+async def failed_controls(api_server, sample, monkeypatch):
+    """Send each kind of bad input; returns the error details, whether the lock was free after
+    each dropped utterance, the session status and what a socket for a missing session gets."""
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost:8000", timeout=60) as client:
+        response = await client.post("/api/session/start", json={"scenario": "restaurant", "language": "fr"})
+        session_id = response.json()["sessionId"]
+
+        socket = WebSocketClient(api_server.app, f"/api/session/{session_id}/ws")
+        assert (await socket.receive())["type"] == "ready"
+        details = []
+        locks_free = []
+
+        socket.send_text("not json")
+        details.append((await socket.receive())["detail"])
+        socket.send_json({"type": "bogus"})
+        details.append((await socket.receive())["detail"])
+        socket.send_json({"type": "end"})
+        details.append((await socket.receive())["detail"])
+
+        # Cancelling an utterance releases the turn lock its first frame took
+        socket.send_bytes(sample[:FRAME_BYTES])
+        socket.send_json({"type": "cancel"})
+        socket.send_json({"type": "bogus"})
+        details.append((await socket.receive())["detail"])
+        locks_free.append(await lock_is_free(api_server, session_id))
+
+        # An oversize utterance is rejected once; its remaining frames and its end are ignored
+        monkeypatch.setattr(api_server, "MAX_UPLOAD_BYTES", 1024 * 1024)
+        socket.send_json({"type": "start", "format": "webm"})
+        for _ in range(3):
+            socket.send_bytes(b"\0" * (512 * 1024))
+        socket.send_json({"type": "end"})
+        socket.send_json({"type": "bogus"})
+        details.append((await socket.receive())["detail"])
+        details.append((await socket.receive())["detail"])
+        locks_free.append(await lock_is_free(api_server, session_id))
+
+        await socket.close()
+        status = (await client.get(f"/api/session/{session_id}/status")).json()
+        await client.delete(f"/api/session/{session_id}")
+
+        missing = WebSocketClient(api_server.app, "/api/session/missing/ws")
+        not_found = [await missing.receive(), await missing.receive()]
+        await missing.task
+    return details, locks_free, status, not_found
+
+
+def test_two_turns_arrive_in_order(server):
+    received, audio_in_order, status, free = server.run(two_turns(server.api_server, server.sample))
+
+    assert received[:2] == ["speech_end", "speech_end"]
+    assert len(received) == 10
+    # The reply event is sent once the reply is complete, so while its audio streams or after it
+    for events in (received[2:6], received[6:10]):
+        assert events[:2] == ["transcript", "audio_start"]
+        assert sorted(events[2:]) == ["audio_end", "reply"]
+    assert audio_in_order
+    assert status["exchangeCount"] == 2
+    assert free
+
+
+def test_failed_controls_keep_the_connection(server, monkeypatch):
+    details, locks_free, status, not_found = server.run(
+        failed_controls(server.api_server, server.sample, monkeypatch)
+    )
+
+    assert details == [
+        "Expected a JSON object with a type",
+        "Unknown message type: bogus",
+        "No audio received",
+        "Unknown message type: bogus",
+        "Audio too large (max 1MB)",
+        "Unknown message type: bogus",
+    ]
+    assert all(locks_free)
+    assert status["exchangeCount"] == 0
+    assert not_found[0] == {"type": "error", "detail": "Session not found"}
+    assert not_found[1]["code"] == server.api_server.WS_CLOSE_SESSION_NOT_FOUND
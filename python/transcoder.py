@@ -0,0 +1,134 @@
+import io
+import asyncio
+import struct
+from concurrent.futures import Executor
+from typing import Optional
+
+
+def detect_container(data: bytes) -> str:
+    """Identify an audio container from its leading bytes ("unknown" if unrecognized)."""
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"fLaC":
+        return "flac"
+    if data[4:8] == b"ftyp":
+        return "mp4"
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return "unknown"
+
+
+def fix_wav_header(data: bytes) -> bytes:
+    """Fill in the RIFF and data chunk sizes of a WAV written to a pipe.
+
+    ffmpeg cannot seek back on a pipe, so it leaves the size fields as placeholders.
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return data
+
+    fixed = bytearray(data)
+    struct.pack_into("<I", fixed, 4, len(fixed) - 8)
+
+    # Walk the chunks to find "data"
+    offset = 12
+    while offset + 8 <= len(fixed):
+        chunk_id = bytes(fixed[offset:offset + 4])
+        if chunk_id == b"data":
+            struct.pack_into("<I", fixed, offset + 4, len(fixed) - offset - 8)
+            break
+        chunk_size = struct.unpack_from("<I", fixed, offset + 4)[0]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return bytes(fixed)
+
+
+def _pydub_to_wav(data: bytes, sample_rate: int) -> bytes:
+    """Convert audio bytes to mono WAV with pydub, in memory (blocking)."""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(io.BytesIO(data))
+    output = io.BytesIO()
+    audio.set_frame_rate(sample_rate).set_channels(1).export(output, format="wav")
+    return output.getvalue()
+
+
+def _pydub_to_pcm(data: bytes, sample_rate: int) -> bytes:
+    """Decode audio bytes to 16-bit mono PCM with pydub (blocking)."""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(io.BytesIO(data))
+    return audio.set_frame_rate(sample_rate).set_channels(1).set_sample_width(2).raw_data
+
+
+class AudioTranscoder:
+    """Converts uploaded audio to 16 kHz mono WAV without touching the disk.
+
+    Upload bytes are piped through ffmpeg's stdin/stdout. At most max_processes
+    ffmpeg processes run at once; further requests wait for a free slot. If ffmpeg
+    is not installed, pydub is used on the given executor instead.
+    """
+
+    def __init__(self, max_processes: int = 4, timeout: float = 30, sample_rate: int = 16000,
+                 executor: Optional[Executor] = None):
+        self.timeout = timeout
+        self.sample_rate = sample_rate
+        self.executor = executor
+        self._slots = asyncio.Semaphore(max_processes)
+        self._ffmpeg_available = True
+
+    async def to_wav(self, data: bytes) -> bytes:
+        """Transcode audio bytes to WAV bytes."""
+        if self._ffmpeg_available:
+            try:
+                return fix_wav_header(await self._ffmpeg(data, '-ar', str(self.sample_rate), '-ac', '1', '-f', 'wav'))
+            except FileNotFoundError:
+                # Fallback to pydub if ffmpeg is not available
+                self._ffmpeg_available = False
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _pydub_to_wav, data, self.sample_rate)
+
+    async def to_pcm(self, data: bytes) -> bytes:
+        """Decode audio bytes to raw 16-bit mono PCM at sample_rate."""
+        if self._ffmpeg_available:
+            try:
+                return await self._ffmpeg(data, '-ar', str(self.sample_rate), '-ac', '1', '-f', 's16le')
+            except FileNotFoundError:
+                self._ffmpeg_available = False
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _pydub_to_pcm, data, self.sample_rate)
+
+    async def cut(self, data: bytes, container: str, start: float, end: float) -> bytes:
+        """Keep the start..end seconds of a recording without re-encoding it (ffmpeg only).
+
+        Packets are copied as they are, so the cut lands on a packet boundary (20 ms
+        for Opus). Raises FileNotFoundError if ffmpeg is not installed.
+        """
+        return await self._ffmpeg(
+            data, '-ss', f"{start:.3f}", '-t', f"{end - start:.3f}", '-c', 'copy', '-f', container
+        )
+
+    async def _ffmpeg(self, data: bytes, *output_args: str) -> bytes:
+        """Pipe data through ffmpeg with the given output options and return its output."""
+        async with self._slots:
+            process = await asyncio.create_subprocess_exec(
+                'ffmpeg', '-hide_banner', '-loglevel', 'error',
+                '-i', 'pipe:0',
+                *output_args, 'pipe:1',
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(data), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise Exception("Audio conversion timed out")
+
+        if process.returncode != 0:
+            raise Exception(f"ffmpeg conversion failed: {stderr.decode(errors='replace')}")
+
+        return stdout
@@ -0,0 +1,104 @@
+import re
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+TO_TARGET = "to_target"
+TO_ENGLISH = "to_english"
+
+
+def normalize_phrase(text: str) -> str:
+    """Normalize a phrase so casing, spacing and end punctuation don't split entries."""
+    text = " ".join(text.casefold().split())
+    return re.sub(r"[\s.!?。！？]+$", "", text)
+
+
+class TranslationCache:
+    """Persistent translation memo shared by every session in the process.
+
+    Entries are keyed by (direction, language, normalized text) and stored in
+    SQLite so they survive restarts. Once the table grows past max_entries the
+    least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str = "translation_cache.sqlite3", max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                direction TEXT NOT NULL,
+                language TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (direction, language, source)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def get(self, direction: str, language: str, text: str) -> Optional[str]:
+        """Return the memoized translation, or None on a miss."""
+        key = (direction, language, normalize_phrase(text))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation FROM translations WHERE direction = ? AND language = ? AND source = ?",
+                key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE translations SET last_used = ? WHERE direction = ? AND language = ? AND source = ?",
+                (time.time(), *key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, direction: str, language: str, text: str, translation: str):
+        """Memoize a translation, evicting the least recently used rows if full."""
+        key = (direction, language, normalize_phrase(text))
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM translations WHERE direction = ? AND language = ? AND source = ?",
+                key
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (direction, language, source, translation, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, translation, time.time())
+            )
+            if not exists:
+                self._count += 1
+
+            if self._count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE rowid IN "
+                    "(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                    (self._count - self.max_entries,)
+                )
+                self._count = self.max_entries
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
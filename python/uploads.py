@@ -0,0 +1,134 @@
+import json
+import hashlib
+from typing import Tuple
+from fastapi import HTTPException, UploadFile
+
+# Read uploads in fixed-size chunks so memory per request stays bounded
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload(upload: UploadFile, max_bytes: int) -> Tuple[bytes, str]:
+    """Read an upload chunk by chunk, enforcing max_bytes and hashing as it goes.
+
+    Returns (content, sha256 hex digest). Raises 413 as soon as the limit is
+    crossed and 400 for an empty upload.
+    """
+    digest = hashlib.sha256()
+    content = bytearray()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        if len(content) + len(chunk) > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio file too large (max {max_bytes // (1024 * 1024)}MB)"
+            )
+        digest.update(chunk)
+        content += chunk
+
+    if not content:
+        raise HTTPException(status_code=400, detail="Empty audio file")
+
+    return bytes(content), digest.hexdigest()
+
+
+class FrameBuffer:
+    """Audio frames of one utterance received over a WebSocket, hashed as they arrive.
+
+    Enforces the same size limit as read_upload: append() raises 413 once the
+    frames exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._digest = hashlib.sha256()
+        self._content = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._content)
+
+    def append(self, frame: bytes):
+        if len(self._content) + len(frame) > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio too large (max {self.max_bytes // (1024 * 1024)}MB)"
+            )
+        self._digest.update(frame)
+        self._content += frame
+
+    def content(self) -> Tuple[bytes, str]:
+        """(content, sha256 hex digest), like read_upload."""
+        return bytes(self._content), self._digest.hexdigest()
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Reject oversized request bodies on upload routes before they are buffered.
+
+    Requests whose Content-Length exceeds max_body_bytes are refused without
+    reading the body; bodies without a length (chunked) are counted as they
+    stream in and cut off as soon as they cross the limit.
+    """
+
+    def __init__(self, app, max_body_bytes: int, path_suffix: str = "/process"):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_suffix = path_suffix
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not scope["path"].endswith(self.path_suffix)):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_body_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if too_large:
+                # Drop whatever the app answers; the client gets a 413 instead
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            pass
+
+        if too_large and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Request body too large"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
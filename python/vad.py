@@ -0,0 +1,151 @@
+import io
+import wave
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Analysis frame length; 20 ms is short enough to place speech boundaries precisely
+FRAME_MS = 20
+# Frames quieter than this never count as speech, whatever the noise floor (dBFS)
+MIN_SPEECH_DB = -50.0
+# Speech must be this much louder than the clip's noise floor
+SPEECH_MARGIN_DB = 10.0
+# Unvoiced sounds (s, f, ch) are quiet but cross zero often: frames with a zero-crossing
+# rate above ZCR_THRESHOLD count as speech when within ZCR_MARGIN_DB of the threshold
+ZCR_THRESHOLD = 0.25
+ZCR_MARGIN_DB = 6.0
+# Less raw speech than this in a clip is treated as clicks or noise
+MIN_SPEECH_MS = 120
+# Silence kept around detected speech, so word onsets and endings are not clipped
+PADDING_MS = 200
+
+
+def pcm_to_samples(pcm: bytes) -> np.ndarray:
+    """16-bit little-endian mono PCM as float samples in [-1, 1)."""
+    return np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def frame_features(samples: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy (dBFS) and zero-crossing rate, computed for all frames at once.
+
+    A trailing partial frame is ignored.
+    """
+    count = len(samples) // frame_length
+    if count == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    frames = samples[:count * frame_length].reshape(count, frame_length)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return energy_db, zcr
+
+
+def speech_threshold(energy_db: np.ndarray) -> float:
+    """Energy above which a frame is speech: the noise floor (10th percentile) plus a margin."""
+    noise_floor = float(np.percentile(energy_db, 10)) if len(energy_db) else MIN_SPEECH_DB
+    return max(MIN_SPEECH_DB, noise_floor + SPEECH_MARGIN_DB)
+
+
+def classify_frames(energy_db: np.ndarray, zcr: np.ndarray, threshold: float) -> np.ndarray:
+    """Boolean speech mask over frames."""
+    voiced = energy_db > threshold
+    unvoiced = (zcr > ZCR_THRESHOLD) & (energy_db > max(MIN_SPEECH_DB, threshold - ZCR_MARGIN_DB))
+    return voiced | unvoiced
+
+
+def find_speech(samples: np.ndarray, sample_rate: int) -> Optional[Tuple[int, int]]:
+    """Sample range (start, end) holding the speech in a clip, with padding; None if silent."""
+    frame_length = max(1, sample_rate * FRAME_MS // 1000)
+    energy_db, zcr = frame_features(samples, frame_length)
+    if len(energy_db) == 0:
+        return None
+
+    speech = classify_frames(energy_db, zcr, speech_threshold(energy_db))
+    if np.count_nonzero(speech) * FRAME_MS < MIN_SPEECH_MS:
+        return None
+
+    indices = np.flatnonzero(speech)
+    padding = sample_rate * PADDING_MS // 1000
+    start = max(0, indices[0] * frame_length - padding)
+    end = min(len(samples), (indices[-1] + 1) * frame_length + padding)
+    return int(start), int(end)
+
+
+def read_wav(data: bytes) -> Tuple[bytes, int]:
+    """(PCM, sample rate) of a 16-bit mono WAV."""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError("Expected 16-bit mono WAV")
+        return wav.readframes(wav.getnframes()), wav.getframerate()
+
+
+def write_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """16-bit mono PCM as WAV bytes."""
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return output.getvalue()
+
+
+def trim_silence(pcm: bytes, sample_rate: int) -> Tuple[Optional[bytes], Dict]:
+    """Cut leading and trailing silence from 16-bit mono PCM.
+
+    Returns (trimmed PCM, details), with None instead of PCM if the clip holds no
+    speech. details has the original duration and the start and end of the kept
+    part, all in seconds.
+    """
+    samples = pcm_to_samples(pcm)
+    details = {"duration": len(samples) / sample_rate, "start": 0.0, "end": 0.0}
+    bounds = find_speech(samples, sample_rate)
+    if bounds is None:
+        return None, details
+    start, end = bounds
+    details["start"] = start / sample_rate
+    details["end"] = end / sample_rate
+    return pcm[start * 2:end * 2], details
+
+
+class EndpointDetector:
+    """Detects the end of an utterance in live microphone audio.
+
+    Feed 16-bit mono PCM as it is recorded; feed() returns True once speech has
+    been heard and then end_silence_ms of silence followed. The noise floor is
+    estimated from the quietest frames heard so far, so the first few hundred
+    milliseconds should not already be speech.
+    """
+
+    def __init__(self, sample_rate: int, end_silence_ms: int = 900, calibration_ms: int = 300):
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, sample_rate * FRAME_MS // 1000)
+        self.end_silence_frames = max(1, end_silence_ms // FRAME_MS)
+        self.calibration_frames = max(1, calibration_ms // FRAME_MS)
+        self._pending = np.empty(0, dtype=np.float32)
+        self._energies = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self.speech_started = False
+
+    def feed(self, pcm: bytes) -> bool:
+        samples = np.concatenate([self._pending, pcm_to_samples(pcm)])
+        usable = len(samples) - len(samples) % self.frame_length
+        self._pending = samples[usable:]
+        energy_db, zcr = frame_features(samples[:usable], self.frame_length)
+        self._energies.extend(energy_db.tolist())
+        if len(self._energies) < self.calibration_frames:
+            return False
+
+        threshold = speech_threshold(np.asarray(self._energies[-3000:]))
+        for is_speech in classify_frames(energy_db, zcr, threshold):
+            if is_speech:
+                self._speech_frames += 1
+                self._silent_frames = 0
+                if self._speech_frames * FRAME_MS >= MIN_SPEECH_MS:
+                    self.speech_started = True
+            else:
+                self._silent_frames += 1
+                if not self.speech_started:
+                    self._speech_frames = 0
+        return self.speech_started and self._silent_frames >= self.end_silence_frames
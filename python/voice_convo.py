@@ -2,49 +2,106 @@ import os
 import sys
 import argparse
 import json
-import google.generativeai as genai
-from typing import Dict, List, Tuple
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from audio_interface import AudioInterface
+from translation_cache import TranslationCache, TO_TARGET, TO_ENGLISH
+from conversation_context import ConversationContext, estimate_tokens
+from scenario_registry import Scenario, ScenarioRegistry
+from metrics import timed, count_bytes
+from providers import configure_gemini, gemini_model, replaying, chunk_text
+
+if TYPE_CHECKING:
+    # Device libraries (pyaudio, pygame) are only needed for local voice conversations
+    from audio_interface import AudioInterface
 
 load_dotenv()
 
-def load_scenarios_from_directory(directory="scenarios"):
-    """Load all scenario JSON files from the specified directory."""
-    scenarios = {}
+# Scenario definitions, next to this module whatever the working directory
+SCENARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+# Scenario files are checked for changes at most this often (seconds)
+SCENARIO_RELOAD_SECONDS = float(os.getenv("SCENARIO_RELOAD_SECONDS", "2"))
+
+_scenario_registry: Optional[ScenarioRegistry] = None
+
+def get_scenario_registry() -> ScenarioRegistry:
+    """The scenario registry for the scenarios directory, created on first use."""
+    global _scenario_registry
+    if _scenario_registry is None:
+        _scenario_registry = ScenarioRegistry(SCENARIOS_DIR, check_interval=SCENARIO_RELOAD_SECONDS)
+    return _scenario_registry
+
+def get_scenarios() -> Dict[str, Scenario]:
+    """All valid scenarios, reloading any scenario files that changed."""
+    registry = get_scenario_registry()
+    registry.refresh()
+    return registry.scenarios
+
+def __getattr__(name):
+    # Keep voice_convo.SCENARIOS working without loading scenarios at import
+    if name == "SCENARIOS":
+        return get_scenarios()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+GEMINI_MODEL = 'models/gemini-2.5-flash'
+
+# Turn engines: "two_call" asks Gemini for the reply and then separately whether the
+# step is complete; "structured" asks for both in a single JSON response; "chat" keeps
+# a persistent Gemini chat per session and sends only the new utterance each turn.
+ENGINES = ("two_call", "structured", "chat")
+
+# Shared pool for step-completion checks that run off the user's critical path
+EVALUATION_POOL_SIZE = int(os.getenv("EVALUATION_POOL_SIZE", "8"))
+_evaluation_executor = ThreadPoolExecutor(max_workers=EVALUATION_POOL_SIZE, thread_name_prefix="step-eval")
+
+class ScenarioProgress:
+    """Per-session progress through a scenario's steps.
     
-    # Check if directory exists
-    if not os.path.exists(directory):
-        print(f"Error: Scenarios directory '{directory}' not found.")
-        return scenarios
+    Scenario definitions are shared by every session and never modified; each
+    session only keeps an exchange count and a completion flag per step.
+    """
+    __slots__ = ("exchange_counts", "completed")
     
-    # Load all JSON files in the directory
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            scenario_name = filename[:-5]  # Remove .json extension
-            file_path = os.path.join(directory, filename)
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    scenario_data = json.load(f)
-                    scenarios[scenario_name] = scenario_data
-                    print(f"Loaded scenario: {scenario_name}")
-            except Exception as e:
-                print(f"Error loading scenario {filename}: {str(e)}")
-    
-    return scenarios
+    def __init__(self, step_count: int):
+        self.exchange_counts = array("I", [0] * step_count)
+        self.completed = bytearray(step_count)
+    
+    def all_complete(self) -> bool:
+        """Check if every step is complete."""
+        return all(self.completed)
 
-# Load all scenarios from the scenarios directory
-SCENARIOS = load_scenarios_from_directory()
 
 class VoiceLanguageLearningChatbot:
-    def __init__(self, api_key: str, scenario: Dict, language: str = "english"):
-        """Initialize the chatbot with Gemini API key, scenario, and language."""
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
-        
-        # Set the scenario
+    def __init__(self, api_key: str, scenario: Scenario, language: str = "english",
+                 audio_interface: Optional["AudioInterface"] = None,
+                 translation_cache: Optional[TranslationCache] = None,
+                 defer_step_evaluation: bool = False,
+                 engine: str = "two_call",
+                 context_turns: int = 8):
+        """Initialize the chatbot with Gemini API key, scenario, and language.
+
+        audio_interface is only needed for local voice conversations; the API server
+        leaves it unset and handles speech through its shared speech service.
+        translation_cache, if given, memoizes translations across sessions.
+        With defer_step_evaluation, the step-completion check runs in the background
+        and is applied before the next turn instead of delaying the reply.
+        engine selects how normal turns call Gemini (see ENGINES).
+        context_turns bounds how many history entries go into prompts verbatim;
+        older ones are summarized.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of: {', '.join(ENGINES)}")
+        
+        configure_gemini(api_key)
+        self.model = gemini_model(GEMINI_MODEL)
+        
+        # Set the scenario (shared, read-only) and this session's progress through it
+        if not isinstance(scenario, Scenario):
+            scenario = Scenario(scenario.get("title", "scenario"), scenario)
         self.scenario = scenario
+        self.progress = ScenarioProgress(len(scenario["steps"]))
         self.role = scenario["role"]
         self.language = language.lower()
         
@@ -62,6 +119,21 @@ class VoiceLanguageLearningChatbot:
         
         self.current_step_index = 0
         self.conversation_history = []
+        
+        # Bounded prompt context
+        self.context = ConversationContext(max_turns=context_turns, summarizer=self.summarize_history)
+        self.last_prompt_tokens = 0
+        self.total_prompt_tokens = 0
+        
+        # Chat engine state: the Gemini chat, how much of the history it covers,
+        # the summary it was built with, and the last step announced to it. None of
+        # it is in to_state(): the chat is rebuilt locally from the stored history
+        # (no Gemini call), and then announces the current step again
+        self._chat = None
+        self._chat_system_instruction = ""
+        self._chat_synced_count = 0
+        self._chat_summarized_count = 0
+        self._chat_step_index = -1
         self.max_exchanges_per_step = 3  # Prevent infinite loops
         
         # Learning mode state
@@ -69,60 +141,112 @@ class VoiceLanguageLearningChatbot:
         self.original_english_phrase = ""
         self.target_language_phrase = ""
         
-        # Initialize audio interface
-        self.audio_interface = AudioInterface()
+        # Audio interface (microphone/speaker), if running locally
+        self.audio_interface = audio_interface
+        
+        # Shared translation memo (skips Gemini for phrases seen before)
+        self.translation_cache = translation_cache
+        
+        # Turn engine and background step evaluation state
+        self.engine = engine
+        self.defer_step_evaluation = defer_step_evaluation
+        self._pending_evaluation: Optional[Future] = None
+        self._pending_evaluation_step = 0
+        self._evaluation_lock = threading.Lock()
         
     def get_current_step(self) -> Dict:
         """Get the current conversation step."""
         return self.scenario["steps"][self.current_step_index]
     
+    def get_current_exchange_count(self) -> int:
+        """Get the number of exchanges so far in the current step."""
+        return self.progress.exchange_counts[self.current_step_index]
+    
     def is_conversation_complete(self) -> bool:
         """Check if all steps in the scenario are complete."""
-        return all(step["is_complete"] for step in self.scenario["steps"])
+        return self.progress.all_complete()
     
-    def generate_system_prompt(self) -> str:
-        """Generate the system prompt for the AI based on the current step."""
-        current_step = self.get_current_step()
+    def get_prompt_prefix(self) -> str:
+        """Get the static part of the system prompt (role, scenario, step, guidelines).
         
-        # Determine the role name based on the scenario role
-        role_name = self.role
-        
-        # Language-specific instructions
-        language_instruction = ""
-        if self.language != "english":
-            language_instruction = f"\n- Respond in {self.language.title()}\n- Adapt your responses to reflect the cultural context of {self.language.title()} speakers"
-        
-        prompt = f"""
-You are a friendly {role_name} having a conversation with someone who is practicing their language skills.
-
-Current scenario: {self.scenario['title']}
-Language: {self.language.title()}
-Current step: {current_step['name']}
-
-For this step:
-- {current_step['instruction']}
+        It only depends on the step and language, so the scenario renders it once
+        from its compiled template and every session reuses it.
+        """
+        return self.scenario.prompt_prefix(self.current_step_index, self.language)
+    
+    def format_history(self, entries: List[Dict]) -> str:
+        """Format history entries as 'Speaker: text' lines."""
+        role_name = self.role.title()
+        return "".join(
+            f"{role_name if entry['role'] == 'assistant' else 'Customer'}: {entry['content']}\n"
+            for entry in entries
+        )
+    
+    def summarize_history(self, previous_summary: str, entries: List[Dict]) -> str:
+        """Fold older conversation entries into the running summary using Gemini."""
+        summary_prompt = f"""
+Update the summary of a conversation between a {self.role} and a customer who is practicing {self.language.title()}.
+Keep every fact that matters for continuing the conversation (orders, names, choices, open questions).
+Use at most 80 words. Only return the updated summary, nothing else.
 
-Guidelines:
-- Stay in character as a {role_name} throughout the conversation
-- Respond naturally to what the other person says
-- Keep your responses concise and conversational
-- Focus on your role as a {role_name}, not on language teaching{language_instruction}
-- Unless you are ending the conversation, always end your reply with ONE short, relevant, open-ended question that invites the learner to speak.
-- Keep responses to 1–2 short sentences followed by a single question. Do not ask multiple questions at once and do not answer your own question.
-- For the final part of the conversation, recognize when the other person is saying goodbye and end the conversation
+Current summary: {previous_summary or "(none)"}
 
-Conversation history:
-"""
+New conversation lines:
+{self.format_history(entries)}
+Updated summary:"""
         
-        # Add conversation history
-        for entry in self.conversation_history:
-            role = f"{role_name.title()}" if entry["role"] == "assistant" else "Customer"
-            prompt += f"{role}: {entry['content']}\n"
-            
-        return prompt
+        return self.call_gemini("gemini_summary", summary_prompt).strip()
+    
+    def generate_system_prompt(self) -> str:
+        """Generate the system prompt for the AI based on the current step."""
+        # Keep the prompt bounded: use the summary of older turns folded so far
+        self.context.apply_fold()
+        
+        parts = [self.get_prompt_prefix()]
+        if self.context.summary:
+            parts.append(f"\nSummary of the earlier conversation:\n{self.context.summary}\n")
+        parts.append("\nConversation history:\n")
+        parts.append(self.format_history(self.context.recent(self.conversation_history)))
+        return "".join(parts)
+    
+    def call_gemini(self, stage: str, prompt: str, on_text: Optional[Callable[[str], None]] = None,
+                    **kwargs) -> str:
+        """Send a prompt to Gemini and return the reply text, recording metrics under stage.
+        
+        With on_text, the reply is streamed and on_text is called with each piece as it arrives.
+        """
+        with timed(stage):
+            if on_text is None:
+                text = self.model.generate_content(prompt, **kwargs).text
+            else:
+                pieces = []
+                for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+                    piece = chunk_text(chunk)
+                    if piece:
+                        pieces.append(piece)
+                        on_text(piece)
+                text = "".join(pieces)
+        count_bytes(stage, "in", len(prompt.encode("utf-8")))
+        count_bytes(stage, "out", len(text.encode("utf-8")))
+        return text
     
-    def generate_response(self, user_input: str, language_code: str = "") -> Tuple[str, bool]:
-        """Generate AI response and determine if we should advance to the next step."""
+    def record_prompt_tokens(self, prompt: str):
+        """Track the (estimated) token count of a prompt sent for a turn."""
+        self.last_prompt_tokens = estimate_tokens(prompt)
+        self.total_prompt_tokens += self.last_prompt_tokens
+    
+    def generate_response(self, user_input: str, language_code: str = "",
+                          on_text: Optional[Callable[[str], None]] = None,
+                          on_reply: Optional[Callable[[str], None]] = None) -> Tuple[str, bool]:
+        """Generate AI response and determine if we should advance to the next step.
+        
+        on_text, if given, receives the reply text in pieces as Gemini streams it, and
+        on_reply the complete reply as soon as it is known, before the step check runs.
+        Replies that are not generated by Gemini (teaching prompts, translations) are
+        only returned.
+        """
+        # Apply the previous turn's step evaluation before handling this one
+        self.settle_step_evaluation()
         
         # Check if we're waiting for the user to practice the target language
         if self.waiting_for_user_practice:
@@ -135,7 +259,9 @@ Conversation history:
                 self.waiting_for_user_practice = False
                 
                 # Generate the normal response for the original input
-                normal_response, is_complete = self.generate_normal_response(self.original_english_phrase, language_code)
+                normal_response, is_complete = self.generate_normal_response(
+                    self.original_english_phrase, language_code, on_text, on_reply
+                )
                 
                 # Add AI response to conversation history
                 self.conversation_history.append({"role": "assistant", "content": normal_response})
@@ -159,7 +285,7 @@ Conversation history:
         self.conversation_history.append({"role": "user", "content": user_input})
         
         # Increment exchange count for current step
-        self.scenario["steps"][self.current_step_index]["exchange_count"] += 1
+        self.progress.exchange_counts[self.current_step_index] += 1
         
         # Check if user spoke English and indicated confusion
         if language_code == "eng" and self.language != "english":
@@ -178,7 +304,7 @@ Conversation history:
             return self.generate_educational_response(user_input)
         
         # Generate normal response for non-English input
-        return self.generate_normal_response(user_input, language_code)
+        return self.generate_normal_response(user_input, language_code, on_text, on_reply)
     
     def generate_educational_response(self, user_input: str) -> Tuple[str, bool]:
         """Generate an educational response that teaches the user how to say their phrase in the target language."""
@@ -221,43 +347,272 @@ Conversation history:
         except Exception as e:
             return f"Sorry, I encountered an error: {str(e)}", False
     
-    def generate_normal_response(self, user_input: str, language_code: str = "") -> Tuple[str, bool]:
+    def generate_normal_response(self, user_input: str, language_code: str = "",
+                                 on_text: Optional[Callable[[str], None]] = None,
+                                 on_reply: Optional[Callable[[str], None]] = None) -> Tuple[str, bool]:
         """Generate a normal response without educational content."""
-        # Generate the system prompt
-        system_prompt = self.generate_system_prompt()
-        
-        # Create the full prompt with explicit questioning behavior
-        full_prompt = (
-            f"{system_prompt}\n\n"
-            f"Customer just said: '{user_input}'\n\n"
-            f"Your response as the {self.role} (end with one short, open-ended follow-up question):"
-        )
+        if self.engine == "structured":
+            structured = self.generate_structured_response(user_input)
+            if structured is not None:
+                ai_response, step_complete = structured
+                self.conversation_history.append({"role": "assistant", "content": ai_response})
+                self.start_summary()
+                self.apply_step_evaluation(step_complete or self.is_goodbye(user_input))
+                return ai_response, self.is_conversation_complete()
+            # Fall back to the two-call path if the structured reply was unusable
+        
+        # The chat engine sends only the new utterance; it falls back to the flat prompt
+        ai_response = None
+        if self.engine == "chat":
+            ai_response = self.generate_chat_reply(user_input)
         
         try:
-            # Generate response from Gemini
-            response = self.model.generate_content(full_prompt)
-            ai_response = response.text
+            if ai_response is None:
+                # Generate the system prompt
+                system_prompt = self.generate_system_prompt()
+                
+                # Create the full prompt with explicit questioning behavior
+                full_prompt = (
+                    f"{system_prompt}\n\n"
+                    f"Customer just said: '{user_input}'\n\n"
+                    f"Your response as the {self.role} (end with one short, open-ended follow-up question):"
+                )
+                
+                # Generate response from Gemini
+                self.record_prompt_tokens(full_prompt)
+                ai_response = self.call_gemini("gemini_reply", full_prompt, on_text)
             
             # Add AI response to conversation history
             self.conversation_history.append({"role": "assistant", "content": ai_response})
-            
-            # Determine if we should advance to the next step
-            should_advance = self.should_advance_to_next_step(user_input, ai_response)
-            
-            # Also check if we've exceeded max exchanges for this step
-            current_step = self.get_current_step()
-            max_exceeded = current_step["exchange_count"] >= self.max_exchanges_per_step
-            
-            if should_advance or max_exceeded:
-                self.mark_current_step_complete()
-                if not self.is_conversation_complete():
-                    self.advance_to_next_step()
+            if on_reply is not None:
+                on_reply(ai_response)
+            self.start_summary()
+            
+            # Determine if we should advance to the next step. The final step is always
+            # checked inline so completion is reported on the turn that completes it.
+            if self.defer_step_evaluation and not self.is_final_step():
+                self._pending_evaluation_step = self.current_step_index
+                self._pending_evaluation = _evaluation_executor.submit(
+                    self.should_advance_to_next_step, user_input, ai_response
+                )
+            else:
+                should_advance = self.should_advance_to_next_step(user_input, ai_response)
+                self.apply_step_evaluation(should_advance)
             
             return ai_response, self.is_conversation_complete()
             
         except Exception as e:
             return f"Sorry, I encountered an error: {str(e)}", False
     
+    def get_chat_system_instruction(self) -> str:
+        """System instruction for the chat engine: everything that is fixed for the session."""
+        instruction = self.scenario.chat_instruction(self.language)
+        if self.context.summary:
+            instruction += f"\nSummary of the earlier conversation:\n{self.context.summary}\n"
+        return instruction
+    
+    def _start_chat(self):
+        """(Re)build the Gemini chat from the unsummarized history before the current input."""
+        self._chat_system_instruction = self.get_chat_system_instruction()
+        model = gemini_model(GEMINI_MODEL, system_instruction=self._chat_system_instruction)
+        
+        # Map history to alternating user/model contents, starting with a user turn
+        contents = []
+        for entry in self.context.recent(self.conversation_history)[:-1]:
+            role = "model" if entry["role"] == "assistant" else "user"
+            if contents and contents[-1]["role"] == role:
+                contents[-1]["parts"][0] += f"\n{entry['content']}"
+            else:
+                contents.append({"role": role, "parts": [entry["content"]]})
+        if contents and contents[0]["role"] == "model":
+            contents.insert(0, {"role": "user", "parts": ["(The customer approaches.)"]})
+        
+        self._chat = model.start_chat(history=contents)
+        self._chat_summarized_count = self.context.summarized_count
+        self._chat_step_index = -1
+    
+    def generate_chat_reply(self, user_input: str) -> Optional[str]:
+        """Get the reply from the session's persistent Gemini chat.
+        
+        Returns None if the call failed, so the caller can use the flat prompt instead.
+        """
+        try:
+            self.context.apply_fold()
+            
+            # Rebuild when turns happened outside the chat (e.g. practice prompts)
+            # or older turns were folded into the summary
+            if (self._chat is None
+                    or self._chat_synced_count != len(self.conversation_history) - 1
+                    or self._chat_summarized_count != self.context.summarized_count):
+                self._start_chat()
+            
+            message = f"Customer: {user_input}"
+            if self._chat_step_index != self.current_step_index:
+                current_step = self.get_current_step()
+                message = f"[Step: {current_step['name']} - {current_step['instruction']}]\n{message}"
+                self._chat_step_index = self.current_step_index
+            
+            self.record_prompt_tokens(
+                self._chat_system_instruction
+                + "".join(part for content in self._chat.history for part in self._content_text(content))
+                + message
+            )
+            with timed("gemini_chat"):
+                text = self._chat.send_message(message).text
+            count_bytes("gemini_chat", "in", len(message.encode("utf-8")))
+            count_bytes("gemini_chat", "out", len(text.encode("utf-8")))
+            
+            # The chat now also holds the reply the caller is about to append
+            self._chat_synced_count = len(self.conversation_history) + 1
+            return text
+        except Exception as e:
+            print(f"Chat engine failed, falling back to flat prompt: {e}")
+            self._chat = None
+            return None
+    
+    @staticmethod
+    def _content_text(content) -> List[str]:
+        """Text parts of a chat history entry (dict or protobuf Content)."""
+        parts = content["parts"] if isinstance(content, dict) else content.parts
+        return [part if isinstance(part, str) else getattr(part, "text", "") for part in parts]
+    
+    def generate_structured_response(self, user_input: str) -> Optional[Tuple[str, bool]]:
+        """Get the reply and the step-completion verdict from a single Gemini call.
+        
+        Returns (reply, step_complete), or None if the call failed or the output
+        did not validate.
+        """
+        current_step = self.get_current_step()
+        system_prompt = self.generate_system_prompt()
+        
+        full_prompt = (
+            f"{system_prompt}\n\n"
+            f"Customer just said: '{user_input}'\n\n"
+            f"Completion criteria for the current step: {current_step['completion_criteria']}\n\n"
+            f"Respond with a JSON object only, in this exact form:\n"
+            f'{{"reply": "<your response as the {self.role}, ending with one short, open-ended follow-up question>", '
+            f'"step_complete": <true if, after your reply, the completion criteria are met, otherwise false>}}'
+        )
+        
+        self.record_prompt_tokens(full_prompt)
+        try:
+            text = self.call_gemini(
+                "gemini_structured",
+                full_prompt,
+                generation_config={"response_mime_type": "application/json"}
+            )
+            return self.parse_structured_response(text)
+        except Exception as e:
+            print(f"Structured response failed, falling back: {e}")
+            return None
+    
+    @staticmethod
+    def parse_structured_response(text: str) -> Optional[Tuple[str, bool]]:
+        """Validate a structured reply of the form {"reply": str, "step_complete": bool}."""
+        text = text.strip()
+        # Tolerate a markdown code fence around the JSON
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:]
+        
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        
+        if not isinstance(data, dict):
+            return None
+        reply = data.get("reply")
+        step_complete = data.get("step_complete")
+        if not isinstance(reply, str) or not reply.strip() or not isinstance(step_complete, bool):
+            return None
+        
+        return reply.strip(), step_complete
+    
+    def apply_step_evaluation(self, should_advance: bool):
+        """Complete and advance the current step if it was judged done or ran too long."""
+        # Also check if we've exceeded max exchanges for this step
+        max_exceeded = self.get_current_exchange_count() >= self.max_exchanges_per_step
+        
+        if should_advance or max_exceeded:
+            self.mark_current_step_complete()
+            if not self.is_conversation_complete():
+                self.advance_to_next_step()
+    
+    def settle_step_evaluation(self):
+        """Wait for a background step evaluation, if any, and apply its result."""
+        with self._evaluation_lock:
+            future = self._pending_evaluation
+            if future is None:
+                return
+            self._pending_evaluation = None
+            
+            try:
+                should_advance = future.result()
+            except Exception:
+                # If evaluation fails, don't advance
+                should_advance = False
+            
+            # Ignore results for a step we have already moved past
+            if self._pending_evaluation_step == self.current_step_index:
+                self.apply_step_evaluation(should_advance)
+    
+    def has_pending_evaluation(self) -> bool:
+        """Check if a background step evaluation has not been applied yet."""
+        return self._pending_evaluation is not None
+    
+    def start_summary(self):
+        """Fold older turns into the summary in the background, once the reply is known.
+        
+        The next prompt uses whatever summary is ready by then; until a fold finishes,
+        the turns it covers stay in the prompt verbatim.
+        """
+        self.context.start_fold(self.conversation_history, _evaluation_executor)
+    
+    def has_pending_summary(self) -> bool:
+        """Check if a background summary fold has not been applied yet."""
+        return self.context.fold_pending()
+    
+    def settle_summary(self):
+        """Wait for a background summary fold, if any, and apply it (before the state is stored)."""
+        self.context.apply_fold(wait=True)
+    
+    def to_state(self) -> Dict:
+        """Compact, JSON-serializable snapshot of this session's conversation state.
+        
+        The scenario itself is not included; pass the same scenario when rebuilding
+        the chatbot and then call restore_state.
+        """
+        return {
+            "step": self.current_step_index,
+            "exchanges": list(self.progress.exchange_counts),
+            "completed": list(self.progress.completed),
+            "history": self.conversation_history,
+            "practice": [self.waiting_for_user_practice, self.original_english_phrase, self.target_language_phrase],
+            "summary": [self.context.summarized_count, self.context.summary],
+            "prompt_tokens": [self.last_prompt_tokens, self.total_prompt_tokens]
+        }
+    
+    def restore_state(self, state: Dict):
+        """Restore conversation state produced by to_state.
+        
+        If the scenario was reloaded with a different number of steps since the
+        state was saved, per-step progress is truncated or padded to fit.
+        """
+        step_count = len(self.scenario["steps"])
+        self.current_step_index = min(state["step"], step_count - 1)
+        self.progress.exchange_counts = array("I", (state["exchanges"] + [0] * step_count)[:step_count])
+        self.progress.completed = bytearray((state["completed"] + [0] * step_count)[:step_count])
+        self.conversation_history = state["history"]
+        self.waiting_for_user_practice, self.original_english_phrase, self.target_language_phrase = state["practice"]
+        self.context.summarized_count, self.context.summary = state["summary"]
+        self.last_prompt_tokens, self.total_prompt_tokens = state["prompt_tokens"]
+    
+    def is_final_step(self) -> bool:
+        """Check if the conversation is on its last step."""
+        return self.current_step_index == len(self.scenario["steps"]) - 1
+    
     def is_confusion_phrase(self, user_input: str) -> bool:
         """Check if the user input indicates confusion."""
         confusion_phrases = [
@@ -296,6 +651,11 @@ Conversation history:
     
     def translate_to_english(self, text: str) -> str:
         """Translate text to English using Gemini."""
+        if self.translation_cache:
+            cached = self.translation_cache.get(TO_ENGLISH, self.language, text)
+            if cached is not None:
+                return cached
+        
         try:
             translation_prompt = f"""
 Translate the following text to English.
@@ -306,8 +666,10 @@ Text: "{text}"
 Translation:"""
             
             # Generate translation from Gemini
-            response = self.model.generate_content(translation_prompt)
-            translation = response.text.strip()
+            translation = self.call_gemini("gemini_translation", translation_prompt).strip()
+            
+            if self.translation_cache and translation:
+                self.translation_cache.put(TO_ENGLISH, self.language, text, translation)
             
             return translation
             
@@ -317,6 +679,11 @@ Translation:"""
     
     def generate_translation(self, user_input: str) -> str:
         """Generate a translation of the user's input into the target language."""
+        if self.translation_cache:
+            cached = self.translation_cache.get(TO_TARGET, self.language, user_input)
+            if cached is not None:
+                return cached
+        
         try:
             # Create a translation prompt
             language_map = {
@@ -342,8 +709,10 @@ Text: "{user_input}"
 Translation:"""
             
             # Generate translation from Gemini
-            response = self.model.generate_content(translation_prompt)
-            translation = response.text.strip()
+            translation = self.call_gemini("gemini_translation", translation_prompt).strip()
+            
+            if self.translation_cache and translation:
+                self.translation_cache.put(TO_TARGET, self.language, user_input, translation)
             
             return translation
             
@@ -369,40 +738,32 @@ Translation:"""
         
         return language_code  # This line should not be reached, but just in case
     
+    def is_goodbye(self, user_input: str) -> bool:
+        """Check if the user is saying goodbye during the ending step."""
+        if self.get_current_step()["name"] != "ending":
+            return False
+        goodbye_indicators = ["goodbye", "bye", "thank you", "thanks", "see you", "farewell"]
+        return any(indicator in user_input.lower() for indicator in goodbye_indicators)
+    
     def should_advance_to_next_step(self, user_input: str, ai_response: str) -> bool:
         """Determine if the conversation should advance to the next step."""
-        current_step = self.get_current_step()
-        
         # Special handling for the ending step - check for goodbye indicators
-        if current_step["name"] == "ending":
-            goodbye_indicators = ["goodbye", "bye", "thank you", "thanks", "see you", "farewell"]
-            if any(indicator in user_input.lower() for indicator in goodbye_indicators):
-                return True
+        if self.is_goodbye(user_input):
+            return True
         
         # Create a prompt to evaluate if the current step is complete
-        evaluation_prompt = f"""
-You are evaluating a conversation between a {self.role} and a customer.
-
-Current task: {current_step['name']}
-Task instruction: {current_step['instruction']}
-Completion criteria: {current_step['completion_criteria']}
-
-Customer said: "{user_input}"
-{self.role.title()} responded: "{ai_response}"
-
-Based on the completion criteria, is the current task complete? Answer with only "yes" or "no".
-"""
+        evaluation_prompt = self.scenario.evaluation_prompt(self.current_step_index, user_input, ai_response)
         
         try:
-            evaluation = self.model.generate_content(evaluation_prompt)
-            return "yes" in evaluation.text.lower()
+            evaluation = self.call_gemini("gemini_evaluation", evaluation_prompt)
+            return "yes" in evaluation.lower()
         except:
             # If evaluation fails, don't advance
             return False
     
     def mark_current_step_complete(self):
         """Mark the current step as complete."""
-        self.scenario["steps"][self.current_step_index]["is_complete"] = True
+        self.progress.completed[self.current_step_index] = 1
     
     def advance_to_next_step(self):
         """Advance to the next step in the scenario."""
@@ -411,25 +772,10 @@ Based on the completion criteria, is the current task complete? Answer with only
     
     def start_conversation(self) -> str:
         """Start the conversation with the initial greeting."""
-        current_step = self.get_current_step()
-        
-        # Language-specific instruction for the initial greeting
-        language_instruction = ""
-        if self.language != "english":
-            language_instruction = f" Respond in {self.language.title()} and adapt your greeting to reflect the cultural context of {self.language.title()} speakers."
-        
-        initial_prompt = f"""
-You are a friendly {self.role}. Start the conversation with a customer who just approached you.
-
-Language: {self.language.title()}
-
-Begin the conversation with a warm greeting as the {self.role}. Keep it natural and concise.{language_instruction}
-End your greeting with one short, friendly question that invites the learner to respond.
-"""
+        initial_prompt = self.scenario.greeting_prompt(self.language)
         
         try:
-            response = self.model.generate_content(initial_prompt)
-            ai_response = response.text
+            ai_response = self.call_gemini("gemini_greeting", initial_prompt)
             self.conversation_history.append({"role": "assistant", "content": ai_response})
             return ai_response
         except Exception as e:
@@ -437,11 +783,14 @@ End your greeting with one short, friendly question that invites the learner to
     
     def cleanup(self):
         """Clean up resources."""
-        self.audio_interface.cleanup()
+        if self.audio_interface:
+            self.audio_interface.cleanup()
 
 
 def main():
     """Main function to run the voice chatbot."""
+    SCENARIOS = get_scenarios()
+    
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Voice Language Learning Chatbot')
     parser.add_argument('scenario', nargs='?', default='cafe',
@@ -474,7 +823,7 @@ def main():
     
     # Get API key from environment variable or replace with your key
     api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    if not api_key and not replaying():
         print("Please set your GEMINI_API_KEY environment variable or modify the script to include your key.")
         return
     
@@ -489,7 +838,9 @@ def main():
     selected_scenario = SCENARIOS[args.scenario]
     
     # Initialize the chatbot with the selected scenario and language
-    chatbot = VoiceLanguageLearningChatbot(api_key, selected_scenario, args.language)
+    from audio_interface import AudioInterface
+    chatbot = VoiceLanguageLearningChatbot(api_key, selected_scenario, args.language,
+                                           audio_interface=AudioInterface())
     
     print("=== Voice Language Learning Chatbot ===")
     print(f"Scenario: {chatbot.scenario['title']}")